@@ -0,0 +1,122 @@
+"""Requests/sec of InferenceAdapter.predict (thread pool) vs apredict (event loop).
+
+Both paths call a local SageMaker-compatible stub endpoint that sleeps for
+--stub-latency-ms before answering, so the numbers reflect client-side
+concurrency limits rather than model time.
+
+    PYTHONPATH=. python scripts/bench_async_predict.py --requests 2000 --concurrency 1 16 256
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from src.inference.adapter import InferenceAdapter
+from src.inference.metrics_sink import BufferedMetricsSink, InMemoryCloudWatch
+
+
+def _serve_stub(sock, latency_ms):
+    async def invocations(request):
+        body = json.loads(await request.body() or b'{}')
+        await asyncio.sleep(latency_ms / 1000)
+        if isinstance(body, dict) and 'instances' in body:
+            return JSONResponse({'predictions': [1] * len(body['instances'])})
+        return JSONResponse([1])
+    async def put_metric_data(request):
+        # Lets a server under test point AWS_ENDPOINT_URL_CLOUDWATCH here instead of at AWS.
+        await request.body()
+        return Response('<PutMetricDataResponse/>', media_type='text/xml')
+    app = Starlette(routes=[
+        Route('/endpoints/{name}/invocations', invocations, methods=['POST']),
+        Route('/', put_metric_data, methods=['POST'])
+    ])
+    uvicorn.Server(uvicorn.Config(app, log_level='warning', backlog=4096, timeout_keep_alive=75)).run(sockets=[sock])
+
+
+def start_stub_endpoint(latency_ms):
+    """Serve the stub from a separate process so it does not share the client's GIL."""
+    sock = socket.socket()
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(4096)
+    port = sock.getsockname()[1]
+    process = multiprocessing.get_context('fork').Process(target=_serve_stub, args=(sock, latency_ms), daemon=True)
+    process.start()
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(urllib.request.Request(f"{url}/endpoints/ping/invocations", data=b'{}')):
+                return url, process
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("Stub endpoint did not start")
+
+
+def bench_sync(adapter, n_requests, concurrency, payload):
+    with ThreadPoolExecutor(max_workers=min(concurrency, os.cpu_count() + 4)) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda _: adapter.predict(payload), range(n_requests)))
+        return n_requests / (time.perf_counter() - start)
+
+
+async def bench_async(adapter, n_requests, concurrency, payload):
+    remaining = iter(range(n_requests))
+    async def worker():
+        for _ in remaining:
+            await adapter.apredict(payload)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await adapter.async_client.aclose()  # the pooled session is bound to this event loop
+    return n_requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 256])
+    parser.add_argument('--stub-latency-ms', type=float, default=20.0)
+    parser.add_argument('--pool-size', type=int, default=32, help='http.max_connections for both clients')
+    parser.add_argument('--output', help='Optional path for JSON results')
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+    url, stub = start_stub_endpoint(args.stub_latency_ms)
+    config = {
+        'provider': 'sagemaker',
+        'aws': {'region': 'eu-central-1'},
+        'sagemaker': {'endpoint_name': 'bench', 'runtime_endpoint_url': url},
+        'http': {'max_connections': args.pool_size},
+        'cost': {'per_inference_limit_usd': 0.1}
+    }
+    adapter = InferenceAdapter(config, metrics_sink=BufferedMetricsSink(InMemoryCloudWatch()))
+    payload = {'feature1': 1.0, 'feature2': 2.0}
+    results = []
+    print(f"{'concurrency':>11} {'sync req/s':>11} {'async req/s':>12}")
+    for concurrency in args.concurrency:
+        n = max(args.requests, concurrency)
+        sync_rps = bench_sync(adapter, n, concurrency, payload)
+        async_rps = asyncio.run(bench_async(adapter, n, concurrency, payload))
+        results.append({'concurrency': concurrency, 'sync_rps': sync_rps, 'async_rps': async_rps})
+        print(f"{concurrency:>11} {sync_rps:>11.1f} {async_rps:>12.1f}")
+    adapter.close()
+    stub.terminate()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'stub_latency_ms': args.stub_latency_ms, 'pool_size': args.pool_size, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
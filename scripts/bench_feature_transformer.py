@@ -0,0 +1,96 @@
+"""Latency of the fitted telco TabularTransformer against refitting on every call.
+
+A synthetic frame shaped like the telco churn data (16 categorical and 3
+numeric columns, a few missing values) is generated once. For each batch size
+the benchmark reports the median time of:
+
+- ``refit``: ``telco_churn_features(df)`` without a transformer, which fits
+  encoders, medians and the scaler on the batch itself (the previous behaviour);
+- ``transform``: a transformer fitted once on the full frame, applied to a
+  DataFrame;
+- ``transform_rows``: the same transformer on a list of dicts, as the
+  inference path calls it.
+
+    PYTHONPATH=. python scripts/bench_feature_transformer.py --batch-sizes 1 32 1024 65536
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.features.feature_engineering import TabularTransformer, telco_churn_features
+
+CATEGORICAL = {
+    'gender': ['Female', 'Male'], 'Partner': ['Yes', 'No'], 'Dependents': ['Yes', 'No'],
+    'PhoneService': ['Yes', 'No'], 'MultipleLines': ['Yes', 'No', 'No phone service'],
+    'InternetService': ['DSL', 'Fiber optic', 'No'], 'OnlineSecurity': ['Yes', 'No', 'No internet service'],
+    'OnlineBackup': ['Yes', 'No', 'No internet service'], 'DeviceProtection': ['Yes', 'No', 'No internet service'],
+    'TechSupport': ['Yes', 'No', 'No internet service'], 'StreamingTV': ['Yes', 'No', 'No internet service'],
+    'StreamingMovies': ['Yes', 'No', 'No internet service'],
+    'Contract': ['Month-to-month', 'One year', 'Two year'], 'PaperlessBilling': ['Yes', 'No'],
+    'PaymentMethod': ['Electronic check', 'Mailed check', 'Bank transfer', 'Credit card'],
+    'SeniorCitizen': ['0', '1']
+}
+
+
+def telco_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {name: pd.array(rng.choice(values, n), dtype=object) for name, values in CATEGORICAL.items()}
+    data['tenure'] = rng.integers(0, 72, n).astype(float)
+    data['MonthlyCharges'] = rng.uniform(18, 120, n)
+    data['TotalCharges'] = data['tenure'] * data['MonthlyCharges']
+    data['TotalCharges'][rng.random(n) < 0.01] = np.nan
+    data['Churn'] = pd.array(rng.choice(['Yes', 'No'], n), dtype=object)
+    return pd.DataFrame(data)
+
+
+def time_call(fn, repeats):
+    fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 32, 1024, 65536])
+    parser.add_argument('--fit-rows', type=int, default=100_000)
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--output', help='Optional path for JSON results')
+    args = parser.parse_args()
+
+    frame = telco_frame(max(args.fit_rows, max(args.batch_sizes)))
+    TabularTransformer().fit(frame.iloc[:10])  # imports sklearn outside the timed fit
+    start = time.perf_counter()
+    transformer = TabularTransformer().fit(frame.iloc[:args.fit_rows])
+    fit_ms = (time.perf_counter() - start) * 1000
+    print(f"fit on {args.fit_rows} rows: {fit_ms:.1f} ms")
+
+    results = []
+    print(f"{'batch':>7} {'refit us':>11} {'transform us':>13} {'rows us':>10} {'rows us/row':>12}")
+    for batch_size in args.batch_sizes:
+        batch = frame.iloc[:batch_size]
+        rows = batch.to_dict('records')
+        repeats = max(3, args.repeats if batch_size <= 1024 else args.repeats // 10)
+        result = {
+            'batch_size': batch_size,
+            'refit_us': time_call(lambda: telco_churn_features(batch), repeats),
+            'transform_us': time_call(lambda: transformer.transform(batch), repeats),
+            'transform_rows_us': time_call(lambda: transformer.transform_rows(rows), repeats)
+        }
+        results.append(result)
+        print(f"{batch_size:>7} {result['refit_us']:>11.1f} {result['transform_us']:>13.1f} "
+              f"{result['transform_rows_us']:>10.1f} {result['transform_rows_us'] / batch_size:>12.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'fit_rows': args.fit_rows, 'fit_ms': fit_ms, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
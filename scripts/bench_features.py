@@ -0,0 +1,140 @@
+"""Wall time and peak RSS of src/features/make_features.py, in memory versus streaming.
+
+For each --rows size a synthetic raw dataset (feature1, feature2, target,
+plus --extra-columns padding columns) is written once under --data-dir in
+row groups of --input-row-group rows. Each mode then runs as a separate
+process and its peak RSS comes from the kernel's accounting for that child.
+The in-memory path is skipped above --in-memory-max-rows, which by default
+keeps it within the memory of a small machine. When both modes ran, their
+outputs are compared column by column on raw value and validity bytes.
+Data generation and comparison run in a spawned helper process: a child's
+peak RSS includes whatever its parent held when it forked, so the parent
+that launches the timed runs stays small.
+
+    PYTHONPATH=. python scripts/bench_features.py --rows 1000000 10000000 100000000 --output features.json
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import yaml
+
+CHUNK_ROWS = 1_000_000
+
+
+def write_dataset(path, rows, extra_columns, row_group_size, seed=0):
+    rng = np.random.default_rng(seed)
+    schema = pa.schema(
+        [('feature1', pa.float64()), ('feature2', pa.float64()), ('target', pa.int64())]
+        + [(f"extra{i}", pa.float64()) for i in range(extra_columns)]
+    )
+    with pq.ParquetWriter(path, schema) as writer:
+        for start in range(0, rows, CHUNK_ROWS):
+            n = min(CHUNK_ROWS, rows - start)
+            columns = [rng.normal(size=n), rng.normal(size=n), rng.integers(0, 2, n)]
+            columns += [rng.normal(size=n) for _ in range(extra_columns)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema), row_group_size)
+
+
+def column_digests(path):
+    """SHA-256 of every column's values and validity, in row order, read batch by batch."""
+    digests = {}
+    for batch in ds.dataset(path, format='parquet').to_batches(use_threads=False):
+        for name, column in zip(batch.schema.names, batch.columns):
+            values, validity = digests.setdefault(name, (hashlib.sha256(), hashlib.sha256()))
+            values.update(column.to_numpy(zero_copy_only=False).tobytes())
+            validity.update(pc.is_null(column).to_numpy(zero_copy_only=False).tobytes())
+    return {name: (values.hexdigest(), validity.hexdigest())
+            for name, (values, validity) in digests.items()}
+
+
+def run_mode(mode, config_path, input_path, output_path):
+    command = [sys.executable, '-m', 'src.features.make_features', config_path,
+               '--input', input_path, '--output', output_path, f"--{mode}"]
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError(f"{mode} run failed with status {status}")
+    # ru_maxrss is in kilobytes on Linux.
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000, 100_000_000])
+    parser.add_argument('--extra-columns', type=int, default=4)
+    parser.add_argument('--input-row-group', type=int, default=1 << 20)
+    parser.add_argument('--in-memory-max-rows', type=int, default=20_000_000)
+    parser.add_argument('--workers', type=int, default=None, help='Streaming threads (default: all cores)')
+    parser.add_argument('--batch-size', type=int, default=65536)
+    parser.add_argument('--row-group-size', type=int, default=1 << 20)
+    parser.add_argument('--rows-per-file', type=int, default=1 << 22)
+    parser.add_argument('--data-dir', default=None, help='Where to keep generated data (default: a temp dir)')
+    parser.add_argument('--output', help='Optional path for JSON results')
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='bench_features_')
+    os.makedirs(data_dir, exist_ok=True)
+    with open('configs/dev.yaml') as f:
+        config = yaml.safe_load(f)
+    config['features'] = {
+        'streaming': True,
+        'batch_size': args.batch_size,
+        'row_group_size': args.row_group_size,
+        'rows_per_file': args.rows_per_file,
+        'workers': args.workers
+    }
+    config_path = os.path.join(data_dir, 'config.yaml')
+    with open(config_path, 'w') as f:
+        yaml.safe_dump(config, f)
+
+    helper = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+    results = []
+    print(f"{'rows':>12} {'mode':>10} {'seconds':>9} {'Mrows/s':>8} {'peak MB':>9}")
+    for rows in args.rows:
+        input_path = os.path.join(data_dir, f"raw_{rows}.parquet")
+        if not os.path.exists(input_path):
+            helper.submit(write_dataset, input_path, rows, args.extra_columns,
+                          args.input_row_group).result()
+        outputs = {}
+        for mode in ('in-memory', 'streaming'):
+            if mode == 'in-memory' and rows > args.in_memory_max_rows:
+                continue
+            output_path = os.path.join(data_dir, f"features_{rows}_{mode}")
+            output_path += '.parquet' if mode == 'in-memory' else ''
+            seconds, peak_mb = run_mode(mode, config_path, input_path, output_path)
+            outputs[mode] = output_path
+            results.append({'rows': rows, 'mode': mode, 'seconds': seconds,
+                            'rows_per_s': rows / seconds, 'peak_rss_mb': peak_mb})
+            print(f"{rows:>12} {mode:>10} {seconds:>9.2f} {rows / seconds / 1e6:>8.2f} {peak_mb:>9.0f}")
+        if len(outputs) == 2:
+            digests = helper.map(column_digests, [outputs['in-memory'], outputs['streaming']])
+            identical = len(set(map(json.dumps, digests))) == 1
+            for result in results[-2:]:
+                result['identical'] = identical
+            print(f"{rows:>12} outputs identical: {identical}")
+    helper.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'cpu_count': os.cpu_count(), 'config': config['features'], 'results': results},
+                      f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
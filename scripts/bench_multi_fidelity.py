@@ -0,0 +1,105 @@
+"""Time to a target accuracy: multi-fidelity searches against the full 50-trial search.
+
+A synthetic binary classification set (``make_classification``) is split
+80/20 as the tuners do. For each model type three searches run with the
+same trial budget and seed:
+
+- ``full``: every trial picks ``n_estimators`` in 50-200 and is
+  cross-validated at that size without pruning, i.e. the previous search;
+- ``halving``: ``tune(search='halving')``, trees as the resource from
+  --min-resource to --max-resource, promoting 1 / --reduction-factor;
+- ``hyperband``: ``tune(search='hyperband')`` over the same resource.
+
+The target is the full search's best cross-validation accuracy less
+--tolerance. For each search the report gives its total wall time, the
+wall time until a completed trial first reached the target (from the
+trials' completion times), trials completed and pruned, the best
+cross-validation accuracy, and the test accuracy of a model refitted with
+the best parameters.
+
+    PYTHONPATH=. python scripts/bench_multi_fidelity.py --rows 2000 --n-trials 50 --output mf.json
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+
+import optuna
+from sklearn.datasets import make_classification
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+
+from src.train.tuning import build_model, tune
+
+
+def time_to_target(study, started, target):
+    complete = sorted((t for t in study.trials if t.state == optuna.trial.TrialState.COMPLETE),
+                      key=lambda t: t.datetime_complete)
+    for trial in complete:
+        if trial.value >= target:
+            return (trial.datetime_complete - started).total_seconds()
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--features', type=int, default=20)
+    parser.add_argument('--models', nargs='+', default=['randomforest', 'xgboost'])
+    parser.add_argument('--n-trials', type=int, default=50)
+    parser.add_argument('--min-resource', type=int, default=25)
+    parser.add_argument('--max-resource', type=int, default=200)
+    parser.add_argument('--reduction-factor', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=0.005)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Optional path for JSON results')
+    args = parser.parse_args()
+
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    X, y = make_classification(n_samples=args.rows, n_features=args.features, n_informative=8,
+                               flip_y=0.05, random_state=args.seed)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    results = []
+    print(f"{'model':>12} {'search':>9} {'wall s':>7} {'to target s':>11} {'complete':>8} "
+          f"{'pruned':>6} {'best cv':>7} {'test':>6}")
+    for model_type in args.models:
+        target = None
+        for search in ('full', 'halving', 'hyperband'):
+            started = datetime.now()
+            start = time.perf_counter()
+            study = tune(X_train, y_train, model_type, n_trials=args.n_trials, seed=args.seed,
+                         search=search, pruning=False, min_resource=args.min_resource,
+                         max_resource=args.max_resource, reduction_factor=args.reduction_factor)
+            elapsed = time.perf_counter() - start
+            if target is None:
+                target = study.best_value - args.tolerance
+            states = [t.state for t in study.trials]
+            model = build_model(model_type, study.best_params).fit(X_train, y_train)
+            result = {
+                'model': model_type,
+                'search': search,
+                'wall_s': elapsed,
+                'target': target,
+                'time_to_target_s': time_to_target(study, started, target),
+                'complete': states.count(optuna.trial.TrialState.COMPLETE),
+                'pruned': states.count(optuna.trial.TrialState.PRUNED),
+                'best_cv_accuracy': study.best_value,
+                'test_accuracy': accuracy_score(y_test, model.predict(X_test))
+            }
+            results.append(result)
+            to_target = result['time_to_target_s']
+            print(f"{model_type:>12} {search:>9} {elapsed:>7.1f} "
+                  f"{'-' if to_target is None else f'{to_target:.1f}':>11} "
+                  f"{result['complete']:>8} {result['pruned']:>6} "
+                  f"{result['best_cv_accuracy']:>7.4f} {result['test_accuracy']:>6.4f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'rows': args.rows, 'n_trials': args.n_trials, 'tolerance': args.tolerance,
+                       'min_resource': args.min_resource, 'max_resource': args.max_resource,
+                       'reduction_factor': args.reduction_factor, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
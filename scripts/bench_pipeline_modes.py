@@ -0,0 +1,171 @@
+"""End-to-end wall time and peak memory of the data stages, as subprocesses and in-process.
+
+Synthetic raw data (--rows rows of ``feature1``, ``feature2`` and ``target``)
+and an evaluation file of a fifth of that are written as local parquet. The
+pipeline's ingest, features, validation, evaluation and explainability
+steps (``src.app.run_pipeline``), pointed at those files, then run through
+``run_dag`` in each mode, each mode in a fresh interpreter and with an
+empty step store:
+
+- ``subprocess``: every step starts its own interpreter and reads its
+  input from storage, so the raw file is read by ingest, features and
+  validation, and the evaluation file by evaluation and explainability;
+- ``in-process``: the steps run as functions in one interpreter, ingest
+  reads the raw file once and features and validation get its Arrow table,
+  memory-mapped from the step store's IPC file.
+
+Reported per mode: wall time of the run, and peak memory sampled every
+--interval seconds as the proportional set size (``Pss``) summed over the
+run's process tree, so steps running side by side count together and
+pages shared between processes (the interpreter's libraries, a mapped IPC
+file) count once. The largest single process's peak resident set
+(``VmHWM``) is reported too.
+
+    PYTHONPATH=. python scripts/bench_pipeline_modes.py --rows 5000000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.app.run_pipeline import (_evaluation, _explainability, _features, _ingest,
+                                  _validation)
+from src.pipelines.dag import Step, StepStore, format_report, run_dag
+
+MODES = ('subprocess', 'in-process')
+
+
+def write_data(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    table = pa.table({
+        'feature1': rng.normal(size=rows),
+        'feature2': rng.normal(size=rows),
+        'target': rng.integers(0, 2, size=rows),
+    })
+    pq.write_table(table, path, row_group_size=1 << 20)
+
+
+def data_steps(config_path, raw_data, eval_data, output):
+    python = sys.executable
+    config = {'features': {'streaming': False}}
+    return [
+        Step('ingest', [python, 'src/ingest/load.py', config_path, '--input', raw_data],
+             function=_ingest(config, raw_data)),
+        Step('features', [python, '-m', 'src.features.make_features', config_path, '--in-memory',
+                          '--input', raw_data, '--output', output],
+             after=['ingest'], function=_features(config, raw_data, output)),
+        Step('validation', [python, '-m', 'src.validation.validators', config_path,
+                            '--path', raw_data],
+             after=['ingest'], function=_validation),
+        Step('evaluation', [python, 'src/eval/evaluate.py', config_path, '--input', eval_data],
+             after=['features', 'validation'], function=_evaluation(config, eval_data)),
+        Step('explainability', [python, 'src/explainability/explain.py', config_path,
+                                '--input', eval_data],
+             after=['features', 'validation'], function=_explainability(config, eval_data)),
+    ]
+
+
+def run_mode(args):
+    """Entry point of the child interpreter that runs one mode."""
+    steps = data_steps(args.config, os.path.join(args.dir, 'raw.parquet'),
+                       os.path.join(args.dir, 'eval.parquet'),
+                       os.path.join(args.dir, 'features.parquet'))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [os.getcwd(), os.environ.get('PYTHONPATH')])
+    ))
+    store = StepStore(tempfile.mkdtemp(dir=args.dir))
+    start = time.perf_counter()
+    results = run_dag(steps, store, max_workers=args.max_workers, env=env,
+                      in_process=args.mode == 'in-process')
+    seconds = time.perf_counter() - start
+    print(format_report(results), file=sys.stderr)
+    print(json.dumps({'seconds': seconds}))
+
+
+def _tree(pid):
+    pids = [pid]
+    for p in pids:
+        try:
+            for task in os.listdir(f'/proc/{p}/task'):
+                with open(f'/proc/{p}/task/{task}/children') as f:
+                    pids.extend(int(c) for c in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def _read_kb(path, key):
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(key + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def measure(args, mode):
+    command = [sys.executable, __file__, '--child', mode, '--dir', args.dir,
+               '--config', args.config, '--max-workers', str(args.max_workers)]
+    child = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    peaks = {'pss_kb': 0, 'hwm_kb': 0}
+    done = threading.Event()
+    def sample():
+        while not done.is_set():
+            pids = _tree(child.pid)
+            peaks['pss_kb'] = max(peaks['pss_kb'], sum(
+                _read_kb(f'/proc/{p}/smaps_rollup', 'Pss') for p in pids
+            ))
+            peaks['hwm_kb'] = max([peaks['hwm_kb']] + [
+                _read_kb(f'/proc/{p}/status', 'VmHWM') for p in pids
+            ])
+            done.wait(args.interval)
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    out, _ = child.communicate()
+    done.set()
+    sampler.join()
+    if child.returncode != 0:
+        raise RuntimeError(f'{mode} run failed with exit code {child.returncode}')
+    return {'mode': mode, 'seconds': json.loads(out.splitlines()[-1])['seconds'],
+            'peak_pss_mb': peaks['pss_kb'] / 1024, 'peak_rss_mb': peaks['hwm_kb'] / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--config', default='configs/dev.yaml')
+    parser.add_argument('--max-workers', type=int, default=4)
+    parser.add_argument('--interval', type=float, default=0.02)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        args.mode = args.child
+        run_mode(args)
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        args.dir = directory
+        write_data(os.path.join(directory, 'raw.parquet'), args.rows)
+        write_data(os.path.join(directory, 'eval.parquet'), args.rows // 5, seed=1)
+        print(f"rows={args.rows} max_workers={args.max_workers} cpus={os.cpu_count()}")
+        print(f"{'mode':<12} {'wall s':>8} {'peak Pss MB':>12} {'peak RSS MB':>12}")
+        for _ in range(args.repeat):
+            for mode in MODES:
+                r = measure(args, mode)
+                print(f"{r['mode']:<12} {r['seconds']:>8.2f} {r['peak_pss_mb']:>12.0f} "
+                      f"{r['peak_rss_mb']:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
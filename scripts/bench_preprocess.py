@@ -0,0 +1,70 @@
+"""Per-call latency of the derived features on the request path versus through pandas.
+
+For each batch size the benchmark times, as the median over --repeats calls:
+
+- ``rows``: ``preprocess_request`` on a single payload (batch size 1) or on
+  ``{"instances": [...]}``, which evaluates the feature definitions on dicts;
+- ``pandas``: building a DataFrame from the same rows, ``add_features`` and
+  converting back to records, i.e. reusing the batch code per request.
+
+The two paths are checked to produce the same values before timing.
+
+    PYTHONPATH=. python scripts/bench_preprocess.py --batch-sizes 1 8 32 256
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.features.make_features import add_features
+from src.inference.preprocessor import preprocess_request
+
+
+def time_call(fn, repeats):
+    fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32, 256])
+    parser.add_argument('--repeats', type=int, default=2000)
+    parser.add_argument('--output', help='Optional path for JSON results')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = []
+    print(f"{'batch':>6} {'rows us':>9} {'pandas us':>10} {'speed-up':>9}")
+    for batch_size in args.batch_sizes:
+        rows = [{'feature1': float(a), 'feature2': float(b)} for a, b in rng.normal(size=(batch_size, 2))]
+        payload = rows[0] if batch_size == 1 else {'instances': rows}
+        def via_rows():
+            return preprocess_request(payload)
+        def via_pandas():
+            return add_features(pd.DataFrame(rows)).to_dict('records')
+        computed = via_rows()
+        computed = [computed] if batch_size == 1 else computed['instances']
+        assert computed == via_pandas()
+        result = {
+            'batch_size': batch_size,
+            'rows_us': time_call(via_rows, args.repeats),
+            'pandas_us': time_call(via_pandas, max(10, args.repeats // 10))
+        }
+        results.append(result)
+        print(f"{batch_size:>6} {result['rows_us']:>9.2f} {result['pandas_us']:>10.1f} "
+              f"{result['pandas_us'] / result['rows_us']:>8.0f}x")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Cold-start time of Dockerfile.inference's entry point, up to the first successful prediction.
+
+Each trial starts the Dockerfile's CMD as a fresh process (on a free port),
+polls /health, /ready and POST /predict, and records when each first
+succeeded. The server runs with ``ML_ENV``'s config switched to the local
+provider, so no AWS access is needed and the numbers are process start-up
+only. ``--no-warm-up`` defers adapter construction to the first request.
+
+    PYTHONPATH=. python scripts/bench_startup.py --trials 5 --env dev
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import yaml
+
+
+def entry_point(dockerfile):
+    with open(dockerfile) as f:
+        cmd = [line for line in f if line.startswith('CMD ')][-1]
+    return json.loads(cmd[len('CMD '):])
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def ok(url, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=2) as response:
+            return response.status == 200
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return False
+
+
+def run_trial(command, env, payload, timeout_s):
+    port = free_port()
+    command = [sys.executable, '-m'] + command if command[0] == 'uvicorn' else command
+    command = [str(port) if arg == '8080' else arg for arg in command]
+    command = ['127.0.0.1' if arg == '0.0.0.0' else arg for arg in command]
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    timings = {}
+    try:
+        while 'predict_s' not in timings:
+            if time.perf_counter() - start > timeout_s:
+                raise TimeoutError(f"No successful prediction within {timeout_s}s")
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode}")
+            if 'health_s' not in timings and ok(f"{base}/health"):
+                timings['health_s'] = time.perf_counter() - start
+            if 'health_s' in timings and 'ready_s' not in timings and ok(f"{base}/ready"):
+                timings['ready_s'] = time.perf_counter() - start
+            if 'health_s' in timings and ok(f"{base}/predict", payload):
+                timings['predict_s'] = time.perf_counter() - start
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait()
+    timings.setdefault('ready_s', timings['predict_s'])
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dockerfile', default='Dockerfile.inference')
+    parser.add_argument('--env', default='dev')
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--no-warm-up', action='store_true')
+    parser.add_argument('--timeout-s', type=float, default=120.0)
+    parser.add_argument('--output', help='Optional path for JSON results')
+    args = parser.parse_args()
+
+    with open(os.path.join('configs', f"{args.env}.yaml")) as f:
+        config = yaml.safe_load(f)
+    config['provider'] = 'local'
+    config.setdefault('startup', {})['warm_up'] = not args.no_warm_up
+    config.setdefault('routing', {})['enabled'] = False
+    with tempfile.NamedTemporaryFile('w', suffix='.yaml', delete=False) as f:
+        yaml.safe_dump(config, f)
+        config_file = f.name
+    env = dict(os.environ, ML_CONFIG=config_file, PYTHONPATH=os.getcwd(), AWS_DEFAULT_REGION='us-east-1')
+
+    command = entry_point(args.dockerfile)
+    try:
+        trials = [run_trial(command, env, {'input': 'bench'}, args.timeout_s) for _ in range(args.trials)]
+    finally:
+        os.remove(config_file)
+    summary = {
+        'command': command,
+        'env': args.env,
+        'warm_up': not args.no_warm_up,
+        'trials': trials,
+        'median': {key: statistics.median(t[key] for t in trials) for key in ('health_s', 'ready_s', 'predict_s')}
+    }
+    for key, value in summary['median'].items():
+        print(f"{key:>10}: {value * 1000:8.0f} ms (median of {args.trials})")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Latency of CompiledForest vs sklearn/XGBoost predict_proba at several batch sizes.
+
+Models are trained on synthetic data shaped like the tabular heart/telco
+problems with the hyperparameters used in src/train/train.py.
+
+    PYTHONPATH=. python scripts/bench_tree_engine.py --batch-sizes 1 32 4096
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+
+from src.inference.tree_engine import compile_model
+
+
+def time_call(fn, X, repeats):
+    fn(X)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 32, 4096])
+    parser.add_argument('--n-features', type=int, default=13)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--output', help='Optional path for JSON results')
+    args = parser.parse_args()
+
+    X, y = make_classification(n_samples=20000, n_features=args.n_features, random_state=0)
+    models = {'randomforest': RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42).fit(X, y)}
+    try:
+        from xgboost import XGBClassifier
+        models['xgboost'] = XGBClassifier(n_estimators=100, max_depth=6, eval_metric='logloss').fit(X, y)
+    except ImportError:
+        pass
+
+    results = []
+    print(f"{'model':>12} {'batch':>6} {'native ms':>10} {'f64 ms':>8} {'f32 ms':>8} {'speedup':>8} {'max |diff|':>11}")
+    for name, model in models.items():
+        f64 = compile_model(model, dtype=np.float64)
+        f32 = compile_model(model, dtype=np.float32)
+        for batch in args.batch_sizes:
+            X_batch = X[:batch]
+            native_ms = time_call(model.predict_proba, X_batch, args.repeats)
+            f64_ms = time_call(f64.predict_proba, X_batch, args.repeats)
+            f32_ms = time_call(f32.predict_proba, X_batch, args.repeats)
+            diff = float(np.abs(f32.predict_proba(X_batch) - model.predict_proba(X_batch)).max())
+            results.append({
+                'model': name, 'batch_size': batch, 'native_ms': native_ms,
+                'compiled_f64_ms': f64_ms, 'compiled_f32_ms': f32_ms, 'max_abs_diff_f32': diff
+            })
+            print(f"{name:>12} {batch:>6} {native_ms:>10.3f} {f64_ms:>8.3f} {f32_ms:>8.3f} "
+                  f"{native_ms / min(f64_ms, f32_ms):>7.1f}x {diff:>11.2e}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
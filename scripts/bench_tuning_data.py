@@ -0,0 +1,130 @@
+"""Per-trial data overhead and worker memory: pickled DataFrames versus TuningData.
+
+A synthetic float64 training frame of --rows x --features is built once.
+Each mode then starts --workers spawned processes, as ``tune`` does, and
+runs --trials five-fold trials in each with an estimator whose fit and
+predict only validate their input the way scikit-learn's forests do
+(float32, copied unless it already is). The trial time is therefore the
+data overhead alone:
+
+- ``pickled``: the previous path; every worker is sent the DataFrame and
+  labels, and each trial splits them with the CV splitter and copies the
+  training and validation rows with ``iloc``;
+- ``shared``: workers are sent a ``TuningData`` (its directory name) and
+  read each fold as views of the memory-mapped float32 arrays.
+
+Per worker it reports the time from submission until the data was usable,
+the median trial time, the peak resident set (``VmHWM``, which counts the
+mapped file's pages a worker touched) and, at the end, the proportional
+set size (``Pss``, shared pages divided among the processes mapping them)
+and private memory. Workers are spawned, so their peaks start from a fresh
+interpreter and not from this process.
+
+    PYTHONPATH=. python scripts/bench_tuning_data.py --rows 2000000 --workers 2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import check_cv
+from sklearn.utils import check_array
+
+from src.train.tuning_data import TuningData
+
+
+class InputOnly(ClassifierMixin, BaseEstimator):
+    def fit(self, X, y):
+        check_array(X, dtype=np.float32)
+        self.classes_ = np.unique(y)
+        return self
+    def predict(self, X):
+        return np.full(len(check_array(X, dtype=np.float32)), self.classes_[0])
+
+
+def memory_mb():
+    values = {}
+    for name in ('/proc/self/status', '/proc/self/smaps_rollup'):
+        with open(name) as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                if rest.strip().endswith('kB'):
+                    values[key] = int(rest.split()[0]) / 1024
+    return {'peak_rss_mb': values['VmHWM'], 'pss_mb': values['Pss'],
+            'private_mb': values['Private_Clean'] + values['Private_Dirty']}
+
+
+def run_trials(submitted, payload, trials):
+    ready = time.time() - submitted
+    timings = []
+    for _ in range(trials):
+        start = time.perf_counter()
+        scores = []
+        if isinstance(payload, TuningData):
+            for X_train, y_train, X_valid, y_valid in payload.folds():
+                model = InputOnly().fit(X_train, y_train)
+                scores.append(accuracy_score(y_valid, model.predict(X_valid)))
+        else:
+            X, y = payload
+            for train, valid in check_cv(5, y, classifier=True).split(X, y):
+                model = InputOnly().fit(X.iloc[train], y.iloc[train])
+                scores.append(accuracy_score(y.iloc[valid], model.predict(X.iloc[valid])))
+        timings.append(time.perf_counter() - start)
+    return dict(memory_mb(), ready_s=ready, trial_ms=float(np.median(timings)) * 1000)
+
+
+def run_mode(payload, workers, trials):
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        # Start the interpreters first so ready_s measures the data, not the imports.
+        list(pool.map(time.sleep, [0.5] * workers))
+        futures = [pool.submit(run_trials, time.time(), payload, trials) for _ in range(workers)]
+        return [future.result() for future in futures]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--features', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--data-dir', help='Where TuningData is written (default: a temp dir)')
+    parser.add_argument('--output', help='Optional path for JSON results')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(args.rows, args.features)),
+                     columns=[f"f{i}" for i in range(args.features)])
+    y = pd.Series(rng.integers(0, 2, args.rows))
+    print(f"frame: {X.memory_usage().sum() / 2**20:.0f} MB float64")
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.data_dir) as tmp:
+        start = time.perf_counter()
+        data = TuningData.create(X, y, os.path.join(tmp, 'data'))
+        create_s = time.perf_counter() - start
+        print(f"TuningData.create: {create_s:.2f} s")
+        print(f"{'mode':>8} {'worker':>6} {'ready s':>8} {'trial ms':>9} {'peak MB':>8} "
+              f"{'Pss MB':>7} {'private MB':>11}")
+        for mode, payload in (('pickled', (X, y)), ('shared', data)):
+            for worker, result in enumerate(run_mode(payload, args.workers, args.trials)):
+                results.append(dict(result, mode=mode, worker=worker))
+                print(f"{mode:>8} {worker:>6} {result['ready_s']:>8.2f} {result['trial_ms']:>9.1f} "
+                      f"{result['peak_rss_mb']:>8.0f} {result['pss_mb']:>7.0f} "
+                      f"{result['private_mb']:>11.0f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'rows': args.rows, 'features': args.features, 'workers': args.workers,
+                       'create_s': create_s, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""Closed-loop load test of the inference server (or src/app/app.py) against a stubbed provider.
+
+The target runs under uvicorn in its own process. Its provider is a local
+SageMaker-compatible stub that answers after --stub-latency-ms (or the
+in-process mock with --provider local). Each concurrency level runs for
+--duration-s; every worker sends its next request as soon as the previous
+one returns. Requests follow --mix (e.g. ``predict=0.9,batch=0.1``) with
+payloads padded to --payload-bytes, or replay the JSON lines in --replay.
+
+The JSON report holds throughput, p50/p95/p99/p999, error rate per level and
+the knee: the last level whose throughput still grew by at least --knee-gain
+over the previous one. Each level is checked against the config's
+monitoring.latency_threshold_ms (p99) and error_rate_threshold; --check
+exits non-zero if the knee level misses either. --baseline prints p99 and
+throughput deltas against an earlier report.
+
+    PYTHONPATH=. python scripts/loadtest.py --concurrency 1 4 16 64 --duration-s 10 --output load.json
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import aiohttp
+import numpy as np
+import yaml
+
+from scripts.bench_async_predict import start_stub_endpoint
+
+TARGETS = {'server': 'src.inference.server:app', 'app': 'src.app.app:app'}
+PERCENTILES = {'p50_ms': 50, 'p95_ms': 95, 'p99_ms': 99, 'p999_ms': 99.9}
+
+
+def summarize(concurrency, latencies_ms, errors, elapsed_s, threshold_ms, error_rate_threshold):
+    total = len(latencies_ms) + errors
+    summary = {
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': errors,
+        'error_rate': errors / total if total else 0.0,
+        'throughput_rps': len(latencies_ms) / elapsed_s if elapsed_s else 0.0
+    }
+    for name, q in PERCENTILES.items():
+        summary[name] = float(np.percentile(latencies_ms, q)) if latencies_ms else None
+    summary['max_ms'] = max(latencies_ms) if latencies_ms else None
+    summary['within_slo'] = (
+        summary['p99_ms'] is not None and summary['p99_ms'] <= threshold_ms
+        and summary['error_rate'] <= error_rate_threshold
+    )
+    return summary
+
+
+def find_knee(levels, min_gain=0.1):
+    """Last level whose throughput grew by at least ``min_gain`` over the level before it."""
+    if not levels:
+        return None
+    knee = levels[0]
+    for previous, current in zip(levels, levels[1:]):
+        if current['throughput_rps'] < previous['throughput_rps'] * (1 + min_gain):
+            break
+        knee = current
+    return knee
+
+
+def load_payloads(replay_path, payload_bytes):
+    if replay_path:
+        payloads = []
+        with open(replay_path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    payloads.append(record.get('payload', record) if isinstance(record, dict) else record)
+        return payloads
+    return [{'feature1': 1.0, 'feature2': 2.0, 'input': 'x' * size} for size in payload_bytes]
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ('predict', 'batch'):
+            raise ValueError(f"Unknown request type {name!r} in --mix")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def run_level(base_url, concurrency, duration_s, payloads, mix, batch_rows, seed):
+    rng = random.Random(seed)
+    kinds, weights = list(mix), list(mix.values())
+    latencies, errors = [], 0
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60)) as session:
+        deadline = time.perf_counter() + duration_s
+        async def one_request():
+            kind = rng.choices(kinds, weights)[0]
+            if kind == 'predict':
+                data = json.dumps(rng.choice(payloads)).encode()
+                url, headers = f"{base_url}/predict", {'Content-Type': 'application/json'}
+            else:
+                lines = b''.join(json.dumps(rng.choice(payloads)).encode() + b'\n' for _ in range(batch_rows))
+                url, headers = f"{base_url}/predict/batch", {'Content-Encoding': 'gzip'}
+                data = gzip.compress(lines)
+            async with session.post(url, data=data, headers=headers) as response:
+                body = await response.read()
+                return response.status == 200 and b'"error"' not in body
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    ok = await one_request()
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    ok = False
+                if ok:
+                    latencies.append((time.perf_counter() - start) * 1000)
+                else:
+                    errors += 1
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_target(target, config, workers, extra_env):
+    with tempfile.NamedTemporaryFile('w', suffix='.yaml', delete=False) as f:
+        yaml.safe_dump(config, f)
+    port = free_port()
+    env = dict(os.environ, ML_CONFIG=f.name, PYTHONPATH=os.getcwd(), **extra_env)
+    command = [sys.executable, '-m', 'uvicorn', TARGETS[target], '--host', '127.0.0.1', '--port', str(port),
+               '--workers', str(workers), '--log-level', 'warning']
+    process = subprocess.Popen(command, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    ready_path = '/ready' if target == 'server' else '/health'
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{target} exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"{base_url}{ready_path}", timeout=1) as response:
+                if response.status == 200:
+                    return base_url, process, f.name
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"{target} did not become ready")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--target', choices=sorted(TARGETS), default='server')
+    parser.add_argument('--env', default='dev', help='Config whose monitoring thresholds and settings are used')
+    parser.add_argument('--provider', choices=['sagemaker', 'local'], default='sagemaker')
+    parser.add_argument('--stub-latency-ms', type=float, default=20.0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--duration-s', type=float, default=10.0)
+    parser.add_argument('--warmup-s', type=float, default=2.0)
+    parser.add_argument('--mix', default='predict=1', help='Weighted request types, e.g. predict=0.9,batch=0.1')
+    parser.add_argument('--batch-rows', type=int, default=64)
+    parser.add_argument('--payload-bytes', type=int, nargs='+', default=[64])
+    parser.add_argument('--replay', help='JSON lines file of payloads (or {"payload": ...} records) to replay')
+    parser.add_argument('--knee-gain', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', help='Earlier JSON report to compare against')
+    parser.add_argument('--check', action='store_true', help='Exit 1 if the knee level misses the SLO')
+    parser.add_argument('--output', help='Optional path for JSON results')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    if args.target == 'app' and 'batch' in mix:
+        parser.error('src/app/app.py has no /predict/batch endpoint')
+    with open(os.path.join('configs', f"{args.env}.yaml")) as f:
+        config = yaml.safe_load(f)
+    monitoring = config.get('monitoring', {})
+    threshold_ms = monitoring.get('latency_threshold_ms', 500)
+    error_rate_threshold = monitoring.get('error_rate_threshold', 0.02)
+    payloads = load_payloads(args.replay, args.payload_bytes)
+
+    stub_url, stub = start_stub_endpoint(args.stub_latency_ms)
+    # The stub also accepts the metrics sink's CloudWatch calls, keeping them off the network.
+    extra_env = {'AWS_ACCESS_KEY_ID': 'bench', 'AWS_SECRET_ACCESS_KEY': 'bench', 'AWS_ENDPOINT_URL_CLOUDWATCH': stub_url}
+    config['provider'] = args.provider
+    config['sagemaker'] = dict(config.get('sagemaker', {}), endpoint_name='bench', runtime_endpoint_url=stub_url)
+    config.setdefault('routing', {})['enabled'] = False
+    config.setdefault('local_model', {})['enabled'] = False
+    base_url, server, config_file = start_target(args.target, config, args.workers, extra_env)
+
+    levels = []
+    try:
+        if args.warmup_s:
+            asyncio.run(run_level(base_url, max(args.concurrency), args.warmup_s, payloads, mix, args.batch_rows, -1))
+        print(f"{'conc':>5} {'req/s':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'p999':>8} {'errors':>7} {'SLO':>4}")
+        for concurrency in args.concurrency:
+            latencies, errors, elapsed = asyncio.run(run_level(
+                base_url, concurrency, args.duration_s, payloads, mix, args.batch_rows, args.seed + concurrency
+            ))
+            level = summarize(concurrency, latencies, errors, elapsed, threshold_ms, error_rate_threshold)
+            levels.append(level)
+            fmt = lambda v: f"{v:8.1f}" if v is not None else f"{'-':>8}"
+            print(f"{concurrency:>5} {level['throughput_rps']:>9.1f} {fmt(level['p50_ms'])} {fmt(level['p95_ms'])} "
+                  f"{fmt(level['p99_ms'])} {fmt(level['p999_ms'])} {errors:>7} {'ok' if level['within_slo'] else 'MISS':>4}")
+    finally:
+        server.terminate()
+        server.wait()
+        os.remove(config_file)
+        stub.terminate()
+
+    knee = find_knee(levels, args.knee_gain)
+    report = {
+        'target': args.target,
+        'provider': args.provider,
+        'stub_latency_ms': args.stub_latency_ms if args.provider == 'sagemaker' else None,
+        'workers': args.workers,
+        'mix': mix,
+        'payloads': args.replay or args.payload_bytes,
+        'duration_s': args.duration_s,
+        'latency_threshold_ms': threshold_ms,
+        'error_rate_threshold': error_rate_threshold,
+        'levels': levels,
+        'knee': knee,
+        'max_concurrency_within_slo': max((l['concurrency'] for l in levels if l['within_slo']), default=None)
+    }
+    if knee is not None:
+        print(f"knee at concurrency {knee['concurrency']}: {knee['throughput_rps']:.1f} req/s, p99 {knee['p99_ms']:.1f} ms "
+              f"(threshold {threshold_ms} ms)")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {l['concurrency']: l for l in json.load(f)['levels']}
+        for level in levels:
+            old = baseline.get(level['concurrency'])
+            if old and old['p99_ms'] and level['p99_ms']:
+                print(f"conc {level['concurrency']:>4}: p99 {level['p99_ms'] - old['p99_ms']:+8.1f} ms, "
+                      f"throughput {level['throughput_rps'] / old['throughput_rps'] - 1:+.1%}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.check and (knee is None or not knee['within_slo']):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 #!/bin/bash
 set -e
 DATASET_PATH=$1
-SNAPSHOT_ID=$(md5sum $DATASET_PATH | awk '{print $1}')
+CONFIG=${2:-configs/dev.yaml}
+SNAPSHOT_ID=$(python -m src.utils.fingerprint "$DATASET_PATH" --config "$CONFIG")
 echo "Snapshot ID: $SNAPSHOT_ID"
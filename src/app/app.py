@@ -1,14 +1,20 @@
-from fastapi import FastAPI, UploadFile, File
-import gradio as gr
-import pandas as pd
-from src.inference.adapter import InferenceAdapter
-import yaml
+import threading
+from fastapi import FastAPI
+from src.utils.config import load_config
 
 app = FastAPI()
 
-with open("configs/dev.yaml") as f:
-    config = yaml.safe_load(f)
-adapter = InferenceAdapter(config)
+config = load_config()
+_adapter = None
+_adapter_lock = threading.Lock()
+
+def get_adapter():
+    global _adapter
+    with _adapter_lock:
+        if _adapter is None:
+            from src.inference.adapter import InferenceAdapter
+            _adapter = InferenceAdapter(config)
+    return _adapter
 
 @app.get("/health")
 def health():
@@ -16,12 +22,13 @@ def health():
 
 @app.post("/predict")
 def predict(data: dict):
-    result = adapter.predict(data)
+    result = get_adapter().predict(data)
     return result
 
 def gradio_ui():
+    import gradio as gr
     def predict_gradio(input_data):
-        result = adapter.predict({"input": input_data})
+        result = get_adapter().predict({"input": input_data})
         return result.get("prediction", "No prediction")
     demo = gr.Interface(
         fn=predict_gradio,
@@ -33,6 +40,5 @@ def gradio_ui():
 
 if __name__ == "__main__":
     import uvicorn
-    import threading
     threading.Thread(target=gradio_ui).start()
     uvicorn.run(app, host="0.0.0.0", port=8080)
\ No newline at end of file
@@ -1,24 +1,162 @@
+import argparse
 import os
-import subprocess
-
-def run_all():
-    print("Step 1: Data Ingestion...")
-    subprocess.run(["python", "src/ingest/load.py", "configs/dev.yaml"])
-    print("Step 2: Feature Engineering...")
-    subprocess.run(["python", "src/features/make_features.py", "configs/dev.yaml"])
-    print("Step 3: Data Validation...")
-    subprocess.run(["python", "src/validation/validators.py"])
-    print("Step 4: Hyperparameter Tuning...")
-    subprocess.run(["python", "src/train/optuna_tune.py", "--data", "data/heart-disease.csv", "--target", "target"])
-    print("Step 5: Model Training...")
-    subprocess.run(["python", "src/train/train.py", "--config", "configs/dev.yaml"])
-    print("Step 6: Model Evaluation...")
-    subprocess.run(["python", "src/eval/evaluate.py", "configs/dev.yaml"])
-    print("Step 7: Explainability...")
-    subprocess.run(["python", "src/explainability/explain.py", "configs/dev.yaml"])
-    print("Step 8: Register Model...")
-    subprocess.run(["python", "src/register/register_model.py", "configs/dev.yaml"])
+import sys
+
+import yaml
+
+from src.pipelines.dag import PipelineFailed, Step, StepStore, format_report, run_dag
+from src.utils.fingerprint import FingerprintIndex
+
+
+def _ingest(config, raw_data):
+    def run(inputs):
+        from src.ingest.load import load_table
+        from src.utils.datasets import cache_from_config
+        return load_table(raw_data, cache=cache_from_config(config))
+    return run
+
+
+def _features(config, raw_data, output=None):
+    def run(inputs):
+        from src.features.make_features import (DEFAULT_BATCH_SIZE, DEFAULT_ROW_GROUP_SIZE,
+                                                DEFAULT_ROWS_PER_FILE, default_output,
+                                                stream_features, write_features)
+        features = config.get("features", {})
+        if not features.get("streaming", False):
+            write_features(inputs["ingest"], output or default_output(config))
+            return
+        # Streaming bounds memory by re-reading the raw data a row group at a time.
+        stream_features(
+            raw_data, output or default_output(config, streaming=True),
+            columns=features.get("columns"),
+            batch_size=features.get("batch_size", DEFAULT_BATCH_SIZE),
+            row_group_size=features.get("row_group_size", DEFAULT_ROW_GROUP_SIZE),
+            rows_per_file=features.get("rows_per_file", DEFAULT_ROWS_PER_FILE),
+            workers=features.get("workers"),
+            overwrite=True
+        )
+    return run
+
+
+def _validation(inputs):
+    from src.validation.validators import validate_table
+    report = validate_table(inputs["ingest"], raise_on_error=False)
+    print(report.summary())
+    report.raise_for_violations()
+
+
+def _evaluation(config, eval_data):
+    def run(inputs):
+        from src.eval.evaluate import evaluate
+        from src.ingest.load import load_table
+        from src.utils.datasets import cache_from_config
+        return evaluate(load_table(eval_data, cache=cache_from_config(config)))
+    return run
+
+
+def _explainability(config, eval_data):
+    def run(inputs):
+        from src.explainability.explain import explain
+        from src.ingest.load import load_table
+        from src.utils.datasets import cache_from_config
+        explain(load_table(eval_data, cache=cache_from_config(config)))
+    return run
+
+
+def pipeline_steps(config_path, config):
+    """The training pipeline; run from the repository root, as the relative paths assume.
+
+    The features step writes today's ``features_YYYYMMDD`` file (or directory,
+    when streaming), named in its command, so a new day is a new key; a re-run
+    on the same day replaces it.
+
+    Each step's ``code`` lists every package its script or function imports
+    from, so an edit to shared code such as ``src/utils`` invalidates it.
+
+    Steps with a ``function`` can also run in-process (``run_dag(in_process=True)``):
+    ingest reads the raw data once and hands the Arrow table to features and
+    validation. Tuning, training and registering always run as subprocesses.
+    """
+    from src.features.make_features import default_output
+    python = sys.executable
+    raw_data = f"s3://{config['s3']['raw_bucket']}/data.parquet"
+    train_data = f"s3://{config['s3']['features_bucket']}/train.parquet"
+    eval_data = f"s3://{config['s3']['features_bucket']}/eval.parquet"
+    tuning_data = "data/heart-disease.csv"
+    features_output = default_output(config, config.get("features", {}).get("streaming", False))
+    return [
+        Step("ingest", [python, "src/ingest/load.py", config_path],
+             inputs=[config_path, raw_data], code=["src/ingest", "src/utils"],
+             function=_ingest(config, raw_data)),
+        Step("features", [python, "-m", "src.features.make_features", config_path,
+                          "--output", features_output, "--overwrite"],
+             inputs=[config_path, raw_data], outputs=[features_output],
+             code=["src/features", "src/utils"], after=["ingest"],
+             function=_features(config, raw_data, features_output)),
+        Step("validation", [python, "-m", "src.validation.validators", config_path],
+             inputs=[config_path, raw_data], code=["src/validation", "src/utils"],
+             after=["ingest"], function=_validation),
+        Step("tuning", [python, "-m", "src.train.optuna_tune", "--data", tuning_data,
+                        "--target", "target", "--config", config_path],
+             inputs=[config_path, tuning_data], code=["src/train", "src/utils"]),
+        Step("training", [python, "-m", "src.train.train", "--config", config_path],
+             inputs=[config_path, train_data], code=["src/train", "src/utils"],
+             after=["features", "validation", "tuning"]),
+        Step("evaluation", [python, "src/eval/evaluate.py", config_path],
+             inputs=[config_path, eval_data], code=["src/eval", "src/ingest", "src/utils"],
+             after=["training"],
+             function=_evaluation(config, eval_data)),
+        Step("explainability", [python, "src/explainability/explain.py", config_path],
+             inputs=[config_path, eval_data],
+             code=["src/explainability", "src/ingest", "src/utils"],
+             after=["training"],
+             function=_explainability(config, eval_data)),
+        # Registering has effects outside the pipeline's outputs, so it always runs.
+        Step("register", [python, "src/register/register_model.py", config_path],
+             inputs=[config_path], code=["src/register"],
+             after=["evaluation", "explainability"], cache=False),
+    ]
+
+
+def run_all(config_path="configs/dev.yaml", force=False, in_process=None):
+    with open(config_path) as f:
+        config = yaml.safe_load(f)
+    settings = config.get("pipeline", {})
+    if in_process is None:
+        in_process = settings.get("in_process", False)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")])
+    ))
+    try:
+        results = run_dag(
+            pipeline_steps(config_path, config),
+            StepStore(settings.get("cache_dir", ".cache/pipeline"),
+                      keep_values=settings.get("keep_values", 2)),
+            max_workers=settings.get("max_workers"),
+            index=FingerprintIndex(config.get("fingerprint", {}).get("index_path")),
+            env=env,
+            force=force,
+            in_process=in_process
+        )
+    except PipelineFailed as e:
+        print(format_report(e.results))
+        print(e)
+        raise
+    print(format_report(results))
     print("Pipeline completed.")
+    return results
+
 
 if __name__ == "__main__":
-    run_all()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("config", nargs="?", default="configs/dev.yaml")
+    parser.add_argument("--force", action="store_true", help="Run every step, ignoring the cache")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--in-process", dest="in_process", action="store_true", default=None,
+                      help="Run the data stages as functions in this process")
+    mode.add_argument("--subprocess", dest="in_process", action="store_false")
+    args = parser.parse_args()
+    try:
+        run_all(args.config, args.force, args.in_process)
+    except PipelineFailed:
+        sys.exit(1)
@@ -1,15 +1,14 @@
-import pandas as pd
+import argparse
+
+import pyarrow as pa
 from sklearn.metrics import accuracy_score, f1_score
 import yaml
-import sys
 
-def main():
-    config_path = sys.argv[1] if len(sys.argv) > 1 else "configs/dev.yaml"
-    with open(config_path) as f:
-        config = yaml.safe_load(f)
-    df = pd.read_parquet(f"s3://{config['s3']['features_bucket']}/eval.parquet")
-    X = df.drop('target', axis=1)
-    y = df['target']
+from src.utils.datasets import cache_from_config, read_table
+
+def evaluate(table: pa.Table) -> dict:
+    X = table.drop_columns(['target'])
+    y = table.column('target').to_numpy()
     # Load model (placeholder)
     # model = ...
     # predictions = model.predict(X)
@@ -18,6 +17,18 @@ def main():
     f1 = f1_score(y, predictions, average='weighted')
     print(f"Accuracy: {accuracy}")
     print(f"F1 Score: {f1}")
+    return {'accuracy': accuracy, 'f1': f1}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("config", nargs="?", default="configs/dev.yaml")
+    parser.add_argument("--input", help="Evaluation parquet; defaults to the features "
+                                        "bucket's eval.parquet")
+    args = parser.parse_args()
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    data_path = args.input or f"s3://{config['s3']['features_bucket']}/eval.parquet"
+    evaluate(read_table(data_path, cache=cache_from_config(config)))
 
 if __name__ == "__main__":
     main()
@@ -1,19 +1,28 @@
-import shap
-import lime
-import pandas as pd
+import argparse
+
+import pyarrow as pa
 import yaml
-import sys
 
-def main():
-    config_path = sys.argv[1] if len(sys.argv) > 1 else "configs/dev.yaml"
-    with open(config_path) as f:
-        config = yaml.safe_load(f)
-    df = pd.read_parquet(f"s3://{config['s3']['features_bucket']}/eval.parquet")
+from src.utils.datasets import cache_from_config, read_table
+
+def explain(table: pa.Table):
     # Load model (placeholder)
     # model = ...
-    # explainer = shap.Explainer(model, df)
-    # shap_values = explainer(df)
+    # import shap  # here rather than at module level, so in-process runs do not need it
+    # explainer = shap.Explainer(model, table.to_pandas())
+    # shap_values = explainer(table.to_pandas())
     print("Explainability analysis complete.")
 
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("config", nargs="?", default="configs/dev.yaml")
+    parser.add_argument("--input", help="Evaluation parquet; defaults to the features "
+                                        "bucket's eval.parquet")
+    args = parser.parse_args()
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    data_path = args.input or f"s3://{config['s3']['features_bucket']}/eval.parquet"
+    explain(read_table(data_path, cache=cache_from_config(config)))
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,180 @@
+"""Derived features, defined once and evaluated on DataFrames, Arrow batches or plain rows.
+
+A feature is an arithmetic expression over columns, e.g.
+``Col('feature1') / (Col('feature2') + 1)``. ``FeatureSet`` evaluates the same
+expressions three ways: with pandas operators on a DataFrame (training and
+the in-memory pipeline), with Arrow kernels on a record batch (streaming
+feature engineering) and with plain Python arithmetic on dicts (serving).
+The row path follows numpy's float64 semantics, including ``x / 0``, so all
+three give the same values. This module imports neither pandas nor pyarrow
+at load time, which keeps it off the inference server's start-up path.
+"""
+import math
+import operator
+from typing import Any, Callable, Dict, List, Union
+
+
+class FeatureError(ValueError):
+    pass
+
+
+class Expr:
+    def __add__(self, other): return BinOp('add', self, _wrap(other))
+    def __radd__(self, other): return BinOp('add', _wrap(other), self)
+    def __sub__(self, other): return BinOp('sub', self, _wrap(other))
+    def __rsub__(self, other): return BinOp('sub', _wrap(other), self)
+    def __mul__(self, other): return BinOp('mul', self, _wrap(other))
+    def __rmul__(self, other): return BinOp('mul', _wrap(other), self)
+    def __truediv__(self, other): return BinOp('div', self, _wrap(other))
+    def __rtruediv__(self, other): return BinOp('div', _wrap(other), self)
+
+
+class Col(Expr):
+    def __init__(self, name: str):
+        self.name = name
+    def __repr__(self):
+        return f"Col({self.name!r})"
+
+
+class Const(Expr):
+    def __init__(self, value: Union[int, float]):
+        self.value = value
+    def __repr__(self):
+        return repr(self.value)
+
+
+class BinOp(Expr):
+    def __init__(self, op: str, left: Expr, right: Expr):
+        self.op = op
+        self.left = left
+        self.right = right
+    def __repr__(self):
+        return f"({self.left!r} {SYMBOLS[self.op]} {self.right!r})"
+
+
+SYMBOLS = {'add': '+', 'sub': '-', 'mul': '*', 'div': '/'}
+
+
+def _wrap(value) -> Expr:
+    return value if isinstance(value, Expr) else Const(value)
+
+
+def _float_div(a, b):
+    # numpy float64 semantics, which Python raises ZeroDivisionError for instead:
+    # x / 0 is +-inf (sign of x times sign of the zero), nan / 0 keeps the nan and
+    # 0 / 0 is the platform's default nan, which inf - inf also produces.
+    if b == 0:
+        if a != a:
+            return a
+        if a == 0:
+            return math.inf - math.inf
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+ROW_OPS = {'add': operator.add, 'sub': operator.sub, 'mul': operator.mul, 'div': _float_div}
+FRAME_OPS = {'add': operator.add, 'sub': operator.sub, 'mul': operator.mul, 'div': operator.truediv}
+ARROW_OPS = {'add': 'add', 'sub': 'subtract', 'mul': 'multiply', 'div': 'divide'}
+
+
+def columns(expr: Expr) -> List[str]:
+    if isinstance(expr, Col):
+        return [expr.name]
+    if isinstance(expr, BinOp):
+        return list(dict.fromkeys(columns(expr.left) + columns(expr.right)))
+    return []
+
+
+def compile_row(expr: Expr) -> Callable[[Dict[str, Any]], Any]:
+    """A closure evaluating ``expr`` on a dict; ``None`` inputs give ``None``, like a null."""
+    if isinstance(expr, Col):
+        name = expr.name
+        def value(row):
+            v = row[name]
+            if v is None or isinstance(v, (int, float)):
+                return v
+            raise FeatureError(f"{name} must be a number, got {type(v).__name__}")
+        return value
+    if isinstance(expr, Const):
+        value = expr.value
+        return lambda row: value
+    op, left, right = ROW_OPS[expr.op], compile_row(expr.left), compile_row(expr.right)
+    def evaluate(row):
+        a, b = left(row), right(row)
+        if a is None or b is None:
+            return None
+        return op(a, b)
+    return evaluate
+
+
+def evaluate_frame(expr: Expr, df):
+    if isinstance(expr, Col):
+        return df[expr.name]
+    if isinstance(expr, Const):
+        return expr.value
+    return FRAME_OPS[expr.op](evaluate_frame(expr.left, df), evaluate_frame(expr.right, df))
+
+
+def evaluate_arrow(expr: Expr, batch):
+    import pyarrow.compute as pc
+    if isinstance(expr, Col):
+        return batch.column(expr.name)
+    if isinstance(expr, Const):
+        return expr.value
+    left, right = evaluate_arrow(expr.left, batch), evaluate_arrow(expr.right, batch)
+    if expr.op == 'div':
+        # pandas' "/" is true division, Arrow's integer divide is not.
+        left, right = _as_float(left), _as_float(right)
+    return getattr(pc, ARROW_OPS[expr.op])(left, right)
+
+
+def _as_float(side):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    if isinstance(side, (int, float)):
+        return float(side)
+    if pa.types.is_integer(side.type):
+        return pc.cast(side, pa.float64())
+    return side
+
+
+class FeatureSet:
+    """Named expressions evaluated in order, so later features may use earlier ones."""
+    def __init__(self, features: Dict[str, Expr]):
+        self.features = dict(features)
+        derived = set(self.features)
+        inputs = [c for expr in self.features.values() for c in columns(expr) if c not in derived]
+        self.inputs = list(dict.fromkeys(inputs))
+        self._row = [(name, compile_row(expr)) for name, expr in self.features.items()]
+    def apply_frame(self, df):
+        """Add the features to a pandas DataFrame in place and return it."""
+        for name, expr in self.features.items():
+            df[name] = evaluate_frame(expr, df)
+        return df
+    def apply_arrow(self, batch):
+        """Return an Arrow RecordBatch or Table with the features set or appended."""
+        for name, expr in self.features.items():
+            values = evaluate_arrow(expr, batch)
+            index = batch.schema.get_field_index(name)
+            if index >= 0:
+                batch = batch.set_column(index, name, values)
+            else:
+                batch = batch.append_column(name, values)
+        return batch
+    def apply_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """A copy of ``row`` with the features added; rows missing an input are returned as is."""
+        for name in self.inputs:
+            if name not in row:
+                return row
+        out = dict(row)
+        for name, evaluate in self._row:
+            out[name] = evaluate(out)
+        return out
+    def apply_rows(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [self.apply_row(row) for row in rows]
+
+
+DERIVED_FEATURES = FeatureSet({
+    'feature3': Col('feature1') * Col('feature2'),
+    'feature4': Col('feature1') / (Col('feature2') + 1)
+})
@@ -1,30 +1,153 @@
+import json
+from typing import Any, Dict, List, Optional, Sequence
+
 import pandas as pd
-from sklearn.preprocessing import StandardScaler, LabelEncoder
 import numpy as np
 
+TARGET_COLUMNS = ('target', 'Churn')
+# Saved next to the MLmodel file; LocalModel applies it to requests when present.
+TRANSFORMER_FILE = 'feature_transformer.json'
+
+
+def _category_key(value: Any) -> str:
+    """Category of a raw value: its string form, or 'nan' for any missing value."""
+    if isinstance(value, str):
+        return value
+    return 'nan' if pd.isna(value) else str(value)
+
+
+class TabularTransformer:
+    """Label-encode categoricals, fill missing values with medians and standardize, fitted once.
+
+    ``fit`` learns the sorted categories of every object/string column (the
+    codes ``LabelEncoder`` would give), then the median and the
+    ``StandardScaler`` mean and scale of every feature after encoding. Values
+    not seen during ``fit`` map to an extra code, ``len(categories)``. Columns
+    in ``exclude`` (the targets by default) are passed through untouched.
+
+    ``transform`` works on DataFrames; ``transform_rows`` takes a list of dicts
+    and never builds one, for the request path. Both give the same float64
+    values. The fitted state round-trips through ``to_dict``/``save``.
+    """
+    def __init__(self, exclude: Sequence[str] = TARGET_COLUMNS):
+        self.exclude = list(exclude)
+        self.feature_names: List[str] = []
+        self.categories: Dict[str, List[str]] = {}
+        self.medians: Optional[np.ndarray] = None
+        self.mean: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+        self._codes: Dict[str, Dict[str, int]] = {}
+    @staticmethod
+    def _is_categorical(series: pd.Series) -> bool:
+        return (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+                or isinstance(series.dtype, pd.CategoricalDtype))
+    def fit(self, df: pd.DataFrame) -> 'TabularTransformer':
+        self.feature_names = [
+            c for c in df.columns
+            if c not in self.exclude and (self._is_categorical(df[c])
+                                          or pd.api.types.is_numeric_dtype(df[c]))
+        ]
+        self.categories = {
+            c: sorted({_category_key(value) for value in pd.unique(df[c])})
+            for c in self.feature_names if self._is_categorical(df[c])
+        }
+        self._build_codes()
+        X = self._encode_frame(df)
+        self.medians = np.nanmedian(X, axis=0) if len(X) else np.zeros(X.shape[1])
+        X = np.where(np.isnan(X), self.medians, X)
+        from sklearn.preprocessing import StandardScaler
+        scaler = StandardScaler().fit(X)
+        self.mean, self.scale = scaler.mean_, scaler.scale_
+        return self
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        X = self._finish(self._encode_frame(df))
+        columns = {name: df[name] for name in df.columns}
+        for j, name in enumerate(self.feature_names):
+            columns[name] = X[:, j]
+        return pd.DataFrame(columns, index=df.index)
+    def fit_transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.fit(df).transform(df)
+    def transform_rows(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        """Feature matrix for ``rows`` in ``feature_names`` order; absent keys count as missing.
+
+        Cheapest for request-sized inputs; past a thousand rows or so ``transform`` wins.
+        """
+        X = np.empty((len(rows), len(self.feature_names)), dtype=np.float64)
+        for j, name in enumerate(self.feature_names):
+            codes = self._codes.get(name)
+            if codes is not None:
+                unknown = len(codes)
+                X[:, j] = [codes.get(_category_key(row.get(name)), unknown) for row in rows]
+            else:
+                X[:, j] = [row.get(name) for row in rows]
+        return self._finish(X)
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'exclude': self.exclude,
+            'feature_names': self.feature_names,
+            'categories': self.categories,
+            'medians': self.medians.tolist(),
+            'mean': self.mean.tolist(),
+            'scale': self.scale.tolist()
+        }
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'TabularTransformer':
+        transformer = cls(state['exclude'])
+        transformer.feature_names = list(state['feature_names'])
+        transformer.categories = {k: list(v) for k, v in state['categories'].items()}
+        transformer.medians = np.asarray(state['medians'], dtype=np.float64)
+        transformer.mean = np.asarray(state['mean'], dtype=np.float64)
+        transformer.scale = np.asarray(state['scale'], dtype=np.float64)
+        transformer._build_codes()
+        return transformer
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+    @classmethod
+    def load(cls, path: str) -> 'TabularTransformer':
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+    def _build_codes(self):
+        self._codes = {name: {value: i for i, value in enumerate(values)}
+                       for name, values in self.categories.items()}
+    def _encode_frame(self, df: pd.DataFrame) -> np.ndarray:
+        X = np.empty((len(df), len(self.feature_names)), dtype=np.float64)
+        for j, name in enumerate(self.feature_names):
+            codes = self._codes.get(name)
+            if codes is not None:
+                # Look up each distinct value once, then expand.
+                positions, uniques = pd.factorize(df[name], use_na_sentinel=False)
+                unknown = len(codes)
+                lookup = np.array([codes.get(_category_key(u), unknown) for u in uniques],
+                                  dtype=np.float64)
+                X[:, j] = lookup[positions]
+            else:
+                X[:, j] = df[name].to_numpy(dtype=np.float64, na_value=np.nan)
+        return X
+    def _finish(self, X: np.ndarray) -> np.ndarray:
+        missing = np.isnan(X)
+        if missing.any():
+            X = np.where(missing, self.medians, X)
+        X -= self.mean
+        X /= self.scale
+        return X
+
+
 def heart_disease_features(df):
     # Numeric features, no missing values assumed
     return df
 
-def telco_churn_features(df):
-    # Example: encode categorical, scale numeric
-    df = df.copy()
-    # Encode categorical columns
-    for col in df.select_dtypes(include=['object']).columns:
-        if col != 'target' and col != 'Churn':
-            df[col] = LabelEncoder().fit_transform(df[col].astype(str))
-    # Fill missing values
-    df = df.fillna(df.median(numeric_only=True))
-    # Scale numeric columns
-    scaler = StandardScaler()
-    num_cols = df.select_dtypes(include=[np.number]).columns
-    df[num_cols] = scaler.fit_transform(df[num_cols])
-    return df
+def telco_churn_features(df, transformer: Optional[TabularTransformer] = None):
+    # Encode categorical, fill missing values and scale numeric columns. Pass a
+    # fitted transformer to reuse its state instead of fitting on ``df``.
+    if transformer is None:
+        transformer = TabularTransformer().fit(df)
+    return transformer.transform(df)
 
-def get_features(df, dataset):
+def get_features(df, dataset, transformer: Optional[TabularTransformer] = None):
     if dataset == 'heart':
         return heart_disease_features(df)
     elif dataset == 'telco':
-        return telco_churn_features(df)
+        return telco_churn_features(df, transformer)
     else:
         raise ValueError('Unknown dataset type')
@@ -1,19 +1,175 @@
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs
+import pyarrow.parquet as pq
 import yaml
-import sys
-from datetime import datetime
+
+from src.features.definitions import DERIVED_FEATURES
+from src.utils.datasets import cache_from_config, read_frame
+
+DEFAULT_BATCH_SIZE = 65536
+DEFAULT_ROW_GROUP_SIZE = 1 << 20
+DEFAULT_ROWS_PER_FILE = 1 << 22
+
+
+def add_features(df: pd.DataFrame) -> pd.DataFrame:
+    return DERIVED_FEATURES.apply_frame(df)
+
+
+def add_features_arrow(batch: pa.RecordBatch) -> pa.RecordBatch:
+    return DERIVED_FEATURES.apply_arrow(batch)
+
+
+def _resolve(path: str) -> Tuple[pyarrow.fs.FileSystem, str]:
+    if "://" in path:
+        return pyarrow.fs.FileSystem.from_uri(path)
+    return pyarrow.fs.LocalFileSystem(), os.path.abspath(path)
+
+
+def plan_partitions(dataset: ds.Dataset,
+                    rows_per_file: int) -> List[Tuple[ds.Fragment, List[int]]]:
+    """Split each input file into runs of consecutive row groups of ``rows_per_file`` rows or so."""
+    partitions = []
+    for fragment in dataset.get_fragments():
+        run, rows = [], 0
+        for row_group in fragment.row_groups:
+            run.append(row_group.id)
+            rows += row_group.num_rows
+            if rows >= rows_per_file:
+                partitions.append((fragment, run))
+                run, rows = [], 0
+        if run or not fragment.row_groups:
+            partitions.append((fragment, run))
+    return partitions
+
+
+def _write_partition(fragment: ds.Fragment, row_groups: Sequence[int], schema: pa.Schema,
+                     columns: Optional[List[str]], path: str, filesystem: pyarrow.fs.FileSystem,
+                     batch_size: int, row_group_size: int) -> int:
+    rows = 0
+    with fragment.filesystem.open_input_file(fragment.path) as source, \
+            pq.ParquetWriter(path, schema, filesystem=filesystem) as writer:
+        buffered, buffered_rows = [], 0
+        batches = pq.ParquetFile(source).iter_batches(
+            batch_size=batch_size, row_groups=row_groups, columns=columns
+        ) if row_groups else ()
+        for batch in batches:
+            batch = add_features_arrow(batch).replace_schema_metadata(None)
+            buffered.append(batch)
+            buffered_rows += batch.num_rows
+            while buffered_rows >= row_group_size:
+                table = pa.Table.from_batches(buffered, schema)
+                writer.write_table(table.slice(0, row_group_size), row_group_size)
+                rest = table.slice(row_group_size)
+                buffered, buffered_rows = rest.to_batches(), rest.num_rows
+                rows += row_group_size
+        if buffered:
+            writer.write_table(pa.Table.from_batches(buffered, schema), row_group_size)
+            rows += buffered_rows
+    return rows
+
+
+def stream_features(source: str, output_dir: str, columns: Optional[List[str]] = None,
+                    batch_size: int = DEFAULT_BATCH_SIZE,
+                    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                    rows_per_file: int = DEFAULT_ROWS_PER_FILE,
+                    workers: Optional[int] = None, filesystem=None,
+                    overwrite: bool = False) -> List[str]:
+    """Add the derived features to a parquet file or directory without loading it whole.
+
+    The input is read in record batches of ``batch_size`` rows, projected to
+    ``columns`` (all columns by default), and written as ``part-NNNNN.parquet``
+    files under ``output_dir`` with row groups of ``row_group_size`` rows.
+    Each part covers about ``rows_per_file`` rows of one input file, and parts
+    are written concurrently by ``workers`` threads; Arrow releases the GIL
+    while decoding, computing and encoding, so they run on separate cores.
+    Memory per worker is bounded by one row group.
+
+    Reading the parts back in name order gives the same rows, columns, types
+    and values as ``add_features`` in memory, but not the same bytes: the
+    output is a directory of parts, with its own row-group layout and no
+    pandas metadata, rather than the single file ``write_features`` writes.
+
+    A non-empty ``output_dir`` raises ``FileExistsError`` unless ``overwrite``
+    is set, in which case everything already in it is deleted first.
+    """
+    dataset = ds.dataset(source, format="parquet", filesystem=filesystem)
+    out_fs, output_dir = _resolve(output_dir)
+    out_fs.create_dir(output_dir, recursive=True)
+    if out_fs.get_file_info(pyarrow.fs.FileSelector(output_dir)):
+        if not overwrite:
+            raise FileExistsError(f"{output_dir} is not empty; pass overwrite=True to replace it")
+        out_fs.delete_dir_contents(output_dir)
+    input_schema = dataset.schema if columns is None else pa.schema(
+        [dataset.schema.field(name) for name in columns]
+    )
+    empty = pa.RecordBatch.from_pylist([], schema=input_schema.remove_metadata())
+    schema = add_features_arrow(empty).schema
+    partitions = plan_partitions(dataset, rows_per_file)
+    paths = [f"{output_dir}/part-{i:05d}.parquet" for i in range(len(partitions))]
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        list(pool.map(
+            lambda args: _write_partition(*args[0], schema, columns, args[1], out_fs,
+                                          batch_size, row_group_size),
+            zip(partitions, paths)
+        ))
+    return paths
+
+
+def default_output(config: dict, streaming: bool = False) -> str:
+    """Today's features file (or directory, when streaming) in the config's features bucket."""
+    return (f"s3://{config['s3']['features_bucket']}/features_"
+            f"{datetime.now().strftime('%Y%m%d')}{'' if streaming else '.parquet'}")
+
+
+def write_features(table: pa.Table, output_path: str) -> pa.Table:
+    """Add the derived features to an Arrow table in memory and write it to ``output_path``."""
+    table = add_features_arrow(table)
+    filesystem, path = _resolve(output_path)
+    pq.write_table(table, path, filesystem=filesystem)
+    return table
+
 
 def main():
-    config_path = sys.argv[1] if len(sys.argv) > 1 else "configs/dev.yaml"
-    with open(config_path) as f:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("config", nargs="?", default="configs/dev.yaml")
+    parser.add_argument("--input", help="Parquet file or directory; defaults to the raw "
+                                        "bucket's data.parquet")
+    parser.add_argument("--output", help="Output file (in memory) or directory (streaming)")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Replace the contents of a non-empty streaming output directory")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--streaming", dest="streaming", action="store_true", default=None)
+    mode.add_argument("--in-memory", dest="streaming", action="store_false")
+    args = parser.parse_args()
+    with open(args.config) as f:
         config = yaml.safe_load(f)
-    input_path = f"s3://{config['s3']['raw_bucket']}/data.parquet"
-    output_path = f"s3://{config['s3']['features_bucket']}/features_{datetime.now().strftime('%Y%m%d')}.parquet"
-    df = pd.read_parquet(input_path)
-    df['feature3'] = df['feature1'] * df['feature2']
-    df['feature4'] = df['feature1'] / (df['feature2'] + 1)
-    df.to_parquet(output_path)
-    print(f"Features saved to {output_path}")
+    features = config.get("features", {})
+    streaming = features.get("streaming", False) if args.streaming is None else args.streaming
+    input_path = args.input or f"s3://{config['s3']['raw_bucket']}/data.parquet"
+    output_path = args.output or default_output(config, streaming)
+    if streaming:
+        paths = stream_features(
+            input_path, output_path,
+            columns=features.get("columns"),
+            batch_size=features.get("batch_size", DEFAULT_BATCH_SIZE),
+            row_group_size=features.get("row_group_size", DEFAULT_ROW_GROUP_SIZE),
+            rows_per_file=features.get("rows_per_file", DEFAULT_ROWS_PER_FILE),
+            workers=features.get("workers"),
+            overwrite=args.overwrite
+        )
+        print(f"Features saved to {output_path} ({len(paths)} files)")
+    else:
+        df = add_features(read_frame(input_path, cache=cache_from_config(config)))
+        df.to_parquet(output_path)
+        print(f"Features saved to {output_path}")
 
 if __name__ == "__main__":
     main()
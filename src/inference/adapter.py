@@ -1,9 +1,16 @@
+import asyncio
 import json
 import time
-import boto3
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional
 import logging
 from dataclasses import dataclass
+from src.inference.budget import ROUTE_CHEAPER, SHED, CostTracker
+from src.inference.async_client import AsyncRuntimeClient, LazyClient, botocore_config
+from src.inference.cache import ResponseCache, cache_key
+from src.inference.local_model import LocalModel
+from src.inference.metrics_sink import BufferedMetricsSink
+from src.inference.routing import ProviderRouter, RouteResult
+from src.utils.monitoring import log_inference, log_ttft
 
 @dataclass
 class InferenceMetrics:
@@ -14,21 +21,218 @@ class InferenceMetrics:
     estimated_cost_usd: float
 
 class InferenceAdapter:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], metrics_sink: Optional[BufferedMetricsSink] = None):
         self.config = config
-        self.bedrock = boto3.client('bedrock-runtime')
-        self.sagemaker = boto3.client('sagemaker-runtime')
-        self.cloudwatch = boto3.client('cloudwatch')
+        client_config = botocore_config(config)
+        self.bedrock = LazyClient(
+            'bedrock-runtime',
+            config=client_config,
+            endpoint_url=config.get('bedrock', {}).get('runtime_endpoint_url')
+        )
+        self.sagemaker = LazyClient(
+            'sagemaker-runtime',
+            config=client_config,
+            endpoint_url=config.get('sagemaker', {}).get('runtime_endpoint_url')
+        )
+        self.cloudwatch = LazyClient('cloudwatch', config=client_config)
+        self._async_client: Optional[AsyncRuntimeClient] = None
         self.logger = logging.getLogger(__name__)
+        if metrics_sink is None:
+            sink_config = config.get('metrics_sink', {})
+            metrics_sink = BufferedMetricsSink(
+                self.cloudwatch,
+                namespace=sink_config.get('namespace', 'ML/Inference'),
+                flush_interval_s=sink_config.get('flush_interval_s', 10.0),
+                max_batch_size=sink_config.get('max_batch_size', 500),
+                max_queue_size=sink_config.get('max_queue_size', 10000)
+            )
+        self.metrics_sink = metrics_sink
+        self.cost_tracker = CostTracker.from_config(config.get('cost', {}), metrics_sink)
+        cache_config = config.get('cache', {})
+        self.cache = (ResponseCache.from_config(cache_config)
+                      if cache_config.get('enabled', False) else None)
+        self.local_model: Optional[LocalModel] = None
+        if config.get('local_model', {}).get('enabled', False):
+            self.local_model = LocalModel.from_config(config)
+            self.local_model.start()
+        tracker = self.cost_tracker
+        if (tracker.policy == ROUTE_CHEAPER and tracker.cheaper_provider == 'local'
+                and self.local_model is None):
+            # Routing to a local provider with no model would answer with placeholders.
+            self.logger.warning("cost.cheaper_provider is local but no local model is loaded; "
+                                "shedding requests over budget instead")
+            tracker.policy = SHED
+        routing_config = config.get('routing', {})
+        self.router: Optional[ProviderRouter] = None
+        if routing_config.get('enabled', False):
+            names = routing_config.get('providers', ['sagemaker', 'bedrock', 'local'])
+            # Without a loaded model the local provider only returns a placeholder.
+            names = [name for name in names if name != 'local' or self.local_model is not None]
+            if names:
+                self.router = ProviderRouter.from_config(
+                    {name: (lambda payload, name=name: self._invoke(name, payload))
+                     for name in names},
+                    {name: (lambda payload, name=name: self._ainvoke(name, payload))
+                     for name in names},
+                    routing_config,
+                    on_discard=self._record_discarded
+                )
+            else:
+                self.logger.warning("Routing is enabled but none of its providers is available")
+    def warm_up(self):
+        """Create the runtime clients the configured providers use, ahead of the first request."""
+        if self.router is not None:
+            providers = self.router.order
+        else:
+            providers = [self.config.get('provider', 'sagemaker')]
+        clients = {'bedrock': self.bedrock, 'sagemaker': self.sagemaker}
+        for provider in providers:
+            client = clients.get(provider)
+            if isinstance(client, LazyClient):
+                client.materialize()
+    def _provider(self) -> str:
+        """Provider that serves the next request; raises BudgetExceededError when shedding."""
+        return self.cost_tracker.provider_for(self.config.get('provider', 'sagemaker'))
     def predict(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        provider = self.config.get('provider', 'sagemaker')
+        provider = self._provider()
+        if self.cache is None:
+            return self._predict_uncached(payload, provider)
+        # Keyed by the serving provider, so a cheaper provider's answers are not served
+        # in place of the configured provider's once the budget recovers.
+        response, hit = self.cache.get_or_compute(
+            self._cache_key(payload, provider), lambda: self._predict_uncached(payload, provider)
+        )
+        self._record_cache_result(response, hit)
+        return response
+    def _predict_uncached(self, payload: Dict[str, Any], provider: str) -> Dict[str, Any]:
+        start_time = time.time()
+        configured = self.config.get('provider', 'sagemaker')
+        if self.router is not None and provider == configured:
+            result = self.router.route(payload)
+            self._record_route(result)
+            self._record_metrics(result.provider, start_time, result.response)
+            return result.response
+        response = self._invoke(provider, payload)
+        self._record_metrics(provider, start_time, response)
+        return response
+    def _invoke(self, provider: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if provider == 'bedrock':
+            return self._bedrock_invoke(payload)
+        elif provider == 'sagemaker':
+            return self._sagemaker_invoke(payload)
+        return self._local_invoke(payload)
+    async def apredict(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Async counterpart of ``predict`` that never blocks the event loop on a provider call."""
+        provider = self._provider()
+        if self.cache is None:
+            return await self._apredict_uncached(payload, provider)
+        response, hit = await self.cache.aget_or_compute(
+            self._cache_key(payload, provider), lambda: self._apredict_uncached(payload, provider)
+        )
+        self._record_cache_result(response, hit)
+        return response
+    async def _apredict_uncached(self, payload: Dict[str, Any], provider: str) -> Dict[str, Any]:
         start_time = time.time()
+        configured = self.config.get('provider', 'sagemaker')
+        if self.router is not None and provider == configured:
+            result = await self.router.aroute(payload)
+            self._record_route(result)
+            self._record_metrics(result.provider, start_time, result.response)
+            return result.response
+        response = await self._ainvoke(provider, payload)
+        self._record_metrics(provider, start_time, response)
+        return response
+    async def _ainvoke(self, provider: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         if provider == 'bedrock':
-            response = self._bedrock_invoke(payload)
+            body = await self.async_client.invoke_model(
+                self.config['bedrock']['model_id'], self._bedrock_request_body(payload)
+            )
+            return self._parse_bedrock_response(json.loads(body))
         elif provider == 'sagemaker':
-            response = self._sagemaker_invoke(payload)
+            body = await self.async_client.invoke_endpoint(
+                self.config['sagemaker']['endpoint_name'], json.dumps(payload).encode()
+            )
+            return {'prediction': json.loads(body), 'provider': 'sagemaker'}
+        elif self.local_model is not None:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self._local_invoke, payload
+            )
+        return self._local_invoke(payload)
+    @property
+    def async_client(self) -> AsyncRuntimeClient:
+        if self._async_client is None:
+            self._async_client = AsyncRuntimeClient(self.config)
+        return self._async_client
+    def predict_batch(self, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Score several payloads, using a single endpoint call where the provider supports it."""
+        provider = self._provider()
+        if self.router is not None:
+            return [self.predict(payload) for payload in payloads]
+        if provider == 'local' and self.local_model is not None and self.cache is None:
+            start_time = time.time()
+            predictions, version = self.local_model.predict_rows(payloads)
+            self._record_metrics(provider, start_time, {'provider': 'local'})
+            return [{'prediction': p, 'provider': 'local', 'model_version': version}
+                    for p in predictions]
+        if provider != 'sagemaker' or len(payloads) == 1:
+            return [self.predict(payload) for payload in payloads]
+        if self.cache is None:
+            return self._sagemaker_predict_batch(payloads)
+        keys = [self._cache_key(payload, provider) for payload in payloads]
+        responses = [self.cache.get(key) for key in keys]
+        for response in responses:
+            if response is not None:
+                self._record_cache_result(response, True)
+        missing = [i for i, response in enumerate(responses) if response is None]
+        if missing:
+            fresh = self._sagemaker_predict_batch([payloads[i] for i in missing])
+            for i, response in zip(missing, fresh):
+                self.cache.put(keys[i], response)
+                self._record_cache_result(response, False)
+                responses[i] = response
+        return responses
+    def _sagemaker_predict_batch(self, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        start_time = time.time()
+        responses = self._sagemaker_invoke_batch(payloads)
+        self._record_metrics('sagemaker', start_time, {'provider': 'sagemaker', 'token_count': 0})
+        return responses
+    def _cache_key(self, payload: Dict[str, Any], provider: str) -> str:
+        model_id = (self.config.get('model_id')
+                    or self.config.get(provider, {}).get('model_id', 'unknown'))
+        if provider == 'local' and self.local_model is not None:
+            version = self.local_model.version
+        else:
+            version = self.config.get('model', {}).get('version', 'unknown')
+        return cache_key(payload, provider, model_id, str(version))
+    def _record_cache_result(self, response: Dict[str, Any], hit: bool):
+        dimensions = {'Provider': response.get('provider', 'unknown')}
+        if hit:
+            self.metrics_sink.put('CacheHits', 1, unit='Count', dimensions=dimensions)
+            self.metrics_sink.put('CostSaved', self._calculate_cost(response),
+                                  dimensions=dimensions)
         else:
-            response = self._local_invoke(payload)
+            self.metrics_sink.put('CacheMisses', 1, unit='Count', dimensions=dimensions)
+        evictions = self.cache.take_evictions()
+        if evictions:
+            self.metrics_sink.put('CacheEvictions', evictions, unit='Count')
+    def _record_route(self, result: RouteResult):
+        if result.hedged:
+            self.metrics_sink.put('HedgedRequests', 1, unit='Count',
+                                  dimensions={'Provider': result.provider})
+    def _record_discarded(self, provider: str, response: Optional[Dict[str, Any]]):
+        """Charge a hedge that lost; one cancelled before answering costs its per-call estimate."""
+        response = {**(response or {}), 'provider': provider}
+        self.cost_tracker.record(provider, self.config.get('model_id', 'unknown'),
+                                 self._calculate_cost(response))
+    def _record_ttft(self, provider: str, ttft_ms: float):
+        self.metrics_sink.put(
+            'TimeToFirstToken',
+            ttft_ms,
+            unit='Milliseconds',
+            dimensions={'Provider': provider, 'ModelId': self.config.get('model_id', 'unknown')}
+        )
+        log_ttft(ttft_ms, provider, str(self.config.get('model', {}).get('version', 'unknown')))
+    def _record_metrics(self, provider: str, start_time: float, response: Dict[str, Any]):
         latency_ms = (time.time() - start_time) * 1000
         metrics = InferenceMetrics(
             provider=provider,
@@ -38,24 +242,90 @@ class InferenceAdapter:
             estimated_cost_usd=self._calculate_cost(response)
         )
         self._log_metrics(metrics)
+        model_version = (response.get('model_version')
+                         or self.config.get('model', {}).get('version', 'unknown'))
+        log_inference(latency_ms, provider, str(model_version))
         if metrics.estimated_cost_usd > self.config['cost']['per_inference_limit_usd']:
             self.logger.warning(f"Inference cost exceeded limit: {metrics.estimated_cost_usd}")
-        return response
     def _bedrock_invoke(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         response = self.bedrock.invoke_model(
             modelId=self.config['bedrock']['model_id'],
-            body=json.dumps({
-                "prompt": payload.get('prompt', ''),
-                "max_tokens": self.config['bedrock']['max_tokens'],
-                "temperature": 0.7
-            })
+            body=self._bedrock_request_body(payload)
         )
-        result = json.loads(response['body'].read())
+        return self._parse_bedrock_response(json.loads(response['body'].read()))
+    def _bedrock_request_body(self, payload: Dict[str, Any]) -> bytes:
+        return json.dumps({
+            "prompt": payload.get('prompt', ''),
+            "max_tokens": self.config['bedrock']['max_tokens'],
+            "temperature": 0.7
+        }).encode()
+    def _parse_bedrock_response(self, result: Dict[str, Any]) -> Dict[str, Any]:
         return {
             'prediction': result.get('completion', ''),
             'token_count': result.get('token_count', 0),
             'provider': 'bedrock'
         }
+    def predict_stream(self, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """``token`` events while Bedrock generates, then a single ``done`` event.
+
+        Other providers do not stream, so their whole response arrives as the ``done`` event;
+        so does the cheaper provider's when the budget policy routes away from Bedrock.
+        The budget is checked before the stream starts: BudgetExceededError is raised here,
+        not from the iterator, so callers can still reject the request.
+        """
+        provider = self._provider()
+        if provider != 'bedrock':
+            return self._done_stream(payload)
+        return self._bedrock_stream(payload)
+    def _done_stream(self, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        yield {'type': 'done', **self.predict(payload)}
+    def _bedrock_stream(self, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        start_time = time.time()
+        response = self.bedrock.invoke_model_with_response_stream(
+            modelId=self.config['bedrock']['model_id'],
+            body=self._bedrock_request_body(payload)
+        )
+        text, token_count, ttft_ms, stop_reason = [], 0, None, None
+        try:
+            for event in response['body']:
+                if 'chunk' not in event:
+                    continue
+                chunk = json.loads(event['chunk']['bytes'])
+                delta = chunk.get('completion', '')
+                stop_reason = chunk.get('stop_reason') or stop_reason
+                if delta:
+                    token_count += chunk.get('token_count', 1)
+                # The last chunk carries Bedrock's own count, which replaces the running estimate.
+                invocation_metrics = chunk.get('amazon-bedrock-invocationMetrics')
+                if invocation_metrics is not None:
+                    token_count = invocation_metrics.get('outputTokenCount', token_count)
+                if not delta:
+                    continue
+                if ttft_ms is None:
+                    ttft_ms = (time.time() - start_time) * 1000
+                    self._record_ttft('bedrock', ttft_ms)
+                text.append(delta)
+                yield {
+                    'type': 'token',
+                    'text': delta,
+                    'token_count': token_count,
+                    'cost_usd': self._calculate_cost(
+                        {'provider': 'bedrock', 'token_count': token_count}
+                    )
+                }
+        finally:
+            # Tokens generated before a client disconnect are still billed.
+            self._record_metrics('bedrock', start_time,
+                                 {'provider': 'bedrock', 'token_count': token_count})
+        yield {
+            'type': 'done',
+            'prediction': ''.join(text),
+            'token_count': token_count,
+            'provider': 'bedrock',
+            'cost_usd': self._calculate_cost({'provider': 'bedrock', 'token_count': token_count}),
+            'ttft_ms': ttft_ms,
+            'stop_reason': stop_reason
+        }
     def _sagemaker_invoke(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         response = self.sagemaker.invoke_endpoint(
             EndpointName=self.config['sagemaker']['endpoint_name'],
@@ -67,10 +337,29 @@ class InferenceAdapter:
             'prediction': result,
             'provider': 'sagemaker'
         }
+    def _sagemaker_invoke_batch(self, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        response = self.sagemaker.invoke_endpoint(
+            EndpointName=self.config['sagemaker']['endpoint_name'],
+            ContentType='application/json',
+            Body=json.dumps({'instances': payloads})
+        )
+        result = json.loads(response['Body'].read())
+        predictions = result.get('predictions') if isinstance(result, dict) else result
+        if not isinstance(predictions, list) or len(predictions) != len(payloads):
+            raise ValueError("SageMaker response does not contain one prediction per instance "
+                             f"({len(payloads)} sent)")
+        return [{'prediction': p, 'provider': 'sagemaker'} for p in predictions]
     def _local_invoke(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if self.local_model is None:
+            return {
+                'prediction': 'mock_prediction',
+                'provider': 'local'
+            }
+        predictions, version = self.local_model.predict_rows([payload])
         return {
-            'prediction': 'mock_prediction',
-            'provider': 'local'
+            'prediction': predictions[0],
+            'provider': 'local',
+            'model_version': version
         }
     def _calculate_cost(self, response: Dict[str, Any]) -> float:
         if response['provider'] == 'bedrock':
@@ -80,25 +369,23 @@ class InferenceAdapter:
             return 0.001
         return 0.0
     def _log_metrics(self, metrics: InferenceMetrics):
-        self.cloudwatch.put_metric_data(
-            Namespace='ML/Inference',
-            MetricData=[
-                {
-                    'MetricName': 'Latency',
-                    'Value': metrics.latency_ms,
-                    'Unit': 'Milliseconds',
-                    'Dimensions': [
-                        {'Name': 'Provider', 'Value': metrics.provider},
-                        {'Name': 'ModelId', 'Value': metrics.model_id}
-                    ]
-                },
-                {
-                    'MetricName': 'Cost',
-                    'Value': metrics.estimated_cost_usd,
-                    'Unit': 'None',
-                    'Dimensions': [
-                        {'Name': 'Provider', 'Value': metrics.provider}
-                    ]
-                }
-            ]
+        self.metrics_sink.put(
+            'Latency',
+            metrics.latency_ms,
+            unit='Milliseconds',
+            dimensions={'Provider': metrics.provider, 'ModelId': metrics.model_id}
         )
+        # Cost is published as periodic per-window totals rather than one datum per call.
+        self.cost_tracker.record(metrics.provider, metrics.model_id, metrics.estimated_cost_usd)
+    def close(self):
+        if self.router is not None:
+            self.router.close()
+        if self.local_model is not None:
+            self.local_model.stop()
+        self.cost_tracker.close()
+        self.metrics_sink.close()
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        self.close()
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+
+import aiohttp
+import boto3
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.config import Config
+from botocore.exceptions import NoCredentialsError
+
+
+def http_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    http = config.get('http', {})
+    return {
+        'max_connections': http.get('max_connections', 100),
+        'keepalive_expiry_s': http.get('keepalive_expiry_s', 30.0),
+        'connect_timeout_s': http.get('connect_timeout_s', 2.0),
+        'read_timeout_s': http.get('read_timeout_s', 60.0)
+    }
+
+
+def botocore_config(config: Dict[str, Any]) -> Config:
+    """Connection pool and timeout settings for the blocking boto3 runtime clients."""
+    http = http_settings(config)
+    return Config(
+        region_name=config.get('aws', {}).get('region'),
+        max_pool_connections=http['max_connections'],
+        connect_timeout=http['connect_timeout_s'],
+        read_timeout=http['read_timeout_s'],
+        tcp_keepalive=True
+    )
+
+
+class LazyClient:
+    """A boto3 client that is only created when first used.
+
+    Creating a client loads botocore's service model, which dominates startup
+    when a process only ever talks to one of its providers.
+    """
+    def __init__(self, service_name: str, **kwargs):
+        self.service_name = service_name
+        self._kwargs = kwargs
+        self._client = None
+        self._lock = threading.Lock()
+    def materialize(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = boto3.client(self.service_name, **self._kwargs)
+        return self._client
+    def __getattr__(self, name: str):
+        return getattr(self.materialize(), name)
+
+
+class AsyncRuntimeClient:
+    """Non-blocking SageMaker and Bedrock runtime calls over one pooled HTTP/1.1 client.
+
+    Requests are SigV4-signed with the default boto3 credential chain (no
+    credentials raises ``NoCredentialsError``, as boto3 does) and sent
+    through a shared ``aiohttp.ClientSession`` whose pool size, keep-alive and
+    timeouts come from the ``http`` config section. ``*_endpoint_url`` overrides
+    point the client at a local stub.
+    """
+    def __init__(self, config: Dict[str, Any], session: Optional[boto3.Session] = None):
+        http = http_settings(config)
+        self.region = (config.get('aws', {}).get('region')
+                       or (session or boto3.Session()).region_name)
+        self.sagemaker_url = (
+            config.get('sagemaker', {}).get('runtime_endpoint_url')
+            or f"https://runtime.sagemaker.{self.region}.amazonaws.com"
+        )
+        self.bedrock_url = (
+            config.get('bedrock', {}).get('runtime_endpoint_url')
+            or f"https://bedrock-runtime.{self.region}.amazonaws.com"
+        )
+        self._session = session
+        self._credentials = None
+        self.logger = logging.getLogger(__name__)
+        self._http_settings = http
+        self._http: Optional[aiohttp.ClientSession] = None
+    async def invoke_endpoint(self, endpoint_name: str, body: bytes,
+                              content_type: str = 'application/json') -> bytes:
+        url = f"{self.sagemaker_url}/endpoints/{quote(endpoint_name, safe='')}/invocations"
+        return await self._post('sagemaker', url, body, content_type)
+    async def invoke_model(self, model_id: str, body: bytes,
+                           content_type: str = 'application/json') -> bytes:
+        url = f"{self.bedrock_url}/model/{quote(model_id, safe='')}/invoke"
+        return await self._post('bedrock', url, body, content_type)
+    @property
+    def http(self) -> aiohttp.ClientSession:
+        # The session binds to the running event loop, so it is created on first use.
+        if self._http is None:
+            http = self._http_settings
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=http['max_connections'],
+                    limit_per_host=http['max_connections'],
+                    keepalive_timeout=http['keepalive_expiry_s'],
+                    ttl_dns_cache=300
+                ),
+                timeout=aiohttp.ClientTimeout(sock_connect=http['connect_timeout_s'],
+                                              sock_read=http['read_timeout_s'])
+            )
+        return self._http
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+    async def _post(self, service: str, url: str, body: bytes, content_type: str) -> bytes:
+        headers = {'Content-Type': content_type, 'Accept': 'application/json'}
+        credentials = await self._get_credentials()
+        request = AWSRequest(method='POST', url=url, data=body, headers=headers)
+        SigV4Auth(credentials, service, self.region).add_auth(request)
+        headers = dict(request.headers.items())
+        async with self.http.post(url, data=body, headers=headers) as response:
+            response.raise_for_status()
+            return await response.read()
+    async def _get_credentials(self):
+        # Resolving and refreshing credentials may call STS or the instance metadata
+        # service, so both run off the event loop.
+        loop = asyncio.get_running_loop()
+        if self._credentials is None:
+            session = self._session or boto3.Session()
+            self._credentials = await loop.run_in_executor(None, session.get_credentials)
+            if self._credentials is None:
+                raise NoCredentialsError()
+        return await loop.run_in_executor(None, self._credentials.get_frozen_credentials)
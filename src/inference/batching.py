@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.utils.monitoring import log_batch
+
+PredictBatchFn = Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]
+
+
+class BatchQueueFullError(Exception):
+    pass
+
+
+class MicroBatcher:
+    """Collects concurrent requests into batches for ``predict_batch``.
+
+    A batch is dispatched once it holds ``max_batch_size`` requests or its
+    oldest request has waited ``max_wait_ms``. Up to ``max_concurrent_batches``
+    run in the default thread pool at once; each caller gets back the result at
+    its own position in the batch.
+    """
+    def __init__(self, predict_batch: PredictBatchFn, max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, max_queue_size: int = 1024,
+                 max_concurrent_batches: int = 4):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.max_concurrent_batches = max_concurrent_batches
+        self.logger = logging.getLogger(__name__)
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+    @classmethod
+    def from_config(cls, predict_batch: PredictBatchFn,
+                    batching_config: Dict[str, Any]) -> 'MicroBatcher':
+        return cls(
+            predict_batch,
+            max_batch_size=batching_config.get('max_batch_size', 32),
+            max_wait_ms=batching_config.get('max_wait_ms', 5.0),
+            max_queue_size=batching_config.get('max_queue_size', 1024),
+            max_concurrent_batches=batching_config.get('max_concurrent_batches', 4)
+        )
+    async def submit(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((payload, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            raise BatchQueueFullError(
+                f"Batch queue is full ({self.max_queue_size} pending requests)")
+        return await future
+    async def close(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        await asyncio.gather(self._worker, *self._inflight, return_exceptions=True)
+        self._fail(self._drain(), "Batcher closed before the request was dispatched")
+        self._worker = None
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            if self._worker is not None:
+                # The worker died; whatever it left queued would never be dispatched.
+                if not self._worker.cancelled() and self._worker.exception() is not None:
+                    self.logger.error("Batch worker stopped", exc_info=self._worker.exception())
+                self._fail(self._drain(), "Batch worker stopped before the request was dispatched")
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = asyncio.get_running_loop().create_task(self._collect())
+    def _drain(self) -> List[Tuple[Dict[str, Any], asyncio.Future, float]]:
+        items = []
+        while self._queue is not None and not self._queue.empty():
+            items.append(self._queue.get_nowait())
+        return items
+    @staticmethod
+    def _fail(items: List[Tuple[Dict[str, Any], asyncio.Future, float]], message: str):
+        for _, future, _ in items:
+            if not future.done():
+                future.set_exception(RuntimeError(message))
+    async def _collect(self):
+        while True:
+            batch = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = batch[0][2] + self.max_wait_s
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - time.perf_counter()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                await self._slots.acquire()
+            except BaseException:
+                # Requests already taken off the queue would otherwise wait forever.
+                self._fail(batch, "Batch worker stopped before the request was dispatched")
+                raise
+            task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+    async def _dispatch(self, batch: List[Tuple[Dict[str, Any], asyncio.Future, float]]):
+        try:
+            now = time.perf_counter()
+            log_batch(len(batch), [(now - enqueued) * 1000 for _, _, enqueued in batch])
+            payloads = [payload for payload, _, _ in batch]
+            try:
+                loop = asyncio.get_running_loop()
+                results = await loop.run_in_executor(None, self.predict_batch, payloads)
+                if len(results) != len(batch):
+                    raise ValueError(f"predict_batch returned {len(results)} results "
+                                     f"for {len(batch)} payloads")
+            except Exception as exc:
+                self.logger.exception(f"Batch of {len(batch)} requests failed")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                return
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
@@ -0,0 +1,192 @@
+import calendar
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+OK = 'ok'
+WARN = 'warn'
+SHED = 'shed'
+ROUTE_CHEAPER = 'route_cheaper'
+POLICIES = (WARN, SHED, ROUTE_CHEAPER)
+
+CostKey = Tuple[str, str]
+
+
+class BudgetExceededError(Exception):
+    pass
+
+
+def month_bounds(now: float) -> Tuple[float, float]:
+    """Start and length in seconds of the UTC calendar month containing ``now``."""
+    moment = datetime.fromtimestamp(now, tz=timezone.utc)
+    start = datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+    return start.timestamp(), calendar.monthrange(moment.year, moment.month)[1] * 86400.0
+
+
+class CostTracker:
+    """Running inference cost per provider and model, rolled up periodically.
+
+    ``record`` only touches a per-thread accumulator, so the request path never
+    takes a shared lock. Every ``rollup_interval_s`` a background thread sums
+    the accumulators, publishes the window's totals to the metrics sink and
+    projects month-to-date spend over the whole calendar month. Once the
+    projection reaches ``warn_at`` of ``monthly_budget_usd`` the state becomes
+    ``warn``; at ``act_at`` it becomes ``policy`` (``warn``, ``shed`` or
+    ``route_cheaper``). Requests read that state without locking.
+
+    Spend is tracked per process and starts from zero when the process
+    starts; workers do not see each other's spend. Each therefore holds a
+    ``1 / workers`` share of ``monthly_budget_usd``, so ``workers`` must be
+    the number of processes serving under the budget (instances times
+    server workers). A restart mid-month forgets that process's spend.
+    """
+    def __init__(self, monthly_budget_usd: Optional[float] = None, warn_at: float = 0.8,
+                 act_at: float = 1.0, policy: str = WARN, cheaper_provider: Optional[str] = None,
+                 rollup_interval_s: float = 60.0, metrics_sink=None, history: int = 60,
+                 clock: Callable[[], float] = time.time, workers: int = 1):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown budget policy {policy!r}; "
+                             f"expected one of {', '.join(POLICIES)}")
+        if policy == ROUTE_CHEAPER and not cheaper_provider:
+            raise ValueError("The route_cheaper budget policy needs cost.cheaper_provider")
+        if workers < 1:
+            raise ValueError(f"cost.workers must be at least 1, got {workers}")
+        self.monthly_budget_usd = monthly_budget_usd
+        self.warn_at = warn_at
+        self.act_at = act_at
+        self.policy = policy
+        self.cheaper_provider = cheaper_provider
+        self.workers = workers
+        self.rollup_interval_s = rollup_interval_s
+        self.metrics_sink = metrics_sink
+        self.clock = clock
+        self.state = OK
+        self.month_to_date_usd = 0.0
+        self.projected_month_usd = 0.0
+        self.windows: Deque[Tuple[float, Dict[CostKey, Tuple[float, int]]]] = deque(maxlen=history)
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()
+        self._shards: List[Dict[CostKey, List[float]]] = []
+        self._shards_lock = threading.Lock()
+        self._rollup_lock = threading.Lock()
+        self._published: Dict[CostKey, Tuple[float, int]] = {}
+        self._month_start = month_bounds(clock())[0]
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if rollup_interval_s:
+            self._thread = threading.Thread(target=self._run, name='cost-rollup', daemon=True)
+            self._thread.start()
+    @classmethod
+    def from_config(cls, cost_config: Dict[str, Any], metrics_sink=None) -> 'CostTracker':
+        return cls(
+            monthly_budget_usd=cost_config.get('monthly_budget_usd'),
+            warn_at=cost_config.get('warn_at', 0.8),
+            act_at=cost_config.get('act_at', 1.0),
+            policy=cost_config.get('policy', WARN),
+            cheaper_provider=cost_config.get('cheaper_provider'),
+            rollup_interval_s=cost_config.get('rollup_interval_s', 60.0),
+            metrics_sink=metrics_sink,
+            workers=cost_config.get('workers', 1)
+        )
+    @property
+    def budget_usd(self) -> Optional[float]:
+        """This process's share of the monthly budget."""
+        if self.monthly_budget_usd is None:
+            return None
+        return self.monthly_budget_usd / self.workers
+    def record(self, provider: str, model_id: str, cost_usd: float):
+        shard = getattr(self._local, 'totals', None)
+        if shard is None:
+            shard = self._local.totals = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        totals = shard.get((provider, model_id))
+        if totals is None:
+            totals = shard[(provider, model_id)] = [0.0, 0]
+        totals[0] += cost_usd
+        totals[1] += 1
+    def totals(self) -> Dict[CostKey, Tuple[float, int]]:
+        """Lifetime ``(cost_usd, inferences)`` per ``(provider, model_id)``, incl. unpublished."""
+        with self._shards_lock:
+            shards = list(self._shards)
+        merged: Dict[CostKey, List[float]] = {}
+        for shard in shards:
+            for key, (cost, count) in list(shard.items()):
+                entry = merged.setdefault(key, [0.0, 0])
+                entry[0] += cost
+                entry[1] += count
+        return {key: (cost, int(count)) for key, (cost, count) in merged.items()}
+    def rollup(self) -> Dict[CostKey, Tuple[float, int]]:
+        """Fold spend since the last rollup into the month, publish it, re-evaluate the policy."""
+        with self._rollup_lock:
+            now = self.clock()
+            current = self.totals()
+            window = {}
+            for key, (cost, count) in current.items():
+                previous_cost, previous_count = self._published.get(key, (0.0, 0))
+                if count != previous_count:
+                    window[key] = (cost - previous_cost, count - previous_count)
+            self._published = current
+            month_start, month_length = month_bounds(now)
+            if month_start != self._month_start:
+                self._month_start = month_start
+                self.month_to_date_usd = 0.0
+            self.month_to_date_usd += sum(cost for cost, _ in window.values())
+            # At least an hour of elapsed time, so the first requests of a month do not dominate.
+            elapsed = max(now - month_start, 3600.0)
+            self.projected_month_usd = max(self.month_to_date_usd,
+                                           self.month_to_date_usd / elapsed * month_length)
+            self.windows.append((now, window))
+            self._update_state()
+            self._publish(window)
+            return window
+    def provider_for(self, provider: str) -> str:
+        """Provider to use under the current state; raises BudgetExceededError when shedding."""
+        state = self.state
+        if state == SHED:
+            raise BudgetExceededError(
+                f"Projected monthly spend ${self.projected_month_usd:.2f} exceeds this worker's "
+                f"${self.budget_usd:.2f} share of the budget; shedding requests"
+            )
+        if state == ROUTE_CHEAPER:
+            return self.cheaper_provider
+        return provider
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.rollup()
+    def _update_state(self):
+        if not self.monthly_budget_usd:
+            return
+        utilisation = self.projected_month_usd / self.budget_usd
+        if utilisation >= self.act_at:
+            state = self.policy
+        elif utilisation >= self.warn_at:
+            state = WARN
+        else:
+            state = OK
+        if state != self.state:
+            log = self.logger.info if state == OK else self.logger.warning
+            log(f"Cost budget state {self.state} -> {state}: "
+                f"projected ${self.projected_month_usd:.2f} of ${self.budget_usd:.2f} "
+                f"(month to date ${self.month_to_date_usd:.2f})")
+            self.state = state
+    def _publish(self, window: Dict[CostKey, Tuple[float, int]]):
+        if self.metrics_sink is None:
+            return
+        for (provider, model_id), (cost, count) in window.items():
+            dimensions = {'Provider': provider, 'ModelId': model_id}
+            self.metrics_sink.put('Cost', cost, dimensions=dimensions)
+            self.metrics_sink.put('Inferences', count, unit='Count', dimensions=dimensions)
+        self.metrics_sink.put('MonthToDateCost', self.month_to_date_usd)
+        self.metrics_sink.put('ProjectedMonthlyCost', self.projected_month_usd)
+    def _run(self):
+        while not self._stop.wait(self.rollup_interval_s):
+            try:
+                self.rollup()
+            except Exception:
+                self.logger.exception("Cost rollup failed")
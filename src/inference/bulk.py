@@ -0,0 +1,109 @@
+import json
+import zlib
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+PredictBatchFn = Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]
+
+
+async def _decompressed(chunks: AsyncIterator[bytes], gzipped: bool,
+                        piece_size: int) -> AsyncIterator[bytes]:
+    if not gzipped:
+        async for chunk in chunks:
+            yield chunk
+        return
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        while chunk:
+            yield decompressor.decompress(chunk, piece_size)
+            chunk = decompressor.unconsumed_tail
+    yield decompressor.flush()
+
+
+async def iter_jsonl_lines(
+    chunks: AsyncIterator[bytes], gzipped: bool = False, max_line_bytes: int = 1 << 20
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """Yield ``(line_number, line)`` from a streamed, optionally gzipped, JSONL body.
+
+    Lines longer than ``max_line_bytes`` are discarded and yielded as ``None``
+    so the caller can report them without buffering the oversized row.
+    """
+    buffer = b''
+    skipping = False
+    line_number = 0
+    async for chunk in _decompressed(chunks, gzipped, max_line_bytes):
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            line_number += 1
+            if skipping:
+                skipping = False
+                yield line_number, None
+            elif len(line) > max_line_bytes:
+                yield line_number, None
+            elif line.strip():
+                yield line_number, line
+        if len(buffer) > max_line_bytes:
+            buffer = b''
+            skipping = True
+    if skipping or len(buffer) > max_line_bytes:
+        yield line_number + 1, None
+    elif buffer.strip():
+        yield line_number + 1, buffer
+
+
+def _parse_row(line: Optional[bytes]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    if line is None:
+        return None, "line exceeds maximum length"
+    try:
+        payload = json.loads(line)
+    except ValueError as e:
+        return None, f"invalid JSON: {e}"
+    if not isinstance(payload, dict):
+        return None, "row is not a JSON object"
+    return payload, None
+
+
+def _score_chunk(predict_batch: PredictBatchFn,
+                 rows: List[Tuple[int, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    try:
+        results = predict_batch([payload for _, payload in rows])
+        return [{'line': n, 'prediction': r['prediction']} for (n, _), r in zip(rows, results)]
+    except Exception:
+        # Re-score row by row so a single bad payload only fails its own line.
+        output = []
+        for n, payload in rows:
+            try:
+                output.append({'line': n, 'prediction': predict_batch([payload])[0]['prediction']})
+            except Exception as e:
+                output.append({'line': n, 'error': f"{type(e).__name__}: {e}"})
+        return output
+
+
+async def score_jsonl(chunks: AsyncIterator[bytes], predict_batch: PredictBatchFn,
+                      chunk_size: int = 256, gzipped: bool = False,
+                      max_line_bytes: int = 1 << 20) -> AsyncIterator[bytes]:
+    """Score a JSONL stream in chunks of ``chunk_size`` rows and yield JSONL results.
+
+    Only one chunk is held in memory at a time, and the next chunk is not read
+    until the previous one has been handed to the client.
+    """
+    async def flush(pending):
+        rows = [(n, payload) for n, payload, error in pending if error is None]
+        results = await run_in_threadpool(_score_chunk, predict_batch, rows) if rows else []
+        scored = {r['line']: r for r in results}
+        lines = []
+        for n, _, error in pending:
+            lines.append(json.dumps(scored[n] if error is None else {'line': n, 'error': error}))
+        return ('\n'.join(lines) + '\n').encode()
+
+    pending = []
+    async for line_number, line in iter_jsonl_lines(chunks, gzipped, max_line_bytes):
+        payload, error = _parse_row(line)
+        pending.append((line_number, payload, error))
+        if len(pending) >= chunk_size:
+            yield await flush(pending)
+            pending = []
+    if pending:
+        yield await flush(pending)
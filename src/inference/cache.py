@@ -0,0 +1,253 @@
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Set on an in-flight future whose leader was interrupted; a follower computes instead.
+_ABANDONED = object()
+
+
+def cache_key(payload: Dict[str, Any], provider: str, model_id: str, model_version: str) -> str:
+    """Canonical hash of a request: key order and whitespace in the payload do not matter."""
+    canonical = json.dumps(
+        {'payload': payload, 'provider': provider, 'model_id': model_id,
+         'model_version': model_version},
+        sort_keys=True, separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL response cache with an optional on-disk second tier.
+
+    The memory tier is bounded by ``max_entries`` and ``max_bytes`` (size of the
+    JSON-encoded response). Concurrent lookups of the same missing key are
+    coalesced so only one caller computes the response; the others wait for it
+    and count as hits.
+
+    The disk tier is bounded by ``max_disk_entries`` and ``max_disk_bytes``.
+    Writes sweep the directory every tenth of ``max_disk_entries`` puts (and
+    the constructor sweeps it once): expired files go first, then the oldest
+    until both limits hold, so between sweeps it can exceed them by a tenth.
+    """
+    def __init__(self, ttl_s: float = 300.0, max_entries: int = 10000,
+                 max_bytes: int = 64 * 1024 * 1024, disk_dir: Optional[str] = None,
+                 max_disk_entries: int = 100000, max_disk_bytes: int = 1024 * 1024 * 1024):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._disk_sweep_interval = max(1, max_disk_entries // 10)
+        self._disk_puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._unreported_evictions = 0
+        self.current_bytes = 0
+        self._entries: 'OrderedDict[str, Tuple[float, int, Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._ainflight: Dict[str, asyncio.Future] = {}
+        self.logger = logging.getLogger(__name__)
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.sweep_disk()
+    @classmethod
+    def from_config(cls, cache_config: Dict[str, Any]) -> 'ResponseCache':
+        return cls(
+            ttl_s=cache_config.get('ttl_s', 300.0),
+            max_entries=cache_config.get('max_entries', 10000),
+            max_bytes=cache_config.get('max_bytes', 64 * 1024 * 1024),
+            disk_dir=cache_config.get('disk_dir'),
+            max_disk_entries=cache_config.get('max_disk_entries', 100000),
+            max_disk_bytes=cache_config.get('max_disk_bytes', 1024 * 1024 * 1024)
+        )
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(entry[2])
+                self._remove(key)
+        response = self._disk_get(key, now)
+        with self._lock:
+            if response is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._memory_put(key, response)
+        return copy.deepcopy(response)
+    def put(self, key: str, response: Dict[str, Any]):
+        self._memory_put(key, response)
+        self._disk_put(key, response)
+    def get_or_compute(self, key: str,
+                       compute: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        """Return ``(response, hit)``, calling ``compute`` only if no other thread already is.
+
+        If the computing thread is interrupted, one of the waiting threads computes instead.
+        """
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                return cached, True
+            with self._lock:
+                leader = self._inflight.get(key)
+                if leader is None:
+                    future = self._inflight[key] = Future()
+            if leader is None:
+                break
+            response = leader.result()
+            with self._lock:
+                self.misses -= 1
+                if response is not _ABANDONED:
+                    self.hits += 1
+            if response is not _ABANDONED:
+                return copy.deepcopy(response), True
+        try:
+            response = compute()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            future.set_result(_ABANDONED)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        self.put(key, response)
+        future.set_result(response)
+        return response, False
+    async def aget_or_compute(
+        self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Async ``get_or_compute``; a cancelled leader hands the computation to a follower."""
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                return cached, True
+            leader = self._ainflight.get(key)
+            if leader is None:
+                break
+            response = await asyncio.shield(leader)
+            with self._lock:
+                self.misses -= 1
+                if response is not _ABANDONED:
+                    self.hits += 1
+            if response is not _ABANDONED:
+                return copy.deepcopy(response), True
+        future = self._ainflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            response = await compute()
+        except Exception as e:
+            future.set_exception(e)
+            # Followers re-raise it; retrieve it so there is no "exception never retrieved"
+            # warning when there are none.
+            future.exception()
+            raise
+        except BaseException:
+            # Only this caller was cancelled (e.g. its client disconnected); followers retry.
+            future.set_result(_ABANDONED)
+            raise
+        finally:
+            self._ainflight.pop(key, None)
+        self.put(key, response)
+        future.set_result(response)
+        return response, False
+    def take_evictions(self) -> int:
+        """Evictions since the previous call, for publishing as a metric delta."""
+        with self._lock:
+            evictions, self._unreported_evictions = self._unreported_evictions, 0
+        return evictions
+    def _memory_put(self, key: str, response: Dict[str, Any]):
+        size = len(json.dumps(response, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + self.ttl_s, size, copy.deepcopy(response))
+            self.current_bytes += size
+            while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+                self._unreported_evictions += 1
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+    def _disk_get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry['expires_at'] <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry['response']
+    def _disk_put(self, key: str, response: Dict[str, Any]):
+        if not self.disk_dir:
+            return
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                entry = {'expires_at': time.time() + self.ttl_s, 'response': response}
+                json.dump(entry, f, default=str)
+            os.replace(tmp_path, self._disk_path(key))
+        except (OSError, TypeError, ValueError):
+            self.logger.exception(f"Failed to write cache entry {key} to disk")
+        with self._lock:
+            self._disk_puts += 1
+            sweep = self._disk_puts >= self._disk_sweep_interval
+            if sweep:
+                self._disk_puts = 0
+        if sweep:
+            self.sweep_disk()
+    def sweep_disk(self) -> int:
+        """Delete expired, then oldest, disk entries until within the limits; returns the count."""
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            # Files are written once, so their mtime is their write time.
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        count, removed = len(entries), 0
+        for mtime, size, path in entries:
+            expired = mtime + self.ttl_s <= now
+            if not expired and count <= self.max_disk_entries and total <= self.max_disk_bytes:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            count -= 1
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,207 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.inference.tree_engine import CompiledForest, compile_model
+
+
+MODEL_STAGES = ('None', 'Staging', 'Production', 'Archived')
+
+
+class SignatureError(ValueError):
+    pass
+
+
+class LoadedModel:
+    def __init__(self, pyfunc_model, version: str, compiled: Optional[CompiledForest] = None,
+                 transformer=None):
+        self.model = pyfunc_model
+        self.version = version
+        self.compiled = compiled
+        self.transformer = transformer
+        self.schema = pyfunc_model.metadata.get_input_schema()
+        self.columns = self.schema.input_names() if self.schema is not None else None
+    def predict_rows(self, rows: List[Dict[str, Any]]) -> List[Any]:
+        if self.columns is not None:
+            for i, row in enumerate(rows):
+                missing = [c for c in self.columns if c not in row]
+                if missing:
+                    raise SignatureError(
+                        f"Row {i} is missing inputs required by the model signature: {missing}")
+        if self.transformer is not None:
+            return self._predict_transformed(rows)
+        if self.compiled is not None and self.columns is not None:
+            try:
+                X = np.array([[row[c] for c in self.columns] for row in rows], dtype=np.float32)
+            except (TypeError, ValueError) as e:
+                raise SignatureError(f"Inputs must be numeric for the compiled model: {e}") from e
+            return self.compiled.predict(X).tolist()
+        import pandas as pd
+        if self.columns is not None:
+            frame = pd.DataFrame(rows, columns=self.columns)
+        else:
+            frame = pd.DataFrame(rows)
+        try:
+            predictions = self.model.predict(frame)
+        except Exception as e:
+            if type(e).__name__ == 'MlflowException':
+                raise SignatureError(str(e)) from e
+            raise
+        return predictions.tolist() if hasattr(predictions, 'tolist') else list(predictions)
+    def _predict_transformed(self, rows: List[Dict[str, Any]]) -> List[Any]:
+        try:
+            X = self.transformer.transform_rows(rows)
+        except (TypeError, ValueError) as e:
+            raise SignatureError(f"Inputs do not match the model's feature transformer: {e}") from e
+        if self.compiled is not None:
+            return self.compiled.predict(X).tolist()
+        import pandas as pd
+        predictions = self.model.predict(pd.DataFrame(X, columns=self.transformer.feature_names))
+        return predictions.tolist() if hasattr(predictions, 'tolist') else list(predictions)
+    def warm_up(self):
+        """Run one prediction so lazy initialisation happens before traffic arrives."""
+        example = None
+        try:
+            example = self.model.input_example
+        except Exception:
+            pass
+        if example is not None:
+            self.model.predict(example)
+        elif self.schema is not None:
+            defaults = {'double': 0.0, 'float': 0.0, 'long': 0, 'integer': 0,
+                        'boolean': False, 'string': ''}
+            row = {spec.name: defaults.get(str(spec.type), 0) for spec in self.schema.inputs}
+            self.predict_rows([row])
+
+
+class LocalModel:
+    """Serves an MLflow model in-process, reloading it when a new version appears.
+
+    ``model_uri`` is either a registry URI (``models:/<name>/<ref>``, where ``ref``
+    is a version number, an alias, a stage such as ``Production``, or ``latest``)
+    or a local directory written by ``mlflow.sklearn.save_model``/``log_model``.
+    A reload loads and warms the new model before swapping the reference, so
+    requests already running keep using the model they started with. With
+    ``compiled`` set, tree ensembles are served through ``CompiledForest``.
+    """
+    def __init__(self, model_uri: str, tracking_uri: Optional[str] = None,
+                 reload_interval_s: float = 0, compiled: bool = False,
+                 compiled_dtype: str = 'float64'):
+        self.model_uri = model_uri
+        self.tracking_uri = tracking_uri
+        self.reload_interval_s = reload_interval_s
+        self.compiled = compiled
+        self.compiled_dtype = compiled_dtype
+        self.logger = logging.getLogger(__name__)
+        self._current: Optional[LoadedModel] = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'LocalModel':
+        local = config.get('local_model', {})
+        model_uri = local.get('model_uri')
+        if not model_uri:
+            model = config['model']
+            model_uri = f"models:/{model['name']}/{model.get('version', 'latest')}"
+        return cls(
+            model_uri,
+            tracking_uri=config.get('mlflow', {}).get('tracking_uri'),
+            reload_interval_s=local.get('reload_interval_s', 0),
+            compiled=local.get('compiled', False),
+            compiled_dtype=local.get('compiled_dtype', 'float64')
+        )
+    @property
+    def version(self) -> Optional[str]:
+        return self._current.version if self._current is not None else None
+    def start(self):
+        self.reload()
+        if self.reload_interval_s and self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name='local-model-reload',
+                                             daemon=True)
+            self._watcher.start()
+    def stop(self):
+        self._stop.set()
+    def predict_rows(self, rows: List[Dict[str, Any]]) -> Tuple[List[Any], str]:
+        """Return the predictions and the version of the model that produced them."""
+        model = self._current
+        if model is None:
+            raise RuntimeError("Local model has not been loaded")
+        return model.predict_rows(rows), model.version
+    def reload(self) -> bool:
+        """Load the model if its version changed; return True if a new model was swapped in."""
+        with self._reload_lock:
+            version = self._resolve_version()
+            if self._current is not None and version == self._current.version:
+                return False
+            import mlflow.artifacts
+            import mlflow.pyfunc
+            if self.tracking_uri and self.model_uri.startswith('models:/'):
+                mlflow.set_tracking_uri(self.tracking_uri)
+            uri = self._versioned_uri(version)
+            path = mlflow.artifacts.download_artifacts(artifact_uri=uri)
+            pyfunc_model = mlflow.pyfunc.load_model(path)
+            compiled = None
+            if self.compiled:
+                compiled = compile_model(_native_model(pyfunc_model), dtype=self.compiled_dtype)
+            from src.features.feature_engineering import TRANSFORMER_FILE, TabularTransformer
+            transformer_path = os.path.join(path, TRANSFORMER_FILE)
+            transformer = None
+            if os.path.exists(transformer_path):
+                transformer = TabularTransformer.load(transformer_path)
+            loaded = LoadedModel(pyfunc_model, version, compiled, transformer)
+            loaded.warm_up()
+            self._current = loaded
+            self.logger.info(f"Serving local model {uri} (version {version})")
+            return True
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval_s):
+            try:
+                self.reload()
+            except Exception:
+                self.logger.exception(
+                    f"Reloading {self.model_uri} failed; keeping version {self.version}")
+    def _resolve_version(self) -> str:
+        if self.model_uri.startswith('models:/'):
+            name, _, version = self.model_uri[len('models:/'):].partition('/')
+            if version and version.isdigit():
+                return version
+            from mlflow.tracking import MlflowClient
+            client = MlflowClient(tracking_uri=self.tracking_uri)
+            if version and version != 'latest':
+                return self._resolve_alias_or_stage(client, name, version)
+            versions = client.search_model_versions(f"name='{name}'")
+            if not versions:
+                raise RuntimeError(f"No registered versions for model {name}")
+            return str(max(int(v.version) for v in versions))
+        return str(os.path.getmtime(os.path.join(self.model_uri, 'MLmodel')))
+    @staticmethod
+    def _resolve_alias_or_stage(client, name: str, ref: str) -> str:
+        from mlflow.exceptions import MlflowException
+        try:
+            return client.get_model_version_by_alias(name, ref).version
+        except MlflowException:
+            stage = ref.capitalize()
+            if stage not in MODEL_STAGES:
+                raise
+        versions = client.get_latest_versions(name, stages=[stage])
+        if not versions:
+            raise RuntimeError(f"No versions of model {name} in stage {stage}")
+        return str(versions[0].version)
+    def _versioned_uri(self, version: str) -> str:
+        if self.model_uri.startswith('models:/'):
+            name = self.model_uri[len('models:/'):].partition('/')[0]
+            return f"models:/{name}/{version}"
+        return self.model_uri
+
+
+def _native_model(pyfunc_model) -> Any:
+    """The sklearn or XGBoost model behind a pyfunc wrapper, without loading it again."""
+    impl = pyfunc_model._model_impl
+    for attr in ('sklearn_model', 'xgb_model'):
+        if hasattr(impl, attr):
+            return getattr(impl, attr)
+    return impl
@@ -0,0 +1,129 @@
+import atexit
+import logging
+import threading
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+MAX_DATUMS_PER_REQUEST = 1000
+MAX_VALUES_PER_DATUM = 150
+
+MetricKey = Tuple[str, str, Tuple[Tuple[str, str], ...]]
+
+
+class InMemoryCloudWatch:
+    """Drop-in for the boto3 CloudWatch client that keeps every request in memory."""
+    def __init__(self):
+        self.requests: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+    def put_metric_data(self, Namespace: str, MetricData: List[Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock:
+            self.requests.append({'Namespace': Namespace, 'MetricData': list(MetricData)})
+        return {}
+    def datums(self, metric_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                datum
+                for request in self.requests
+                for datum in request['MetricData']
+                if metric_name is None or datum['MetricName'] == metric_name
+            ]
+
+
+class BufferedMetricsSink:
+    """Queues metric values and publishes them to CloudWatch in aggregated batches.
+
+    A background thread flushes every ``flush_interval_s`` seconds or as soon as
+    ``max_batch_size`` values are waiting. The queue holds at most
+    ``max_queue_size`` values and drops the oldest ones when producers outrun
+    CloudWatch; the number dropped is published as ``MetricsDropped``.
+    """
+    def __init__(self, client, namespace: str = 'ML/Inference', flush_interval_s: float = 10.0,
+                 max_batch_size: int = 500, max_queue_size: int = 10000):
+        self.client = client
+        self.namespace = namespace
+        self.flush_interval_s = flush_interval_s
+        self.max_batch_size = max_batch_size
+        self.dropped = 0
+        self._unreported_drops = 0
+        self._queue: Deque[Tuple[MetricKey, float]] = deque(maxlen=max_queue_size)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = threading.Event()
+        self.logger = logging.getLogger(__name__)
+        self._thread = threading.Thread(target=self._run, name='metrics-sink', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    def put(self, name: str, value: float, unit: str = 'None',
+            dimensions: Optional[Dict[str, str]] = None):
+        key = (name, unit, tuple((dimensions or {}).items()))
+        with self._lock:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+                self._unreported_drops += 1
+            self._queue.append((key, float(value)))
+            pending = len(self._queue)
+        if pending >= self.max_batch_size:
+            self._wakeup.set()
+    def flush(self) -> int:
+        """Publish everything queued so far and return the number of values sent."""
+        with self._flush_lock:
+            with self._lock:
+                items = list(self._queue)
+                self._queue.clear()
+                drops = self._unreported_drops
+                self._unreported_drops = 0
+            if drops:
+                items.append((('MetricsDropped', 'Count', ()), float(drops)))
+            if not items:
+                return 0
+            datums = self._aggregate(items)
+            for start in range(0, len(datums), MAX_DATUMS_PER_REQUEST):
+                chunk = datums[start:start + MAX_DATUMS_PER_REQUEST]
+                try:
+                    self.client.put_metric_data(Namespace=self.namespace, MetricData=chunk)
+                except Exception:
+                    self.logger.exception(f"Failed to publish {len(chunk)} metric datums")
+            return len(items)
+    def close(self, timeout: float = 5.0):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self.flush()
+        atexit.unregister(self.close)
+    def _run(self):
+        while not self._closed.is_set():
+            self._wakeup.wait(self.flush_interval_s)
+            self._wakeup.clear()
+            if self._closed.is_set():
+                break
+            self.flush()
+    def _aggregate(self, items: List[Tuple[MetricKey, float]]) -> List[Dict[str, Any]]:
+        grouped: Dict[MetricKey, List[float]] = {}
+        for key, value in items:
+            grouped.setdefault(key, []).append(value)
+        timestamp = datetime.now(timezone.utc)
+        datums = []
+        for (name, unit, dimensions), values in grouped.items():
+            datum = {
+                'MetricName': name,
+                'Unit': unit,
+                'Timestamp': timestamp,
+                'Dimensions': [{'Name': k, 'Value': v} for k, v in dimensions]
+            }
+            counts = Counter(values)
+            if len(counts) <= MAX_VALUES_PER_DATUM:
+                datum['Values'] = list(counts.keys())
+                datum['Counts'] = [float(c) for c in counts.values()]
+            else:
+                datum['StatisticValues'] = {
+                    'SampleCount': float(len(values)),
+                    'Sum': sum(values),
+                    'Minimum': min(values),
+                    'Maximum': max(values)
+                }
+            datums.append(datum)
+        return datums
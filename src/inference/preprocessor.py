@@ -1,3 +1,18 @@
+from src.features.definitions import DERIVED_FEATURES
+
+
 def preprocess_request(data):
-    # Example preprocessing logic
+    """Add the derived features to a feature row, or to every row of ``instances``.
+
+    Uses the same definitions as batch feature engineering, evaluated on plain
+    dicts. Payloads without the feature inputs (e.g. prompts) pass through.
+    """
+    if isinstance(data, dict):
+        if isinstance(data.get("instances"), list):
+            return dict(data, instances=preprocess_rows(data["instances"]))
+        return DERIVED_FEATURES.apply_row(data)
     return data
+
+
+def preprocess_rows(rows):
+    return [DERIVED_FEATURES.apply_row(row) if isinstance(row, dict) else row for row in rows]
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import numpy as np
+
+ProviderFn = Callable[[Dict[str, Any]], Dict[str, Any]]
+AsyncProviderFn = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+DiscardFn = Callable[[str, Optional[Dict[str, Any]]], None]
+
+
+@dataclass
+class RouteResult:
+    provider: str
+    response: Dict[str, Any]
+    latency_ms: float
+    hedged: bool
+
+
+class ProviderStats:
+    """Rolling latency window and exponentially weighted error rate for one provider."""
+    def __init__(self, window: int = 200, error_decay: float = 0.05):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.error_rate = 0.0
+        self.error_decay = error_decay
+        self._lock = threading.Lock()
+    def record(self, latency_ms: float, ok: bool):
+        with self._lock:
+            self.latencies.append(latency_ms)
+            self.error_rate += self.error_decay * ((0.0 if ok else 1.0) - self.error_rate)
+    @property
+    def count(self) -> int:
+        return len(self.latencies)
+    def percentile(self, q: float) -> float:
+        with self._lock:
+            samples = list(self.latencies)
+        return float(np.percentile(samples, q)) if samples else 0.0
+
+
+class ProviderRouter:
+    """Sends each request to the provider with the best recent latency and error rate.
+
+    If the chosen provider has not answered by its ``hedge_percentile`` latency
+    (or ``default_hedge_ms`` before ``min_samples`` observations), a duplicate
+    request goes to the next-ranked provider and the first successful answer
+    wins. A provider that fails is replaced by the next one straight away.
+    Every attempt, including hedges that lose, updates the provider's stats.
+    A provider with no samples yet scores the mean of those that have some,
+    so it is neither preferred nor starved, and learns from the hedges it
+    receives. Attempts that lose are passed to ``on_discard`` with their
+    response, or ``None`` if they were cancelled first, so their cost can be
+    accounted for.
+    """
+    def __init__(self, providers: Dict[str, ProviderFn],
+                 async_providers: Optional[Dict[str, AsyncProviderFn]] = None,
+                 hedge_percentile: float = 95.0, default_hedge_ms: float = 250.0,
+                 min_samples: int = 20, window: int = 200, error_penalty_ms: float = 1000.0,
+                 max_hedges: int = 1, max_workers: int = 32,
+                 on_discard: Optional[DiscardFn] = None):
+        self.providers = providers
+        self.async_providers = async_providers or {}
+        self.order = list(providers)
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_ms = default_hedge_ms
+        self.min_samples = min_samples
+        self.error_penalty_ms = error_penalty_ms
+        self.max_hedges = max_hedges
+        self.on_discard = on_discard
+        self.stats = {name: ProviderStats(window) for name in providers}
+        self.logger = logging.getLogger(__name__)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix='provider-router')
+    @classmethod
+    def from_config(cls, providers: Dict[str, ProviderFn],
+                    async_providers: Dict[str, AsyncProviderFn], routing_config: Dict[str, Any],
+                    on_discard: Optional[DiscardFn] = None) -> 'ProviderRouter':
+        return cls(
+            providers,
+            async_providers,
+            hedge_percentile=routing_config.get('hedge_percentile', 95.0),
+            default_hedge_ms=routing_config.get('default_hedge_ms', 250.0),
+            min_samples=routing_config.get('min_samples', 20),
+            window=routing_config.get('window', 200),
+            error_penalty_ms=routing_config.get('error_penalty_ms', 1000.0),
+            max_hedges=routing_config.get('max_hedges', 1),
+            max_workers=routing_config.get('max_workers', 32),
+            on_discard=on_discard
+        )
+    def rank(self) -> List[str]:
+        scores = {
+            name: (self.stats[name].percentile(50)
+                   + self.stats[name].error_rate * self.error_penalty_ms)
+            for name in self.order if self.stats[name].count
+        }
+        neutral = sum(scores.values()) / len(scores) if scores else 0.0
+        # sorted() is stable, so ties (and providers with no data) keep their configured order.
+        return sorted(self.order, key=lambda name: scores.get(name, neutral))
+    def hedge_delay_s(self, name: str) -> float:
+        stats = self.stats[name]
+        if stats.count < self.min_samples:
+            return self.default_hedge_ms / 1000
+        return stats.percentile(self.hedge_percentile) / 1000
+    def route(self, payload: Dict[str, Any]) -> RouteResult:
+        ranked = self.rank()
+        start = time.perf_counter()
+        pending = {}
+        hedges = 0
+        last_error: Optional[BaseException] = None
+        def launch(name: str) -> float:
+            pending[self._pool.submit(self._attempt, name, payload)] = name
+            return time.perf_counter() + self.hedge_delay_s(name)
+        deadline = launch(ranked.pop(0))
+        while pending:
+            can_hedge = ranked and hedges < self.max_hedges
+            timeout = max(0.0, deadline - time.perf_counter()) if can_hedge else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedges += 1
+                deadline = launch(ranked.pop(0))
+                continue
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    self.logger.warning(f"Provider {name} failed: {e}")
+                    continue
+                self._discard_pending(pending)
+                return RouteResult(name, response, (time.perf_counter() - start) * 1000, hedges > 0)
+            if not pending and ranked:
+                deadline = launch(ranked.pop(0))
+        raise last_error
+    async def aroute(self, payload: Dict[str, Any]) -> RouteResult:
+        ranked = self.rank()
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        pending: Dict[asyncio.Task, str] = {}
+        hedges = 0
+        last_error: Optional[BaseException] = None
+        def launch(name: str) -> float:
+            pending[loop.create_task(self._aattempt(name, payload))] = name
+            return time.perf_counter() + self.hedge_delay_s(name)
+        deadline = launch(ranked.pop(0))
+        try:
+            while pending:
+                can_hedge = ranked and hedges < self.max_hedges
+                timeout = max(0.0, deadline - time.perf_counter()) if can_hedge else None
+                done, _ = await asyncio.wait(pending, timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedges += 1
+                    deadline = launch(ranked.pop(0))
+                    continue
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        self.logger.warning(f"Provider {name} failed: {last_error}")
+                        continue
+                    self._discard_pending(pending)
+                    latency_ms = (time.perf_counter() - start) * 1000
+                    return RouteResult(name, task.result(), latency_ms, hedges > 0)
+                if not pending and ranked:
+                    deadline = launch(ranked.pop(0))
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+    def close(self):
+        self._pool.shutdown(wait=False)
+    def _discard_pending(self, pending: Dict[Any, str]):
+        """Report each losing attempt to ``on_discard`` once it finishes or is cancelled."""
+        if self.on_discard is None:
+            return
+        for future, name in pending.items():
+            future.add_done_callback(lambda f, name=name: self._discarded(name, f))
+    def _discarded(self, name: str, future):
+        if future.cancelled():
+            response = None
+        elif future.exception() is not None:
+            return
+        else:
+            response = future.result()
+        try:
+            self.on_discard(name, response)
+        except Exception:
+            self.logger.exception(f"Accounting for the discarded {name} attempt failed")
+    def _attempt(self, name: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            response = self.providers[name](payload)
+        except Exception:
+            self.stats[name].record((time.perf_counter() - start) * 1000, ok=False)
+            raise
+        self.stats[name].record((time.perf_counter() - start) * 1000, ok=True)
+        return response
+    async def _aattempt(self, name: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            if name in self.async_providers:
+                response = await self.async_providers[name](payload)
+            else:
+                response = await asyncio.get_running_loop().run_in_executor(
+                    self._pool, self.providers[name], payload
+                )
+        except asyncio.CancelledError:
+            # A cancelled hedge loser took at least this long; keep that as a lower bound.
+            self.stats[name].record((time.perf_counter() - start) * 1000, ok=True)
+            raise
+        except Exception:
+            self.stats[name].record((time.perf_counter() - start) * 1000, ok=False)
+            raise
+        self.stats[name].record((time.perf_counter() - start) * 1000, ok=True)
+        return response
@@ -1,27 +1,251 @@
-from fastapi import FastAPI, Request
+import asyncio
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
 import uvicorn
-import yaml
 import time
-from adapter import InferenceAdapter
-app = FastAPI()
+from src.inference.batching import BatchQueueFullError, MicroBatcher
+from src.inference.budget import BudgetExceededError
+from src.inference.bulk import score_jsonl
+from src.inference.local_model import SignatureError
+from src.features.definitions import FeatureError
+from src.inference.preprocessor import preprocess_request, preprocess_rows
+from src.utils.config import load_config
+from src.utils.monitoring import (
+    RequestTimer, in_flight_gauge, log_error, mark_worker_exit, render_metrics,
+    request_size_histogram
+)
 
-with open("configs/dev.yaml") as f:
-    config = yaml.safe_load(f)
-adapter = InferenceAdapter(config)
+logger = logging.getLogger(__name__)
+
+config = load_config()
+adapter = None
+batcher = None
+startup_error = None
+_warm_up_task = None
+_build_lock = threading.Lock()
+
+def _build_adapter():
+    # boto3, aiohttp and the model are only imported/loaded here, off the import path.
+    global adapter
+    with _build_lock:
+        if adapter is None:
+            from src.inference.adapter import InferenceAdapter
+            built = InferenceAdapter(config)
+            built.warm_up()
+            adapter = built
+    return adapter
+
+async def get_adapter():
+    """The adapter, built on first use if the background warm-up has not finished yet."""
+    global batcher
+    if adapter is None:
+        await asyncio.get_running_loop().run_in_executor(None, _build_adapter)
+    if batcher is None and config.get("batching", {}).get("enabled", False):
+        batcher = MicroBatcher.from_config(adapter.predict_batch, config["batching"])
+    return adapter
+
+async def _warm_up():
+    """Build the adapter, retrying every ``startup.retry_interval_s`` until it succeeds."""
+    global startup_error
+    retry_interval_s = config.get("startup", {}).get("retry_interval_s", 5)
+    start = time.perf_counter()
+    while True:
+        try:
+            await get_adapter()
+        except Exception as e:
+            startup_error = e
+            logger.exception(f"Warm-up failed; retrying in {retry_interval_s} s")
+            await asyncio.sleep(retry_interval_s)
+            continue
+        startup_error = None
+        logger.info(f"Warm-up finished in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return
+
+def _warm_up_running():
+    task = _warm_up_task
+    return task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop()
+
+def _start_warm_up():
+    """Start the warm-up in the running loop unless the adapter is built or a warm-up is running."""
+    global _warm_up_task
+    if adapter is None and not _warm_up_running():
+        _warm_up_task = asyncio.create_task(_warm_up())
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config.get("startup", {}).get("warm_up", True):
+        _start_warm_up()
+    yield
+    if _warm_up_running():
+        _warm_up_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await _warm_up_task
+    if batcher is not None:
+        await batcher.close()
+    if adapter is not None:
+        await adapter.aclose()
+    mark_worker_exit()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/health")
 def health():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def ready():
+    if adapter is None:
+        # With warm-up disabled the first probe starts the build, so readiness never
+        # waits on traffic.
+        _start_warm_up()
+        if startup_error is None:
+            status = {"status": "starting"}
+        else:
+            status = {"status": "failed", "error": str(startup_error)}
+        return JSONResponse(status_code=503, content=status)
+    version = adapter.local_model.version if adapter.local_model is not None else None
+    return {"status": "ready", "model_version": version or config["model"]["version"]}
+
+@app.get("/metrics")
+def metrics():
+    content, media_type = render_metrics()
+    return Response(content, media_type=media_type)
+
 @app.post("/predict")
-def predict(request: Request):
-    payload = request.json()
-    result = adapter.predict(payload)
-    return {
-        "prediction": result["prediction"],
-        "model_version": config["model"]["version"],
-        "timestamp": time.time()
-    }
+async def predict(request: Request):
+    with in_flight_gauge.labels("/predict").track_inprogress():
+        try:
+            return await _predict(request)
+        except HTTPException:
+            raise
+        except Exception as e:
+            log_error("/predict", e)
+            raise
+
+async def _predict(request: Request):
+    timer = RequestTimer()
+    with timer.stage("parse"):
+        body = await request.body()
+        request_size_histogram.labels("/predict").observe(len(body))
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            log_error("/predict", e)
+            return JSONResponse(status_code=400, content={"error": f"Invalid JSON body: {e}"})
+    with timer.stage("preprocess"):
+        try:
+            payload = preprocess_request(payload)
+        except FeatureError as e:
+            log_error("/predict", e)
+            return JSONResponse(status_code=400, content={"error": str(e)})
+    adapter = await get_adapter()
+    try:
+        with timer.stage("provider"):
+            if batcher is not None:
+                result = await batcher.submit(payload)
+            else:
+                result = await adapter.apredict(payload)
+    except (BatchQueueFullError, BudgetExceededError) as e:
+        log_error("/predict", e)
+        raise HTTPException(status_code=503, detail=str(e))
+    except SignatureError as e:
+        log_error("/predict", e)
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    with timer.stage("postprocess"):
+        response = {
+            "prediction": result["prediction"],
+            "model_version": result.get("model_version", config["model"]["version"]),
+            "timestamp": time.time()
+        }
+    timer.observe(result.get("provider", "unknown"), str(response["model_version"]))
+    return response
+
+class RequestStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body is produced while the request body is still being read.
+
+    StreamingResponse normally reads ``receive`` in a background task to notice
+    disconnects, which swallows request chunks the scorer has not consumed yet.
+    Here the body iterator is the only reader; a disconnect surfaces from
+    ``request.stream()`` as ClientDisconnect.
+    """
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    if request.headers.get("content-length", "").isdigit():
+        content_length = int(request.headers["content-length"])
+        request_size_histogram.labels("/predict/batch").observe(content_length)
+    adapter = await get_adapter()
+    bulk_config = config.get("bulk", {})
+    gzipped = (
+        request.headers.get("content-encoding", "").lower() == "gzip"
+        or request.headers.get("content-type", "").startswith(
+            ("application/gzip", "application/x-gzip"))
+    )
+    results = score_jsonl(
+        request.stream(),
+        lambda rows: adapter.predict_batch(preprocess_rows(rows)),
+        chunk_size=bulk_config.get("chunk_size", 256),
+        gzipped=gzipped,
+        max_line_bytes=bulk_config.get("max_line_bytes", 1 << 20)
+    )
+    return RequestStreamingResponse(_tracked("/predict/batch", results),
+                                    media_type="application/x-ndjson")
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request):
+    try:
+        payload = await request.json()
+    except ValueError as e:
+        log_error("/predict/stream", e)
+        return JSONResponse(status_code=400, content={"error": f"Invalid JSON body: {e}"})
+    try:
+        payload = preprocess_request(payload)
+    except FeatureError as e:
+        log_error("/predict/stream", e)
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    adapter = await get_adapter()
+    try:
+        events = _guarded("/predict/stream", adapter.predict_stream(payload))
+    except BudgetExceededError as e:
+        log_error("/predict/stream", e)
+        raise HTTPException(status_code=503, detail=str(e))
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        body, media_type = (json.dumps(event) + "\n" for event in events), "application/x-ndjson"
+    else:
+        body = (f"event: {e['type']}\ndata: {json.dumps(e)}\n\n" for e in events)
+        media_type = "text/event-stream"
+    # The provider's event stream blocks, so it is drained on the thread pool.
+    return StreamingResponse(
+        _tracked("/predict/stream", iterate_in_threadpool(body)),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _guarded(endpoint, events):
+    # Headers are already sent once streaming starts, so failures become a final error event.
+    try:
+        yield from events
+    except Exception as e:
+        log_error(endpoint, e)
+        logger.exception(f"Streaming {endpoint} failed")
+        yield {"type": "error", "error": str(e)}
+
+async def _tracked(endpoint, results):
+    # The response body is produced after the handler returns, so count the stream as in flight.
+    with in_flight_gauge.labels(endpoint).track_inprogress():
+        try:
+            async for chunk in results:
+                yield chunk
+        except Exception as e:
+            log_error(endpoint, e)
+            raise
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8080)
@@ -0,0 +1,248 @@
+import json
+from typing import Any, Dict, List
+
+import numpy as np
+
+FOREST_MEAN = 'forest_mean'
+XGB_LOGISTIC = 'xgb_logistic'
+XGB_SOFTMAX = 'xgb_softmax'
+
+
+class CompiledForest:
+    """A tree ensemble flattened into contiguous node arrays.
+
+    All trees share the ``feature``/``threshold``/``left``/``missing_left``/``value``
+    arrays and ``roots`` holds each tree's first node. Siblings are stored next
+    to each other, so a sample at node ``i`` moves to ``left[i]`` or
+    ``left[i] + 1``. The split rule is ``x <= threshold`` on float32 input, which
+    is the dtype both sklearn and XGBoost evaluate on; XGBoost's strict ``<``
+    splits are stored with the previous float32 threshold. Leaves point at
+    themselves with an infinite threshold, so every sample walks all trees in
+    lock step for ``depth`` steps without branching.
+    """
+    block_size = 512
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray,
+                 missing_left: np.ndarray, value: np.ndarray, roots: np.ndarray, depth: int,
+                 classes: np.ndarray, kind: str, base_margin: np.ndarray, n_features: int):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.missing_left = np.ascontiguousarray(missing_left, dtype=bool)
+        self.value = np.ascontiguousarray(value)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.depth = int(depth)
+        self.classes = np.asarray(classes)
+        self.kind = kind
+        self.base_margin = np.asarray(base_margin, dtype=self.value.dtype)
+        self.n_features = n_features
+    @property
+    def dtype(self) -> np.dtype:
+        return self.value.dtype
+    def astype(self, dtype) -> 'CompiledForest':
+        """Copy with thresholds and leaf values in ``dtype``; float32 keeps splits exact."""
+        dtype = np.dtype(dtype)
+        threshold = self.threshold
+        if dtype == np.float32 and threshold.dtype != np.float32:
+            threshold = _float32_floor(threshold)
+        return CompiledForest(
+            self.feature, threshold.astype(dtype), self.left, self.missing_left,
+            self.value.astype(dtype), self.roots, self.depth, self.classes, self.kind,
+            self.base_margin.astype(dtype), self.n_features
+        )
+    def leaves(self, X: np.ndarray) -> np.ndarray:
+        """Leaf index reached in every tree, shape ``(n_samples, n_trees)``."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        flat = X.ravel()
+        has_nan = bool(np.isnan(flat).any())
+        out = np.empty((X.shape[0], len(self.roots)), dtype=np.intp)
+        for start in range(0, X.shape[0], self.block_size):
+            stop = min(start + self.block_size, X.shape[0])
+            row_base = (np.arange(start, stop) * self.n_features)[:, None]
+            nodes = np.repeat(self.roots[None, :], stop - start, axis=0)
+            for _ in range(self.depth):
+                x = flat.take(row_base + self.feature.take(nodes))
+                go_left = x <= self.threshold.take(nodes)
+                if has_nan:
+                    go_left |= np.isnan(x) & self.missing_left.take(nodes)
+                nodes = self.left.take(nodes)
+                nodes += 1
+                nodes -= go_left
+            out[start:stop] = nodes
+        return out
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        return self.value.take(self.leaves(X), axis=0).sum(axis=1) + self.base_margin
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        raw = self.decision_function(X)
+        if self.kind == FOREST_MEAN:
+            return raw / len(self.roots)
+        if self.kind == XGB_LOGISTIC:
+            p = 1.0 / (1.0 + np.exp(-raw[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        raw = raw - raw.max(axis=1, keepdims=True)
+        exp = np.exp(raw)
+        return exp / exp.sum(axis=1, keepdims=True)
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+    def save(self, path: str):
+        np.savez(
+            path, feature=self.feature, threshold=self.threshold, left=self.left,
+            missing_left=self.missing_left, value=self.value, roots=self.roots,
+            classes=self.classes, base_margin=self.base_margin,
+            meta=np.array(json.dumps(
+                {'depth': self.depth, 'kind': self.kind, 'n_features': self.n_features}))
+        )
+    @classmethod
+    def load(cls, path: str) -> 'CompiledForest':
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(
+                data['feature'], data['threshold'], data['left'], data['missing_left'],
+                data['value'], data['roots'], meta['depth'], data['classes'], meta['kind'],
+                data['base_margin'], meta['n_features']
+            )
+
+
+def compile_model(model: Any, dtype=np.float64) -> CompiledForest:
+    """Compile a fitted RandomForest/ExtraTrees/DecisionTree classifier or XGBClassifier."""
+    if hasattr(model, 'get_booster'):
+        forest = _compile_xgboost(model)
+    elif hasattr(model, 'estimators_') or hasattr(model, 'tree_'):
+        forest = _compile_sklearn(model)
+    else:
+        raise TypeError(f"Cannot compile model of type {type(model).__name__}")
+    return forest.astype(dtype)
+
+
+def _float32_floor(threshold: np.ndarray) -> np.ndarray:
+    """Largest float32 <= threshold.
+
+    ``x32 <= t`` and ``x32 <= floor32(t)`` then agree for every float32 ``x32``.
+    """
+    t32 = threshold.astype(np.float32)
+    too_high = t32.astype(np.float64) > threshold
+    t32[too_high] = np.nextafter(t32[too_high], np.float32(-np.inf))
+    return t32
+
+
+def _pack(trees: List[Dict[str, np.ndarray]], classes: np.ndarray, kind: str,
+          base_margin: np.ndarray, n_features: int) -> CompiledForest:
+    """Renumber each tree breadth-first so siblings are adjacent, then concatenate.
+
+    Each tree is given as arrays indexed by its own node ids: ``left``/``right``
+    (-1 for leaves), ``feature``, ``threshold``, ``missing_left`` and ``value``.
+    """
+    features, thresholds, lefts, missing, values, roots = [], [], [], [], [], []
+    offset, depth = 0, 0
+    for tree in trees:
+        left, right = tree['left'], tree['right']
+        order = [0]
+        first_child = np.arange(len(left))
+        node_depth = {0: 0}
+        for old in order:
+            if left[old] >= 0:
+                first_child[old] = len(order)
+                order.extend((left[old], right[old]))
+                node_depth[left[old]] = node_depth[right[old]] = node_depth[old] + 1
+        order = np.array(order)
+        is_leaf = left[order] < 0
+        features.append(np.where(is_leaf, 0, tree['feature'][order]))
+        thresholds.append(np.where(is_leaf, np.inf, tree['threshold'][order]))
+        lefts.append(np.where(is_leaf, np.arange(len(order)), first_child[order]) + offset)
+        missing.append(is_leaf | tree['missing_left'][order])
+        values.append(tree['value'][order])
+        roots.append(offset)
+        offset += len(order)
+        depth = max(depth, max(node_depth.values()))
+    return CompiledForest(
+        np.concatenate(features), np.concatenate(thresholds), np.concatenate(lefts),
+        np.concatenate(missing), np.concatenate(values), np.array(roots), depth, classes, kind,
+        base_margin, n_features
+    )
+
+
+def _compile_sklearn(model: Any) -> CompiledForest:
+    estimators = model.estimators_ if hasattr(model, 'estimators_') else [model]
+    trees = []
+    for estimator in estimators:
+        tree = estimator.tree_
+        value = tree.value[:, 0, :]
+        totals = value.sum(axis=1, keepdims=True)
+        go_left_on_nan = getattr(tree, 'missing_go_to_left', None)
+        trees.append({
+            'left': tree.children_left,
+            'right': tree.children_right,
+            'feature': tree.feature,
+            'threshold': tree.threshold,
+            'missing_left': (
+                np.asarray(go_left_on_nan, dtype=bool) if go_left_on_nan is not None
+                else np.zeros(tree.node_count, dtype=bool)
+            ),
+            'value': np.divide(value, totals, out=np.zeros_like(value), where=totals > 0)
+        })
+    n_classes = len(model.classes_)
+    return _pack(trees, model.classes_, FOREST_MEAN, np.zeros(n_classes), model.n_features_in_)
+
+
+def _parse_base_score(raw: str) -> np.ndarray:
+    return np.array([float(v) for v in raw.strip('[]').split(',')], dtype=np.float64)
+
+
+def _compile_xgboost(model: Any) -> CompiledForest:
+    booster = model.get_booster()
+    config = json.loads(booster.save_config())
+    learner = config['learner']
+    objective = learner['objective']['name']
+    n_classes = int(learner['learner_model_param'].get('num_class', '0'))
+    base_score = _parse_base_score(learner['learner_model_param']['base_score'])
+    if objective == 'binary:logistic':
+        kind, n_outputs = XGB_LOGISTIC, 1
+        p = np.clip(base_score[:1], 1e-16, 1 - 1e-16)
+        base_margin = np.log(p / (1 - p))
+    elif objective in ('multi:softprob', 'multi:softmax'):
+        kind, n_outputs = XGB_SOFTMAX, n_classes
+        base_margin = np.broadcast_to(base_score, (n_classes,)).copy()
+    else:
+        raise ValueError(f"Unsupported XGBoost objective {objective}")
+    tree_param = learner.get('gradient_booster', {}).get('gbtree_model_param', {})
+    parallel = int(tree_param.get('num_parallel_tree', 1))
+    names = booster.feature_names
+    index = {name: i for i, name in enumerate(names)} if names else None
+    n_features = len(names) if names else booster.num_features()
+
+    trees = []
+    for tree_id, dump in enumerate(booster.get_dump(dump_format='json')):
+        output = (tree_id // parallel) % n_outputs
+        nodes: Dict[int, Dict[str, Any]] = {}
+        stack = [json.loads(dump)]
+        while stack:
+            node = stack.pop()
+            nodes[node['nodeid']] = node
+            stack.extend(node.get('children', []))
+        n = max(nodes) + 1
+        tree = {
+            'left': np.full(n, -1, dtype=np.intp),
+            'right': np.full(n, -1, dtype=np.intp),
+            'feature': np.zeros(n, dtype=np.intp),
+            'threshold': np.zeros(n),
+            'missing_left': np.zeros(n, dtype=bool),
+            'value': np.zeros((n, n_outputs))
+        }
+        for node_id, node in nodes.items():
+            if 'leaf' in node:
+                tree['value'][node_id, output] = node['leaf']
+                continue
+            split = node['split']
+            tree['feature'][node_id] = index[split] if index is not None else int(split[1:])
+            # XGBoost goes left on x < t in float32; the previous float32 makes x <= t' identical.
+            tree['threshold'][node_id] = np.nextafter(np.float32(node['split_condition']),
+                                                      np.float32(-np.inf))
+            tree['left'][node_id] = node['yes']
+            tree['right'][node_id] = node['no']
+            tree['missing_left'][node_id] = node['missing'] == node['yes']
+        trees.append(tree)
+    classes = getattr(model, 'classes_', np.arange(max(n_classes, 2)))
+    return _pack(trees, classes, kind, base_margin, n_features)
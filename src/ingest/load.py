@@ -1,11 +1,34 @@
-import pandas as pd
-import boto3
+import argparse
+
+import pyarrow as pa
 import yaml
 
+from src.utils.datasets import cache_from_config, read_frame, read_table
+
 def load_data(config_path):
     with open(config_path) as f:
         config = yaml.safe_load(f)
-    s3 = boto3.client('s3')
-    df = pd.read_parquet(f"s3://{config['s3']['raw_bucket']}/data.parquet")
+    df = read_frame(f"s3://{config['s3']['raw_bucket']}/data.parquet",
+                    cache=cache_from_config(config))
     print(f"Loaded {len(df)} records")
     return df
+
+def load_table(path, columns=None, cache=None) -> pa.Table:
+    """Read a parquet file or directory, local or ``s3://`` (through ``cache``), as Arrow."""
+    table = read_table(path, columns=columns, cache=cache)
+    print(f"Loaded {table.num_rows} records")
+    return table
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("config", nargs="?", default="configs/dev.yaml")
+    parser.add_argument("--input", help="Parquet file or directory; defaults to the raw "
+                                        "bucket's data.parquet")
+    args = parser.parse_args()
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    load_table(args.input or f"s3://{config['s3']['raw_bucket']}/data.parquet",
+               cache=cache_from_config(config))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""Run pipeline steps as a DAG, skipping steps whose inputs, code and command are unchanged.
+
+Each ``Step`` declares the command it runs, the files or URIs it reads
+(``inputs``), the files it writes (``outputs``), the source files or
+directories it executes (``code``) and the steps it must follow
+(``after``); a step also follows any step whose outputs it reads. Its cache
+key is a SHA-256 over the command, the fingerprints of its inputs and code
+(``src.utils.fingerprint``, so unchanged files are not re-read; bytecode
+under a code directory is left out, as running the step writes it) and the
+keys of the steps it follows, so a change anywhere upstream invalidates it.
+
+A step whose key has a record in the ``StepStore`` and whose outputs still
+have the recorded fingerprints is a cache hit and does not run. Other steps
+run as subprocesses, up to ``max_workers`` at a time, as soon as the steps
+they follow have finished. The first failure stops the run: running steps
+are terminated, steps not yet started are cancelled, and ``PipelineFailed``
+carries every step's result. A step whose inputs cannot be fingerprinted
+(say, an S3 URI without credentials) still runs but is not cached, and
+neither is anything downstream of it.
+
+The store is a directory of JSON records, one per step and key, so the
+executor needs nothing but a local filesystem.
+
+With ``in_process=True``, steps that have a ``function`` run it on a thread
+of this process instead of starting their command; steps without one still
+run as subprocesses. A function receives the return values of the steps it
+follows, by name, and its own return value is handed to the steps that
+follow it without a round trip through storage: Arrow tables are passed by
+reference, and the value is dropped once every consumer has run. A cached
+step's value is also written next to its record, an Arrow table as an IPC
+file and anything else pickled, and consumers get the table memory-mapped
+from that file, so its pages are file-backed rather than held on the heap;
+a later run hands the same file to consumers on a cache hit. Only the
+latest few values of each step are kept (``StepStore.keep_values``). A
+failure cannot interrupt a function that is already running, so the run
+waits for it before ``PipelineFailed`` is raised.
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from src.utils.fingerprint import FingerprintIndex, fingerprint, is_source
+
+logger = logging.getLogger(__name__)
+
+HIT = 'hit'
+RAN = 'ran'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+@dataclass
+class Step:
+    name: str
+    command: List[str]
+    inputs: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    code: List[str] = field(default_factory=list)
+    after: List[str] = field(default_factory=list)
+    cache: bool = True
+    function: Optional[Callable[[Dict[str, Any]], Any]] = None
+
+
+@dataclass
+class StepResult:
+    name: str
+    status: str
+    seconds: float = 0.0
+    key: Optional[str] = None
+    returncode: Optional[int] = None
+
+
+class PipelineFailed(RuntimeError):
+    def __init__(self, message: str, results: List[StepResult]):
+        super().__init__(message)
+        self.results = results
+
+
+class StepStore:
+    """Records of successful step runs under ``root/<step>/<key>.json``.
+
+    In-process steps' return values sit next to them as ``<key>.arrow`` (Arrow
+    IPC) or ``<key>.pkl``. Only the ``keep_values`` most recently written or
+    read values of each step are kept; a record whose value was pruned is a
+    miss for in-process runs.
+    """
+    VALUE_SUFFIXES = ('.arrow', '.pkl')
+    def __init__(self, root: str, keep_values: int = 2):
+        self.root = root
+        self.keep_values = keep_values
+    def _path(self, step: str, key: str, suffix: str = 'json') -> str:
+        return os.path.join(self.root, step, f"{key}.{suffix}")
+    def get(self, step: str, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(step, key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    def put(self, step: str, key: str, record: Dict[str, Any]):
+        directory = os.path.join(self.root, step)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(record, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self._path(step, key))
+    def put_value(self, step: str, key: str, value: Any) -> str:
+        """Write a step's return value; returns the kind to pass to ``get_value``."""
+        import pyarrow as pa
+        if value is None:
+            return 'none'
+        kind = 'arrow' if isinstance(value, pa.Table) else 'pkl'
+        directory = os.path.join(self.root, step)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if kind == 'arrow':
+                    with pa.ipc.new_file(f, value.schema) as writer:
+                        writer.write_table(value)
+                else:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(step, key, kind))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._prune(step)
+        return kind
+    def _prune(self, step: str):
+        directory = os.path.join(self.root, step)
+        values = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(self.VALUE_SUFFIXES):
+                try:
+                    values.append((entry.stat().st_mtime_ns, entry.path))
+                except FileNotFoundError:
+                    pass
+        # Readers that have a pruned table mapped keep it until they unmap it.
+        for _, path in sorted(values, reverse=True)[self.keep_values:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    def get_value(self, step: str, key: str, kind: str) -> Any:
+        """A value written by ``put_value``; Arrow tables come back memory-mapped."""
+        import pyarrow as pa
+        if kind == 'none':
+            return None
+        path = self._path(step, key, kind)
+        # Reading a value counts as using it, so pruning spares it.
+        os.utime(path)
+        if kind == 'arrow':
+            return pa.ipc.open_file(pa.memory_map(path)).read_all()
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+def dependencies(steps: List[Step]) -> Dict[str, List[str]]:
+    """The steps each step follows; raises ``ValueError`` on unknown names or cycles."""
+    by_name = {step.name: step for step in steps}
+    if len(by_name) != len(steps):
+        raise ValueError('Step names must be unique')
+    producers = {output: step.name for step in steps for output in step.outputs}
+    deps = {}
+    for step in steps:
+        unknown = [name for name in step.after if name not in by_name]
+        if unknown:
+            raise ValueError(f"Step {step.name} follows unknown steps {unknown}")
+        upstream = list(step.after) + [producers[i] for i in step.inputs
+                                       if i in producers and producers[i] != step.name]
+        deps[step.name] = list(dict.fromkeys(upstream))
+    visiting, done = set(), set()
+    def visit(name, path):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Cycle through steps {' -> '.join(path + [name])}")
+        visiting.add(name)
+        for dep in deps[name]:
+            visit(dep, path + [name])
+        visiting.discard(name)
+        done.add(name)
+    for name in deps:
+        visit(name, [])
+    return deps
+
+
+def _digests(paths: List[str], index: FingerprintIndex, include=None) -> Dict[str, str]:
+    digests = {}
+    for path in paths:
+        try:
+            digests[path] = fingerprint(path, index, include=include).digest
+        except FileNotFoundError:
+            digests[path] = 'missing'
+    return digests
+
+
+def step_key(step: Step, upstream_keys: Dict[str, Optional[str]],
+             index: FingerprintIndex) -> Optional[str]:
+    """Cache key of ``step``, or ``None`` if it cannot be cached this run."""
+    if not step.cache or any(key is None for key in upstream_keys.values()):
+        return None
+    try:
+        inputs, code = _digests(step.inputs, index), _digests(step.code, index, is_source)
+    except Exception:
+        logger.warning(f"Cannot fingerprint the inputs of {step.name}; it will not be cached",
+                       exc_info=True)
+        return None
+    canonical = json.dumps({'command': step.command, 'inputs': inputs, 'code': code,
+                            'upstream': upstream_keys}, sort_keys=True)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class _Runner:
+    def __init__(self, steps: List[Step], deps: Dict[str, List[str]], store: StepStore,
+                 index: FingerprintIndex, env: Optional[Dict[str, str]], force: bool,
+                 in_process: bool):
+        self.steps = {step.name: step for step in steps}
+        self.store = store
+        self.index = index
+        self.env = env
+        self.force = force
+        self.in_process = in_process
+        self.keys: Dict[str, Optional[str]] = {}
+        # Values of finished in-process steps, kept until their last consumer has run.
+        self.values: Dict[str, Any] = {}
+        self.consumers = {name: sum(name in d for d in deps.values()) for name in deps}
+        self.processes: Dict[str, subprocess.Popen] = {}
+        self.lock = threading.Lock()
+        # FingerprintIndex is not thread-safe; steps fingerprint one at a time.
+        self.index_lock = threading.Lock()
+        self.stopping = False
+        self.terminated = set()
+    def _outputs(self, step: Step) -> Dict[str, str]:
+        with self.index_lock:
+            return _digests(step.outputs, self.index)
+    def _cached_value(self, name: str, key: str, record: Dict[str, Any]) -> bool:
+        if 'value' not in record:
+            return False
+        try:
+            self.values[name] = self.store.get_value(name, key, record['value'])
+        except FileNotFoundError:
+            return False
+        except Exception:
+            logger.warning(f"Cannot read the stored value of {name}; it will run again",
+                           exc_info=True)
+            return False
+        return True
+    def _put_value(self, name: str, key: str, record: Dict[str, Any]):
+        try:
+            record['value'] = self.store.put_value(name, key, self.values[name])
+        except Exception:
+            # The record still marks the outputs; only in-process cache hits need the value.
+            logger.warning(f"Cannot store the value of {name}", exc_info=True)
+            return
+        if record['value'] == 'arrow':
+            self.values[name] = self.store.get_value(name, key, 'arrow')
+    def _call(self, step: Step, deps: List[str]) -> Optional[int]:
+        try:
+            self.values[step.name] = step.function({dep: self.values.get(dep) for dep in deps})
+        except Exception:
+            logger.exception(f"Step {step.name} raised")
+            return None
+        return 0
+    def run(self, name: str, deps: List[str]) -> StepResult:
+        step = self.steps[name]
+        function = self.in_process and step.function is not None
+        start = time.perf_counter()
+        with self.index_lock:
+            # The steps in deps have finished, so their keys are set.
+            key = self.keys[name] = step_key(step, {dep: self.keys[dep] for dep in deps},
+                                             self.index)
+        if key is not None and not self.force:
+            record = self.store.get(name, key)
+            if record is not None and self._outputs(step) == record.get('outputs', {}) and (
+                    not function or self._cached_value(name, key, record)):
+                return StepResult(name, HIT, time.perf_counter() - start, key)
+        with self.lock:
+            if self.stopping:
+                return StepResult(name, CANCELLED, 0.0, key)
+            if not function:
+                process = self.processes[name] = subprocess.Popen(step.command, env=self.env)
+        if function:
+            returncode = self._call(step, deps)
+        else:
+            returncode = process.wait()
+            with self.lock:
+                del self.processes[name]
+        seconds = time.perf_counter() - start
+        if returncode != 0:
+            # Steps terminated because another one failed count as cancelled.
+            status = CANCELLED if name in self.terminated else FAILED
+            return StepResult(name, status, seconds, key, returncode)
+        if key is not None:
+            record = {'step': name, 'seconds': seconds, 'finished_at': time.time(),
+                      'outputs': self._outputs(step)}
+            if function:
+                self._put_value(name, key, record)
+            self.store.put(name, key, record)
+        return StepResult(name, RAN, seconds, key, returncode)
+    def release(self, name: str, deps: List[str]):
+        """Drop the values, of ``name`` and its ``deps``, that no step still to run consumes."""
+        with self.lock:
+            for dep in deps:
+                self.consumers[dep] -= 1
+            for done in [name] + deps:
+                if not self.consumers[done]:
+                    self.values.pop(done, None)
+    def stop(self):
+        with self.lock:
+            self.stopping = True
+            for name, process in self.processes.items():
+                self.terminated.add(name)
+                process.terminate()
+
+
+def run_dag(steps: List[Step], store: StepStore, max_workers: Optional[int] = None,
+            index: Optional[FingerprintIndex] = None, env: Optional[Dict[str, str]] = None,
+            force: bool = False, in_process: bool = False) -> List[StepResult]:
+    """Run ``steps``; see the module docstring. Results come back in ``steps`` order.
+
+    ``force`` runs every step regardless of the store (and refreshes it);
+    ``in_process`` runs steps that have a ``function`` in this process.
+    """
+    deps = dependencies(steps)
+    runner = _Runner(steps, deps, store, index if index is not None else FingerprintIndex(),
+                     env, force, in_process)
+    results: Dict[str, StepResult] = {}
+    pending = [step.name for step in steps]
+    failure = None
+    with ThreadPoolExecutor(max_workers=max_workers or len(steps) or 1) as pool:
+        running = {}
+        while pending or running:
+            if failure is None:
+                for name in [n for n in pending if all(d in results for d in deps[n])]:
+                    pending.remove(name)
+                    running[pool.submit(runner.run, name, deps[name])] = name
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception:
+                    logger.exception(f"Step {name} raised")
+                    result = StepResult(name, FAILED)
+                results[name] = result
+                runner.release(name, deps[name])
+                if result.status == FAILED and failure is None:
+                    failure = name
+                    runner.stop()
+    for name in pending:
+        results[name] = StepResult(name, CANCELLED)
+    ordered = [results[step.name] for step in steps]
+    if failure is not None:
+        failed = [r.name for r in ordered if r.status == FAILED]
+        raise PipelineFailed(f"Pipeline failed at {', '.join(failed)}", ordered)
+    return ordered
+
+
+def format_report(results: List[StepResult]) -> str:
+    lines = [f"{'step':<16} {'status':<10} {'seconds':>8}"]
+    for r in results:
+        lines.append(f"{r.name:<16} {r.status:<10} {r.seconds:>8.2f}")
+    hits = sum(r.status == HIT for r in results)
+    lines.append(f"cache: {hits} hit, {sum(r.status == RAN for r in results)} miss")
+    return '\n'.join(lines)
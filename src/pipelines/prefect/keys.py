@@ -0,0 +1,29 @@
+"""Cache keys for the Prefect data tasks, free of Prefect imports so they can be tested alone."""
+import hashlib
+import json
+from typing import Any, Dict, List
+
+from src.utils.fingerprint import Fingerprint, FingerprintIndex, fingerprint, is_source
+
+
+def cache_key(code: List[str], sections: List[str]):
+    """A ``cache_key_fn`` over the task's dataset references, ``code`` and config ``sections``.
+
+    ``code`` must list every package the task imports from; arguments other
+    than ``config`` are keyed by value (dataset references by fingerprint).
+    """
+    def key(context, parameters: Dict[str, Any]) -> str:
+        config = parameters.get('config', {})
+        index = FingerprintIndex(config.get('fingerprint', {}).get('index_path'))
+        inputs = {
+            name: [value.uri, value.digest] if isinstance(value, Fingerprint) else value
+            for name, value in parameters.items() if name != 'config'
+        }
+        canonical = json.dumps({
+            'task': context.task.task_key,
+            'inputs': inputs,
+            'code': {path: fingerprint(path, index, include=is_source).digest for path in code},
+            'config': {section: config.get(section) for section in sections},
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+    return key
@@ -26,7 +26,8 @@ def create_pipeline(config_path="configs/dev.yaml"):
             ProcessingInput(source=input_data, destination="/opt/ml/processing/input")
         ],
         outputs=[
-            ProcessingOutput(source="/opt/ml/processing/output", destination=f"s3://{config['s3']['features_bucket']}/")
+            ProcessingOutput(source="/opt/ml/processing/output",
+                             destination=f"s3://{config['s3']['features_bucket']}/")
         ]
     )
     sklearn_estimator = SKLearn(
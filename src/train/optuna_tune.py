@@ -1,68 +1,56 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
-import optuna
 import argparse
 import yaml
-import boto3
+from src.train.tuning import MODEL_TYPES, SEARCHES, build_model, tune, tuning_options
+from src.utils.datasets import cache_from_config, read_frame
 
-def load_data(data_path):
-    if data_path.startswith('s3://'):
-        # Download from S3 to local temp file
-        import tempfile, os
-        s3 = boto3.client('s3')
-        bucket = data_path.split('/')[2]
-        key = '/'.join(data_path.split('/')[3:])
-        with tempfile.NamedTemporaryFile(delete=False) as tmp:
-            s3.download_fileobj(bucket, key, tmp)
-            tmp_path = tmp.name
-        df = pd.read_parquet(tmp_path)
-        os.remove(tmp_path)
-    else:
-        if data_path.endswith('.csv'):
-            df = pd.read_csv(data_path)
-        else:
-            df = pd.read_parquet(data_path)
-    return df
-
-def objective(trial, X_train, y_train):
-    n_estimators = trial.suggest_int('n_estimators', 50, 200)
-    max_depth = trial.suggest_int('max_depth', 3, 15)
-    min_samples_split = trial.suggest_int('min_samples_split', 2, 10)
-    min_samples_leaf = trial.suggest_int('min_samples_leaf', 1, 5)
-    max_features = trial.suggest_categorical('max_features', ['sqrt', 'log2', None])
-    model = RandomForestClassifier(
-        n_estimators=n_estimators,
-        max_depth=max_depth,
-        min_samples_split=min_samples_split,
-        min_samples_leaf=min_samples_leaf,
-        max_features=max_features,
-        random_state=42
-    )
-    cv_scores = cross_val_score(model, X_train, y_train, cv=5, scoring='accuracy')
-    return cv_scores.mean()
+def load_data(data_path, cache=None):
+    """A local CSV, or parquet read through the dataset cache (S3 objects are kept locally)."""
+    if data_path.endswith('.csv') and '://' not in data_path:
+        return pd.read_csv(data_path)
+    return read_frame(data_path, cache=cache)
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--data', required=True, help='Path to training data (csv or parquet, local or s3)')
+    parser.add_argument('--data', required=True,
+                        help='Path to training data (csv or parquet, local or s3)')
     parser.add_argument('--target', default='target', help='Target column name')
+    parser.add_argument('--config', default='configs/dev.yaml', help='Config with a tuning section')
+    parser.add_argument('--model', choices=MODEL_TYPES, default='randomforest')
+    parser.add_argument('--workers', type=int, help='Tuning processes (0 = one per CPU)')
+    parser.add_argument('--n-trials', type=int, help='Trial budget, pruned trials included')
+    parser.add_argument('--timeout', type=float, help='Wall-clock budget in seconds')
+    parser.add_argument('--storage', help='Optuna storage URL, e.g. sqlite:///optuna.db')
+    parser.add_argument('--no-pruning', dest='pruning', action='store_false', default=None)
+    parser.add_argument('--search', choices=SEARCHES,
+                        help='full, or multi-fidelity over the tree count (halving, hyperband)')
+    parser.add_argument('--reduction-factor', type=int, help='Multi-fidelity promotion ratio')
     args = parser.parse_args()
-
-    df = load_data(args.data)
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    options = tuning_options(config)
+    overrides = {'workers': args.workers, 'n_trials': args.n_trials, 'timeout': args.timeout,
+                 'storage': args.storage, 'pruning': args.pruning, 'search': args.search,
+                 'reduction_factor': args.reduction_factor}
+    options.update({k: v for k, v in overrides.items() if v is not None})
+
+    df = load_data(args.data, cache_from_config(config))
     X = df.drop(args.target, axis=1)
     y = df[args.target]
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-    study = optuna.create_study(direction='maximize')
-    study.optimize(lambda trial: objective(trial, X_train, y_train), n_trials=50)
+    study = tune(X_train, y_train, args.model, **options)
 
     best_params = study.best_params
     print(f"Best parameters: {best_params}")
     print(f"Best cross-validation score: {study.best_value:.4f}")
+    pruned = sum(t.state.name == 'PRUNED' for t in study.trials)
+    print(f"Trials: {len(study.trials)} ({pruned} pruned)")
 
-    best_model = RandomForestClassifier(**best_params, random_state=42)
+    best_model = build_model(args.model, best_params)
     best_model.fit(X_train, y_train)
     y_pred = best_model.predict(X_test)
     test_accuracy = accuracy_score(y_test, y_pred)
@@ -1,25 +1,22 @@
 import argparse
 import mlflow
 import mlflow.sklearn
-import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, f1_score
 import yaml
 import boto3
-import hashlib
 import json
 from datetime import datetime
+from src.utils.datasets import cache_from_config, read_frame
+from src.utils.fingerprint import fingerprint_from_config
 
 def load_config(config_path):
     with open(config_path, 'r') as f:
         return yaml.safe_load(f)
 
-def compute_dataset_hash(data_path):
-    """Compute hash of dataset for versioning"""
-    hasher = hashlib.md5()
-    with open(data_path, 'rb') as f:
-        hasher.update(f.read())
-    return hasher.hexdigest()
+def compute_dataset_hash(data_path, config=None):
+    """Fingerprint of the dataset for versioning, without a full read when it can be avoided"""
+    return fingerprint_from_config(data_path, config or {}).digest
 
 def train(config_path):
     config = load_config(config_path)
@@ -31,8 +28,8 @@ def train(config_path):
         mlflow.set_tag("git_sha", git_sha)
         s3 = boto3.client('s3')
         data_path = f"s3://{config['s3']['features_bucket']}/train.parquet"
-        df_train = pd.read_parquet(data_path)
-        dataset_hash = compute_dataset_hash(data_path)
+        df_train = read_frame(data_path, cache=cache_from_config(config))
+        dataset_hash = compute_dataset_hash(data_path, config)
         mlflow.set_tag("dataset_snapshot_id", dataset_hash)
         X_train = df_train.drop('target', axis=1)
         y_train = df_train['target']
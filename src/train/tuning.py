@@ -0,0 +1,292 @@
+"""Optuna search for the RandomForest and XGBoost classifiers, serially or across processes.
+
+``tune`` runs one study. The training data is converted once to a
+memory-mapped ``TuningData`` with the cross-validation folds precomputed,
+so trials and workers read it without copying. Each trial cross-validates
+fold by fold, reporting the running mean accuracy after every fold so the
+pruner can stop a trial that is already behind the median of earlier
+trials at the same fold. With ``workers > 1`` the trials run in separate
+processes that share the study through its storage (a SQLite file unless
+``storage`` is given); each worker fits models on one thread, so the
+processes use separate cores. The search stops at ``n_trials`` trials
+(pruned ones included) or ``timeout`` seconds of wall clock, whichever
+comes first; a trial still running at the deadline is stopped at its next
+fold.
+
+``search='halving'`` or ``'hyperband'`` makes the search multi-fidelity,
+with the ensemble's tree count as the resource. A trial is no longer
+given ``n_estimators`` up front: its fold models are grown rung by rung,
+``min_resource`` trees, then ``reduction_factor`` times as many, up to
+``max_resource``, and it is scored after each rung. The successive halving
+or Hyperband pruner lets only the best ``1 / reduction_factor`` of the
+trials at a rung go on to the next, so most configurations cost a small
+ensemble. Forests grow with ``warm_start`` and boosters continue from
+their previous rounds, so a promoted trial does not retrain the trees it
+has. Completed trials end with ``max_resource`` trees, which is recorded as
+their ``n_estimators`` parameter.
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import optuna
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+
+from src.train.tuning_data import TuningData
+
+MODEL_TYPES = ('randomforest', 'xgboost')
+SEARCHES = ('full', 'halving', 'hyperband')
+
+
+def suggest_params(trial: optuna.Trial, model_type: str,
+                   n_estimators: Tuple[int, int] = (50, 200)) -> Dict[str, Any]:
+    if model_type == 'randomforest':
+        return {
+            'n_estimators': trial.suggest_int('n_estimators', *n_estimators),
+            'max_depth': trial.suggest_int('max_depth', 3, 15),
+            'min_samples_split': trial.suggest_int('min_samples_split', 2, 10),
+            'min_samples_leaf': trial.suggest_int('min_samples_leaf', 1, 5),
+            'max_features': trial.suggest_categorical('max_features', ['sqrt', 'log2', None])
+        }
+    if model_type == 'xgboost':
+        return {
+            'n_estimators': trial.suggest_int('n_estimators', *n_estimators),
+            'max_depth': trial.suggest_int('max_depth', 3, 15),
+            'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.3),
+            'subsample': trial.suggest_float('subsample', 0.6, 1.0),
+            'colsample_bytree': trial.suggest_float('colsample_bytree', 0.6, 1.0)
+        }
+    raise ValueError('Unknown model type')
+
+
+def build_model(model_type: str, params: Dict[str, Any], n_jobs: Optional[int] = None):
+    if model_type == 'randomforest':
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(**params, random_state=42, n_jobs=n_jobs)
+    if model_type == 'xgboost':
+        from xgboost import XGBClassifier
+        return XGBClassifier(**params, random_state=42, eval_metric='logloss', n_jobs=n_jobs)
+    raise ValueError('Unknown model type')
+
+
+def cross_validate(trial: optuna.Trial, model, data: TuningData,
+                   deadline: Optional[float] = None) -> float:
+    """Mean accuracy over the precomputed folds of ``data``.
+
+    The running mean is reported after each fold; the trial is pruned when the
+    pruner says so or when ``deadline`` (a ``time.time()`` value) has passed.
+    """
+    scores = []
+    for fold, (X_train, y_train, X_valid, y_valid) in enumerate(data.folds()):
+        fitted = clone(model).fit(X_train, y_train)
+        scores.append(accuracy_score(y_valid, fitted.predict(X_valid)))
+        trial.report(float(np.mean(scores)), fold)
+        if fold < data.n_folds - 1 and (trial.should_prune() or
+                                        (deadline is not None and time.time() >= deadline)):
+            raise optuna.TrialPruned()
+    return float(np.mean(scores))
+
+
+def objective(trial: optuna.Trial, data: TuningData, model_type: str,
+              deadline: Optional[float] = None, n_jobs: Optional[int] = None) -> float:
+    model = build_model(model_type, suggest_params(trial, model_type), n_jobs)
+    return cross_validate(trial, model, data, deadline)
+
+
+def resource_rungs(min_resource: int, max_resource: int, reduction_factor: int) -> List[int]:
+    """Tree counts a multi-fidelity trial is scored at: ``min_resource * reduction_factor**i``."""
+    if not 0 < min_resource <= max_resource or reduction_factor < 2:
+        raise ValueError('Need 0 < min_resource <= max_resource and reduction_factor >= 2')
+    rungs = [min_resource]
+    while rungs[-1] * reduction_factor < max_resource:
+        rungs.append(rungs[-1] * reduction_factor)
+    return rungs + [max_resource] if rungs[-1] < max_resource else rungs
+
+
+def _grow(model_type: str, model, params: Dict[str, Any], n_estimators: int, X, y,
+          n_jobs: Optional[int]):
+    """``model`` (or a new one) fitted with ``n_estimators`` trees, adding only the missing ones."""
+    if model_type == 'randomforest':
+        if model is None:
+            model = build_model(model_type, dict(params, warm_start=True), n_jobs)
+        return model.set_params(n_estimators=n_estimators).fit(X, y)
+    booster = None if model is None else model.get_booster()
+    done = 0 if booster is None else booster.num_boosted_rounds()
+    grown = build_model(model_type, dict(params, n_estimators=n_estimators - done), n_jobs)
+    return grown.fit(X, y, xgb_model=booster)
+
+
+def multi_fidelity_objective(trial: optuna.Trial, data: TuningData, model_type: str,
+                             rungs: List[int], deadline: Optional[float] = None,
+                             n_jobs: Optional[int] = None) -> float:
+    """Mean accuracy over the folds with ``rungs[-1]`` trees, reported at every rung."""
+    params = suggest_params(trial, model_type, n_estimators=(rungs[-1], rungs[-1]))
+    models = [None] * data.n_folds
+    for n_estimators in rungs:
+        scores = []
+        for k, (X_train, y_train, X_valid, y_valid) in enumerate(data.folds()):
+            models[k] = _grow(model_type, models[k], params, n_estimators, X_train, y_train,
+                              n_jobs)
+            scores.append(accuracy_score(y_valid, models[k].predict(X_valid)))
+        trial.report(float(np.mean(scores)), n_estimators)
+        if n_estimators < rungs[-1] and (trial.should_prune() or
+                                         (deadline is not None and time.time() >= deadline)):
+            raise optuna.TrialPruned()
+    return float(np.mean(scores))
+
+
+def make_pruner(search: str = 'full', pruning: bool = True, n_startup_trials: int = 5,
+                n_warmup_steps: int = 1, min_resource: int = 25, max_resource: int = 200,
+                reduction_factor: int = 3) -> optuna.pruners.BasePruner:
+    if search == 'halving':
+        return optuna.pruners.SuccessiveHalvingPruner(min_resource=min_resource,
+                                                      reduction_factor=reduction_factor)
+    if search == 'hyperband':
+        return optuna.pruners.HyperbandPruner(min_resource=min_resource,
+                                              max_resource=max_resource,
+                                              reduction_factor=reduction_factor)
+    if not pruning:
+        return optuna.pruners.NopPruner()
+    return optuna.pruners.MedianPruner(n_startup_trials=n_startup_trials,
+                                       n_warmup_steps=n_warmup_steps)
+
+
+def _storage(url: Optional[str]):
+    if url is None:
+        return None
+    if url.startswith('sqlite'):
+        # Workers write concurrently; wait for SQLite's lock rather than failing.
+        return optuna.storages.RDBStorage(url, engine_kwargs={'connect_args': {'timeout': 60}})
+    return url
+
+
+def _sampler(seed: Optional[int], parallel: bool) -> optuna.samplers.BaseSampler:
+    # constant_liar keeps concurrent workers from proposing the same point.
+    return optuna.samplers.TPESampler(seed=seed, constant_liar=parallel)
+
+
+def _optimize(study: optuna.Study, data: TuningData, model_type: str,
+              n_trials: Optional[int], deadline: Optional[float], search_options: Dict,
+              n_jobs: Optional[int] = None):
+    if search_options['search'] == 'full':
+        def run(trial):
+            return objective(trial, data, model_type, deadline, n_jobs)
+    else:
+        rungs = resource_rungs(search_options['min_resource'], search_options['max_resource'],
+                               search_options['reduction_factor'])
+        def run(trial):
+            return multi_fidelity_objective(trial, data, model_type, rungs, deadline, n_jobs)
+    callbacks = []
+    if n_trials is not None:
+        # Counts trials in every state across all workers, so pruned trials use the budget.
+        callbacks.append(optuna.study.MaxTrialsCallback(n_trials, states=None))
+    study.optimize(
+        run,
+        n_trials=n_trials,
+        timeout=None if deadline is None else max(0.0, deadline - time.time()),
+        callbacks=callbacks
+    )
+
+
+def _worker(storage_url: str, study_name: str, seed: Optional[int], search_options: Dict,
+            data: TuningData, model_type: str, n_trials: Optional[int],
+            deadline: Optional[float]) -> int:
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = optuna.load_study(study_name=study_name, storage=_storage(storage_url),
+                              sampler=_sampler(seed, parallel=True),
+                              pruner=make_pruner(**search_options))
+    _optimize(study, data, model_type, n_trials, deadline, search_options, n_jobs=1)
+    return os.getpid()
+
+
+def tune(X, y, model_type: str = 'randomforest', n_trials: Optional[int] = 50,
+         timeout: Optional[float] = None, workers: Optional[int] = 1,
+         storage: Optional[str] = None, study_name: Optional[str] = None,
+         n_folds: int = 5, pruning: bool = True, n_startup_trials: int = 5,
+         n_warmup_steps: int = 1, seed: Optional[int] = None,
+         data_dir: Optional[str] = None, search: str = 'full', min_resource: int = 25,
+         max_resource: int = 200, reduction_factor: int = 3) -> optuna.Study:
+    """Run a maximise-accuracy study and return it; see the module docstring.
+
+    ``workers=None`` uses one process per CPU. ``storage`` is an Optuna
+    storage URL; a study of the same ``study_name`` in it is resumed, and the
+    trial budget then includes its earlier trials. The memory-mapped data
+    goes to a temporary directory under ``data_dir`` (the system default if
+    unset) and is removed afterwards. ``pruning``, ``n_startup_trials`` and
+    ``n_warmup_steps`` configure the median pruner of the full search;
+    ``min_resource``, ``max_resource`` and ``reduction_factor`` the
+    multi-fidelity ones.
+    """
+    if model_type not in MODEL_TYPES:
+        raise ValueError('Unknown model type')
+    if n_trials is None and timeout is None:
+        raise ValueError('Set n_trials, timeout or both to bound the search')
+    if search not in SEARCHES:
+        raise ValueError(f"Unknown search {search!r}; expected one of {', '.join(SEARCHES)}")
+    if search != 'full':
+        resource_rungs(min_resource, max_resource, reduction_factor)
+    workers = workers or os.cpu_count() or 1
+    deadline = None if timeout is None else time.time() + timeout
+    search_options = {'search': search, 'pruning': pruning,
+                      'n_startup_trials': n_startup_trials, 'n_warmup_steps': n_warmup_steps,
+                      'min_resource': min_resource, 'max_resource': max_resource,
+                      'reduction_factor': reduction_factor}
+    study_name = study_name or f"tune-{model_type}-{uuid.uuid4().hex[:8]}"
+    with tempfile.TemporaryDirectory(prefix='tuning-', dir=data_dir) as tmp:
+        data = TuningData.create(X, y, os.path.join(tmp, 'data'), n_folds)
+        if workers == 1:
+            study = optuna.create_study(direction='maximize', study_name=study_name,
+                                        storage=_storage(storage), load_if_exists=True,
+                                        sampler=_sampler(seed, parallel=False),
+                                        pruner=make_pruner(**search_options))
+            _optimize(study, data, model_type, n_trials, deadline, search_options)
+            return study
+
+        storage_url = storage or f"sqlite:///{os.path.join(tmp, 'optuna.db')}"
+        optuna.create_study(direction='maximize', study_name=study_name,
+                            storage=_storage(storage_url), load_if_exists=True)
+        # spawn, not fork: XGBoost's and BLAS's thread pools do not survive a fork.
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [
+                pool.submit(_worker, storage_url, study_name,
+                            None if seed is None else seed + i, search_options,
+                            data, model_type, n_trials, deadline)
+                for i in range(workers)
+            ]
+            for future in futures:
+                future.result()
+        study = optuna.load_study(study_name=study_name, storage=_storage(storage_url))
+        if storage is None:
+            # The SQLite file goes with the temporary directory; keep the results in memory.
+            in_memory = optuna.create_study(direction='maximize', study_name=study_name)
+            in_memory.add_trials(study.trials)
+            study = in_memory
+    return study
+
+
+def tuning_options(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Keyword arguments for ``tune`` from a config's ``tuning`` section."""
+    section = config.get('tuning', {})
+    return {
+        'n_trials': section.get('n_trials', 50),
+        'timeout': section.get('timeout_s'),
+        'workers': section.get('workers', 1),
+        'storage': section.get('storage'),
+        'n_folds': section.get('n_folds', 5),
+        'pruning': section.get('pruning', True),
+        'n_startup_trials': section.get('n_startup_trials', 5),
+        'n_warmup_steps': section.get('n_warmup_steps', 1),
+        'seed': section.get('seed'),
+        'data_dir': section.get('data_dir'),
+        'search': section.get('search', 'full'),
+        'min_resource': section.get('min_resource', 25),
+        'max_resource': section.get('max_resource', 200),
+        'reduction_factor': section.get('reduction_factor', 3)
+    }
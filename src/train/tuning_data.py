@@ -0,0 +1,89 @@
+"""Tuning data shared by every trial and worker: float32 arrays in memory-mapped files.
+
+``TuningData.create`` converts the training frame once to a C-contiguous
+float32 feature matrix and int32 label codes, and writes them as ``.npy``
+files that workers map read-only; the operating system's page cache holds
+a single copy however many processes read it, and a ``TuningData`` pickles
+as its directory name, so nothing else crosses the process boundary.
+
+The cross-validation folds (those ``cross_val_score(cv=n_folds)`` uses) are
+computed once and baked into the row order: rows are stored fold by fold,
+and the arrays hold that order twice over. Fold ``k``'s validation rows are
+then one contiguous slice, and its training rows, the other folds, are the
+contiguous slice that follows it in the doubled array. Every fold is a pair
+of views into the mapped file, which scikit-learn's forests fit on without
+copying (they work in float32 themselves). Training rows come in rotated
+fold order rather than index order, so a seeded forest draws different
+bootstrap samples than it would from ``cross_val_score``.
+"""
+import json
+import os
+from typing import Any, Iterator, List, Tuple
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from sklearn.model_selection import check_cv
+
+X_FILE = 'X.npy'
+Y_FILE = 'y.npy'
+META_FILE = 'meta.json'
+_CHUNK_ROWS = 1 << 16
+
+Fold = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+class TuningData:
+    """Read-only view of a directory written by ``create``."""
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+        self.n_rows: int = meta['n_rows']
+        self.offsets: List[int] = meta['offsets']
+        self.classes: List[Any] = meta['classes']
+        self.X = np.load(os.path.join(directory, X_FILE), mmap_mode='r')
+        self.y = np.load(os.path.join(directory, Y_FILE), mmap_mode='r')
+    def __reduce__(self):
+        return TuningData, (self.directory,)
+    @property
+    def n_folds(self) -> int:
+        return len(self.offsets) - 1
+    @property
+    def n_features(self) -> int:
+        return self.X.shape[1]
+    def fold(self, k: int) -> Fold:
+        """``(X_train, y_train, X_valid, y_valid)`` for fold ``k``, views of the mapped files."""
+        start, stop = self.offsets[k], self.offsets[k + 1]
+        train = slice(stop, start + self.n_rows)
+        return self.X[train], self.y[train], self.X[start:stop], self.y[start:stop]
+    def folds(self) -> Iterator[Fold]:
+        for k in range(self.n_folds):
+            yield self.fold(k)
+    @classmethod
+    def create(cls, X, y, directory: str, n_folds: int = 5) -> 'TuningData':
+        """Write ``X`` (a DataFrame or array of numbers) and labels ``y`` under ``directory``."""
+        os.makedirs(directory, exist_ok=True)
+        values = X.to_numpy(dtype=np.float32) if hasattr(X, 'to_numpy') \
+            else np.asarray(X, dtype=np.float32)
+        if values.ndim != 2 or len(values) != len(y):
+            raise ValueError(f"X must be 2-d with one row per label, got {values.shape}")
+        classes, codes = np.unique(np.asarray(y), return_inverse=True)
+        splits = check_cv(n_folds, np.asarray(y), classifier=True).split(values, codes)
+        valid = [index for _, index in splits]
+        order = np.concatenate(valid)
+        offsets = np.concatenate([[0], np.cumsum([len(index) for index in valid])])
+        n = len(order)
+        X_out = open_memmap(os.path.join(directory, X_FILE), mode='w+', dtype=np.float32,
+                            shape=(2 * n, values.shape[1]))
+        y_out = open_memmap(os.path.join(directory, Y_FILE), mode='w+', dtype=np.int32,
+                            shape=(2 * n,))
+        for start in range(0, n, _CHUNK_ROWS):
+            rows = order[start:start + _CHUNK_ROWS]
+            X_out[start:start + len(rows)] = X_out[n + start:n + start + len(rows)] = values[rows]
+            y_out[start:start + len(rows)] = y_out[n + start:n + start + len(rows)] = codes[rows]
+        X_out.flush()
+        y_out.flush()
+        del X_out, y_out
+        with open(os.path.join(directory, META_FILE), 'w') as f:
+            json.dump({'n_rows': n, 'offsets': offsets.tolist(), 'classes': classes.tolist()}, f)
+        return cls(directory)
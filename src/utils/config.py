@@ -0,0 +1,25 @@
+import os
+from typing import Any, Dict, Optional
+
+import yaml
+
+ENVIRONMENTS = ('dev', 'staging', 'prod')
+
+
+def config_path(env: Optional[str] = None) -> str:
+    """Config file for this process: ``ML_CONFIG`` if set, else ``configs/<ML_ENV>.yaml``.
+
+    ``ML_ENV`` defaults to dev.
+    """
+    explicit = os.environ.get('ML_CONFIG')
+    if explicit and env is None:
+        return explicit
+    env = env or os.environ.get('ML_ENV', 'dev')
+    if env not in ENVIRONMENTS:
+        raise ValueError(f"Unknown environment {env!r}; expected one of {', '.join(ENVIRONMENTS)}")
+    return os.path.join('configs', f"{env}.yaml")
+
+
+def load_config(env: Optional[str] = None) -> Dict[str, Any]:
+    with open(config_path(env)) as f:
+        return yaml.safe_load(f)
@@ -0,0 +1,228 @@
+"""Read parquet datasets, local or on S3, through a disk-backed read-through cache.
+
+``read_table(uri, columns=..., row_groups=...)`` reads a parquet file, or
+every file under a directory (prefix), projected to ``columns`` and, for a
+single file, to the given row groups. Local files are memory-mapped.
+Remote objects are fetched once into a ``DatasetCache`` and memory-mapped
+from there; an entry is keyed by the URI and the object's version ID, or
+its ETag on unversioned buckets, so a changed object is fetched again and
+nothing has to be invalidated by hand. Every read costs one HEAD request to
+learn the current version, and the GETs that follow are pinned to it (by
+version ID or ``If-Match``), so an object overwritten in between is never
+stored or read under the old version; the read starts over once instead.
+
+The cache is a directory of object copies and a JSON index, shared by
+every process on the machine: the index is updated under a file lock and
+copies are written to a temporary name and renamed into place. When the
+copies total more than ``max_bytes`` the least recently used are deleted.
+An object larger than ``max_bytes`` is not cached but read in place with
+ranged GETs, so only its footer and the column chunks of the projected
+columns and selected row groups are transferred.
+
+Filesystems come from ``src.utils.fingerprint`` (``filesystem_for``), so
+the same ``stat``/``list``/``open``/``read_range`` interface serves both.
+"""
+import contextlib
+import fcntl
+import hashlib
+import io
+import json
+import logging
+import os
+import posixpath
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.utils.fingerprint import FileStat, ObjectChanged, filesystem_for
+
+DEFAULT_CACHE_DIR = '.cache/datasets'
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+COPY_BUFFER_SIZE = 8 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def is_local(uri: str) -> bool:
+    return '://' not in uri or uri.startswith('file://')
+
+
+def _local_path(uri: str) -> str:
+    return uri[len('file://'):] if uri.startswith('file://') else uri
+
+
+class RangedFile(io.RawIOBase):
+    """A remote object as a seekable read-only file, each read one ``read_range`` call.
+
+    Reads are pinned to ``stat``'s version or ETag, so they all see the same object.
+    """
+    def __init__(self, filesystem, uri: str, stat: FileStat):
+        self.filesystem = filesystem
+        self.uri = uri
+        self.stat = stat
+        self.size = stat.size
+        self.position = 0
+    def readable(self) -> bool:
+        return True
+    def seekable(self) -> bool:
+        return True
+    def tell(self) -> int:
+        return self.position
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = base + offset
+        return self.position
+    def readinto(self, buffer) -> int:
+        length = min(len(buffer), self.size - self.position)
+        if length <= 0:
+            return 0
+        data = self.filesystem.read_range(self.uri, self.position, length, self.stat)
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+class DatasetCache:
+    """Local copies of remote objects under ``directory``, evicted LRU beyond ``max_bytes``."""
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.directory = directory or DEFAULT_CACHE_DIR
+        self.max_bytes = DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+    @staticmethod
+    def key(uri: str, stat: FileStat) -> str:
+        version = stat.version or stat.etag or f"{stat.size}:{stat.mtime}"
+        return hashlib.sha256(f"{uri}\0{version}".encode()).hexdigest()
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, 'objects', key)
+    @contextlib.contextmanager
+    def _index(self):
+        """The index, locked against other processes and saved on exit."""
+        os.makedirs(os.path.join(self.directory, 'objects'), exist_ok=True)
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            path = os.path.join(self.directory, 'index.json')
+            try:
+                with open(path) as f:
+                    index = json.load(f)
+            except FileNotFoundError:
+                index = {}
+            except (OSError, ValueError):
+                logger.exception(f"Ignoring unreadable dataset cache index {path}")
+                index = {}
+            yield index
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(index, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, path)
+    def _fetch(self, filesystem, uri: str, stat: FileStat, path: str):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with filesystem.open(uri, stat) as source, os.fdopen(fd, 'wb') as target:
+                shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    def _evict(self, index: Dict[str, Dict[str, Any]], keep: str):
+        total = sum(entry['size'] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            # Readers that have the copy mapped keep it until they unmap it.
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._path(key))
+            total -= index.pop(key)['size']
+    def get(self, uri: str, stat: FileStat, filesystem=None) -> Optional[str]:
+        """Path of the local copy of ``uri``, fetched if missing; ``None`` if it is too large.
+
+        Raises ``ObjectChanged`` if the object no longer matches ``stat``.
+        """
+        if stat.size > self.max_bytes:
+            return None
+        key = self.key(uri, stat)
+        path = self._path(key)
+        with self._index() as index:
+            if key in index and os.path.exists(path):
+                index[key]['last_used'] = time.time()
+                self.hits += 1
+                return path
+        self._fetch(filesystem or filesystem_for(uri), uri, stat, path)
+        self.misses += 1
+        with self._index() as index:
+            index[key] = {'uri': uri, 'version': stat.version or stat.etag, 'size': stat.size,
+                          'last_used': time.time()}
+            self._evict(index, keep=key)
+        return path
+
+
+def cache_from_config(config: Dict[str, Any]) -> DatasetCache:
+    section = config.get('datasets', {})
+    return DatasetCache(section.get('cache_dir'), section.get('max_bytes'))
+
+
+def dataset_files(uri: str, filesystem=None) -> List[str]:
+    """``uri`` if it is a file, else the data files under it, skipping ``_``/``.`` names."""
+    filesystem = filesystem or filesystem_for(uri)
+    path = _local_path(uri) if is_local(uri) else uri
+    if filesystem.stat(path) is not None:
+        return [path]
+    files = [f for f in filesystem.list(path)
+             if not posixpath.basename(f).startswith(('_', '.'))]
+    if not files:
+        raise FileNotFoundError(uri)
+    return files
+
+
+def open_input(uri: str, cache: Optional[DatasetCache] = None, filesystem=None,
+               stat: Optional[FileStat] = None) -> pa.NativeFile:
+    """One file to read from: memory-mapped if local or cached, otherwise read by range."""
+    if is_local(uri):
+        return pa.memory_map(_local_path(uri))
+    filesystem = filesystem or filesystem_for(uri)
+    cache = cache or DatasetCache()
+    for attempt in range(2):
+        stat = stat or filesystem.stat(uri)
+        if stat is None:
+            raise FileNotFoundError(uri)
+        try:
+            path = cache.get(uri, stat, filesystem)
+        except ObjectChanged:
+            if attempt:
+                raise
+            logger.info(f"{uri} changed while it was being fetched; fetching it again")
+            stat = None
+            continue
+        if path is not None:
+            return pa.memory_map(path)
+        # A ranged read that finds the object changed fails; the caller reads again.
+        return pa.PythonFile(RangedFile(filesystem, uri, stat), mode='r')
+
+
+def read_table(uri: str, columns: Optional[List[str]] = None,
+               row_groups: Optional[Sequence[int]] = None,
+               cache: Optional[DatasetCache] = None, filesystem=None) -> pa.Table:
+    """Read a parquet file or directory; see the module docstring."""
+    filesystem = filesystem or filesystem_for(uri)
+    files = dataset_files(uri, filesystem)
+    if row_groups is not None and len(files) > 1:
+        raise ValueError(f"row_groups needs a single file; {uri} has {len(files)}")
+    tables = []
+    for path in files:
+        parquet = pq.ParquetFile(open_input(path, cache, filesystem))
+        tables.append(parquet.read(columns=columns) if row_groups is None
+                      else parquet.read_row_groups(row_groups, columns=columns))
+    return tables[0] if len(tables) == 1 else pa.concat_tables(tables)
+
+
+def read_frame(uri: str, columns: Optional[List[str]] = None,
+               row_groups: Optional[Sequence[int]] = None,
+               cache: Optional[DatasetCache] = None, filesystem=None):
+    """``read_table`` as a pandas DataFrame."""
+    return read_table(uri, columns, row_groups, cache, filesystem).to_pandas()
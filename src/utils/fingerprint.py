@@ -0,0 +1,301 @@
+"""Dataset fingerprints that identify a snapshot without reading all of it.
+
+``fingerprint(uri)`` returns a digest for a file or a directory (prefix) of
+files, local or on S3. Each file is identified, cheapest first, by:
+
+- its entry in the local ``FingerprintIndex`` when the file's size,
+  modification time and ETag are unchanged since it was last fingerprinted;
+  for a parquet file the footer, which holds the schema and every row
+  group's offsets, sizes, row counts and column statistics, must be
+  unchanged too, which costs two ranged reads;
+- its S3 ETag, which S3 derives from the content (``etag:``);
+- otherwise a SHA-256 of the content, streamed in ``chunk_size`` pieces so
+  memory stays constant (``sha256:``).
+
+The footer recognises a file already seen but never identifies one on
+first sight: files that differ only in their data pages (a relabelled
+column, an edited value) can have identical footers.
+
+``method='sha256'`` forces the full content hash. A directory's digest
+(``manifest:``) hashes its files' relative paths and digests. Filesystems
+are looked up by URI scheme in ``FILESYSTEMS``; anything with the
+``stat``/``list``/``open``/``read_range`` methods of ``LocalFilesystem``
+can be registered there or passed as ``filesystem``.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+from dataclasses import asdict, dataclass
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
+
+import yaml
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+PARQUET_MAGIC = b'PAR1'
+METHODS = ('auto', 'sha256')
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FileStat:
+    size: int
+    mtime: float
+    etag: Optional[str] = None
+    version: Optional[str] = None
+
+
+@dataclass
+class Fingerprint:
+    uri: str
+    digest: str
+    size: int
+    files: int = 1
+    cached: bool = False
+    @property
+    def method(self) -> str:
+        return self.digest.split(':', 1)[0]
+
+
+class ObjectChanged(RuntimeError):
+    """The object no longer has the version or ETag a read was pinned to."""
+
+
+class LocalFilesystem:
+    def stat(self, path: str) -> Optional[FileStat]:
+        """Size and mtime of a regular file; ``None`` if ``path`` is not one."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if not os.path.isfile(path):
+            return None
+        return FileStat(size=st.st_size, mtime=st.st_mtime_ns / 1e9)
+    def list(self, path: str) -> List[str]:
+        files = []
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            files.extend(os.path.join(root, name) for name in sorted(names))
+        return files
+    def open(self, path: str, stat: Optional[FileStat] = None) -> BinaryIO:
+        return open(path, 'rb')
+    def read_range(self, path: str, start: int, length: int,
+                   stat: Optional[FileStat] = None) -> bytes:
+        with open(path, 'rb') as f:
+            f.seek(start)
+            return f.read(length)
+
+
+class S3Filesystem:
+    """``s3://bucket/key`` URIs through boto3; the client is created on first use."""
+    def __init__(self, client=None):
+        self._client = client
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client('s3')
+        return self._client
+    @staticmethod
+    def _split(uri: str):
+        bucket, _, key = uri[len('s3://'):].partition('/')
+        return bucket, key
+    def stat(self, uri: str) -> Optional[FileStat]:
+        from botocore.exceptions import ClientError
+        bucket, key = self._split(uri)
+        if not key or key.endswith('/'):
+            return None
+        try:
+            head = self.client.head_object(Bucket=bucket, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        version = head.get('VersionId')
+        return FileStat(size=head['ContentLength'], mtime=head['LastModified'].timestamp(),
+                        etag=head['ETag'].strip('"'),
+                        version=version if version not in (None, 'null') else None)
+    def list(self, uri: str) -> List[str]:
+        bucket, key = self._split(uri)
+        prefix = key.rstrip('/') + '/' if key else ''
+        paginator = self.client.get_paginator('list_objects_v2')
+        keys = [obj['Key'] for page in paginator.paginate(Bucket=bucket, Prefix=prefix)
+                for obj in page.get('Contents', []) if not obj['Key'].endswith('/')]
+        return [f"s3://{bucket}/{k}" for k in sorted(keys)]
+    def _get(self, uri: str, stat: Optional[FileStat] = None, **kwargs):
+        """GET ``uri``, pinned to ``stat``'s version or ETag when given."""
+        from botocore.exceptions import ClientError
+        bucket, key = self._split(uri)
+        if stat is not None and stat.version:
+            kwargs['VersionId'] = stat.version
+        elif stat is not None and stat.etag:
+            kwargs['IfMatch'] = f'"{stat.etag}"'
+        try:
+            return self.client.get_object(Bucket=bucket, Key=key, **kwargs)['Body']
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'PreconditionFailed':
+                raise ObjectChanged(uri) from e
+            raise
+    def open(self, uri: str, stat: Optional[FileStat] = None) -> BinaryIO:
+        return self._get(uri, stat)
+    def read_range(self, uri: str, start: int, length: int,
+                   stat: Optional[FileStat] = None) -> bytes:
+        body = self._get(uri, stat, Range=f"bytes={start}-{start + length - 1}")
+        with body:
+            return body.read()
+
+
+FILESYSTEMS: Dict[str, Callable[[], Any]] = {'file': LocalFilesystem, 's3': S3Filesystem}
+
+
+def filesystem_for(uri: str):
+    scheme = uri.split('://', 1)[0] if '://' in uri else 'file'
+    if scheme not in FILESYSTEMS:
+        raise ValueError(f"No filesystem registered for {scheme}:// URIs")
+    return FILESYSTEMS[scheme]()
+
+
+class FingerprintIndex:
+    """File digests keyed by URI, trusted while size, mtime and ETag are unchanged.
+
+    Kept in one JSON file, replaced atomically on ``save``.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if path:
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError):
+                logger.exception(f"Ignoring unreadable fingerprint index {path}")
+    def get(self, uri: str, stat: FileStat, method: str,
+            footer: Optional[str] = None) -> Optional[str]:
+        entry = self.entries.get(uri)
+        if entry is None or entry['stat'] != asdict(stat) or entry['method'] != method:
+            return None
+        if entry.get('footer') != footer:
+            return None
+        return entry['digest']
+    def put(self, uri: str, stat: FileStat, method: str, digest: str,
+            footer: Optional[str] = None):
+        self.entries[uri] = {'stat': asdict(stat), 'method': method, 'digest': digest}
+        if footer is not None:
+            self.entries[uri]['footer'] = footer
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def content_digest(filesystem, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    hasher = hashlib.sha256()
+    with filesystem.open(path) as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return f"sha256:{hasher.hexdigest()}"
+
+
+def parquet_footer_digest(filesystem, path: str, size: int) -> Optional[str]:
+    """SHA-256 of the parquet footer and file size, or ``None`` if ``path`` is not parquet."""
+    if size < 12:
+        return None
+    tail = filesystem.read_range(path, size - 8, 8)
+    footer_length = struct.unpack('<I', tail[:4])[0]
+    if tail[4:] != PARQUET_MAGIC or footer_length > size - 12:
+        return None
+    footer = filesystem.read_range(path, size - 8 - footer_length, footer_length)
+    hasher = hashlib.sha256(str(size).encode())
+    hasher.update(footer)
+    return f"parquet-footer:{hasher.hexdigest()}"
+
+
+def file_digest(filesystem, path: str, stat: FileStat, method: str = 'auto',
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    if method == 'auto' and stat.etag:
+        return f"etag:{stat.etag}"
+    return content_digest(filesystem, path, chunk_size)
+
+
+def is_source(path: str) -> bool:
+    """Whether a file under a code directory is source, rather than bytecode the run writes."""
+    return '__pycache__' not in path.replace(os.sep, '/').split('/') and \
+        not path.endswith(('.pyc', '.pyo'))
+
+
+def fingerprint(uri: str, index: Optional[FingerprintIndex] = None, method: str = 'auto',
+                filesystem=None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                include: Optional[Callable[[str], bool]] = None) -> Fingerprint:
+    """Fingerprint a file or directory; see the module docstring. Updates and saves ``index``.
+
+    ``include`` filters the files of a directory, say to ``is_source``.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}; expected one of {', '.join(METHODS)}")
+    filesystem = filesystem or filesystem_for(uri)
+    index = index if index is not None else FingerprintIndex()
+    stat = filesystem.stat(uri)
+    paths = [uri] if stat is not None else [
+        path for path in filesystem.list(uri) if include is None or include(path)
+    ]
+    if not paths:
+        raise FileNotFoundError(uri)
+    digests, size, cached, dirty = [], 0, True, False
+    for path in paths:
+        path_stat = stat if path == uri else filesystem.stat(path)
+        key = path if '://' in path else os.path.abspath(path)
+        footer = None
+        if not path_stat.etag and path.endswith('.parquet'):
+            footer = parquet_footer_digest(filesystem, path, path_stat.size)
+        digest = index.get(key, path_stat, method, footer)
+        if digest is None:
+            digest = file_digest(filesystem, path, path_stat, method, chunk_size)
+            index.put(key, path_stat, method, digest, footer)
+            cached, dirty = False, True
+        digests.append(digest)
+        size += path_stat.size
+    if dirty:
+        index.save()
+    if stat is not None:
+        return Fingerprint(uri, digests[0], size, cached=cached)
+    hasher = hashlib.sha256()
+    prefix = uri.rstrip('/') + '/'
+    for path, digest in zip(paths, digests):
+        hasher.update(f"{path[len(prefix):]}\0{digest}\n".encode())
+    return Fingerprint(uri, f"manifest:{hasher.hexdigest()}", size, files=len(paths),
+                       cached=cached)
+
+
+def fingerprint_from_config(uri: str, config: Dict[str, Any]) -> Fingerprint:
+    section = config.get('fingerprint', {})
+    return fingerprint(uri, FingerprintIndex(section.get('index_path')),
+                       method=section.get('method', 'auto'),
+                       chunk_size=section.get('chunk_size', DEFAULT_CHUNK_SIZE))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('uri', help='File or directory, local or s3://')
+    parser.add_argument('--config', default='configs/dev.yaml')
+    parser.add_argument('--full', action='store_true', help='Hash the full content')
+    args = parser.parse_args()
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    if args.full:
+        config.setdefault('fingerprint', {})['method'] = 'sha256'
+    print(fingerprint_from_config(args.uri, config).digest)
+
+
+if __name__ == '__main__':
+    main()
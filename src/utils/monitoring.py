@@ -1,9 +1,116 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict
+
 import prometheus_client
-from prometheus_client import Counter, Histogram
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+
+# Dense around the 500 ms latency SLO so p95/p99 estimates near the target are usable.
+LATENCY_BUCKETS_MS = (
+    1, 2.5, 5, 10, 25, 50, 75, 100, 150, 200, 250, 300, 350, 400, 450, 500, 600, 750, 1000,
+    2500, 5000
+)
+SIZE_BUCKETS_BYTES = tuple(2 ** i for i in range(6, 25, 2))
+STAGES = ('parse', 'preprocess', 'provider', 'postprocess')
+
+inference_count = Counter('inference_count', 'Total inferences', ['provider', 'model_version'])
+latency_histogram = Histogram(
+    'inference_latency_ms',
+    'Provider call latency as seen by the adapter (ms)',
+    ['provider', 'model_version'],
+    buckets=LATENCY_BUCKETS_MS
+)
+stage_histogram = Histogram(
+    'inference_stage_latency_ms',
+    'Time spent in each stage of a /predict request (ms)',
+    ['stage', 'provider', 'model_version'],
+    buckets=LATENCY_BUCKETS_MS
+)
+request_latency_histogram = Histogram(
+    'inference_request_latency_ms',
+    'End-to-end /predict latency (ms)',
+    ['provider', 'model_version'],
+    buckets=LATENCY_BUCKETS_MS
+)
+ttft_histogram = Histogram(
+    'inference_time_to_first_token_ms',
+    'Time until the first streamed token (ms)',
+    ['provider', 'model_version'],
+    buckets=LATENCY_BUCKETS_MS
+)
+request_size_histogram = Histogram(
+    'inference_request_size_bytes',
+    'Request body size (bytes)',
+    ['endpoint'],
+    buckets=SIZE_BUCKETS_BYTES
+)
+in_flight_gauge = Gauge(
+    'inference_in_flight_requests',
+    'Requests currently being handled',
+    ['endpoint'],
+    multiprocess_mode='livesum'
+)
+error_count = Counter(
+    'inference_errors', 'Failed requests by error type', ['endpoint', 'error_type']
+)
+batch_size_histogram = Histogram(
+    'inference_batch_size',
+    'Requests dispatched per micro-batch',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+batch_wait_histogram = Histogram(
+    'inference_batch_wait_ms',
+    'Time a request waited in the micro-batch queue (ms)',
+    buckets=(0.5, 1, 2, 5, 10, 20, 50, 100, 250)
+)
+
+def log_inference(latency, provider='unknown', model_version='unknown'):
+    inference_count.labels(provider, model_version).inc()
+    latency_histogram.labels(provider, model_version).observe(latency)
+
+def log_ttft(ttft_ms, provider='unknown', model_version='unknown'):
+    ttft_histogram.labels(provider, model_version).observe(ttft_ms)
+
+def log_batch(size, wait_times_ms):
+    batch_size_histogram.observe(size)
+    for wait_ms in wait_times_ms:
+        batch_wait_histogram.observe(wait_ms)
+
+def log_error(endpoint, error):
+    error_count.labels(endpoint, type(error).__name__).inc()
+
+class RequestTimer:
+    """Times the stages of one request and reports them once provider and version are known."""
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+    def observe(self, provider='unknown', model_version='unknown'):
+        for name, elapsed_ms in self.stages.items():
+            stage_histogram.labels(name, provider, model_version).observe(elapsed_ms)
+        elapsed_ms = (time.perf_counter() - self.start) * 1000
+        request_latency_histogram.labels(provider, model_version).observe(elapsed_ms)
+
+def multiprocess_enabled():
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
 
-inference_count = Counter('inference_count', 'Total inferences')
-latency_histogram = Histogram('inference_latency_ms', 'Inference latency (ms)')
+def render_metrics():
+    """Exposition text for /metrics, aggregated across worker processes in multiprocess mode."""
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
 
-def log_inference(latency):
-    inference_count.inc()
-    latency_histogram.observe(latency)
+def mark_worker_exit(pid=None):
+    """Drop a finished worker's live gauges from the multiprocess aggregate."""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid or os.getpid())
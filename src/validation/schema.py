@@ -1,6 +1,8 @@
-# Example schema definition for validation
+# Schema of the raw training data. Each column has a logical dtype
+# ("float", "int", "bool", "string"), whether nulls/NaN are allowed, and
+# optional "min"/"max" bounds or an "allowed" set of values.
 SCHEMA = {
-    "feature1": float,
-    "feature2": float,
-    "target": int
+    "feature1": {"dtype": "float", "nullable": False},
+    "feature2": {"dtype": "float", "nullable": False},
+    "target": {"dtype": "int", "nullable": False, "allowed": [0, 1]}
 }
@@ -1,9 +1,267 @@
+import argparse
+import json
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
 import pandas as pd
-from schema import SCHEMA
-
-def validate(df: pd.DataFrame):
-    for col, dtype in SCHEMA.items():
-        assert col in df.columns, f"Missing column: {col}"
-        assert df[col].dtype == dtype, f"Column {col} has wrong type"
-    assert df.isnull().sum().sum() == 0, "Null values found"
-    print("Schema validation passed")
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.fs
+import pyarrow.parquet as pq
+
+from src.validation.schema import SCHEMA
+
+DTYPE_CHECKS = {
+    "float": pa.types.is_floating,
+    "int": pa.types.is_integer,
+    "bool": pa.types.is_boolean,
+    "string": lambda t: pa.types.is_string(t) or pa.types.is_large_string(t)
+}
+
+
+class SchemaValidationError(ValueError):
+    def __init__(self, report: "ValidationReport"):
+        super().__init__(report.summary())
+        self.report = report
+
+
+@dataclass
+class Violation:
+    column: str
+    check: str
+    count: int = 0
+    sample_rows: List[int] = field(default_factory=list)
+    sample_values: List[Any] = field(default_factory=list)
+    detail: str = ""
+
+
+@dataclass
+class ValidationReport:
+    rows: int = 0
+    violations: Dict[Tuple[str, str], Violation] = field(default_factory=dict)
+    @property
+    def passed(self) -> bool:
+        return not self.violations
+    def add(self, column: str, check: str, count: int, rows: Iterable[int] = (),
+            values: Iterable[Any] = (), detail: str = "", max_samples: int = 5):
+        violation = self.violations.get((column, check))
+        if violation is None:
+            violation = self.violations[(column, check)] = Violation(column, check, detail=detail)
+        violation.count += count
+        room = max_samples - len(violation.sample_rows)
+        if room > 0:
+            violation.sample_rows.extend(list(rows)[:room])
+            violation.sample_values.extend(list(values)[:room])
+    def summary(self) -> str:
+        if self.passed:
+            return f"Schema validation passed ({self.rows} rows)"
+        lines = [f"Schema validation failed ({self.rows} rows):"]
+        for v in self.violations.values():
+            line = f"  {v.column}: {v.check} x{v.count}"
+            if v.detail:
+                line += f" - {v.detail}"
+            if v.sample_rows:
+                line += f" (rows {v.sample_rows})"
+            lines.append(line)
+        return "\n".join(lines)
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "passed": self.passed,
+            "rows": self.rows,
+            "violations": [vars(v) for v in self.violations.values()]
+        }
+    def raise_for_violations(self):
+        if not self.passed:
+            raise SchemaValidationError(self)
+
+
+@dataclass
+class ColumnRule:
+    name: str
+    dtype: str
+    nullable: bool = True
+    min: Optional[float] = None
+    max: Optional[float] = None
+    allowed: Optional[pa.Array] = None
+
+
+class CompiledSchema:
+    """A schema turned into per-column Arrow compute kernels.
+
+    Each chunk is checked column by column in a single vectorized pass over
+    dtype, nulls (NaN counts as null, as in pandas), range and allowed values.
+    Dtype and missing-column checks only need the Arrow schema, so for parquet
+    they run against the footer before any data is read.
+    """
+    def __init__(self, schema: Dict[str, Dict[str, Any]], max_samples: int = 5):
+        self.rules = []
+        for name, spec in schema.items():
+            if spec["dtype"] not in DTYPE_CHECKS:
+                raise ValueError(f"Unknown dtype {spec['dtype']!r} for column {name}")
+            allowed = spec.get("allowed")
+            self.rules.append(ColumnRule(
+                name, spec["dtype"], spec.get("nullable", True),
+                spec.get("min"), spec.get("max"),
+                pa.array(allowed) if allowed is not None else None
+            ))
+        self.max_samples = max_samples
+    @property
+    def columns(self) -> List[str]:
+        return [rule.name for rule in self.rules]
+    def check_schema(self, arrow_schema: pa.Schema,
+                     report: ValidationReport) -> List[ColumnRule]:
+        """Record missing columns and dtype mismatches; return the rules left to check."""
+        checkable = []
+        for rule in self.rules:
+            index = arrow_schema.get_field_index(rule.name)
+            if index < 0:
+                report.add(rule.name, "missing_column", 1)
+                continue
+            arrow_type = arrow_schema.field(index).type
+            if pa.types.is_dictionary(arrow_type):
+                arrow_type = arrow_type.value_type
+            if not DTYPE_CHECKS[rule.dtype](arrow_type):
+                report.add(rule.name, "dtype", 1,
+                           detail=f"expected {rule.dtype}, got {arrow_type}")
+                continue
+            checkable.append(rule)
+        return checkable
+    def check_batch(self, batch: Union[pa.RecordBatch, pa.Table], rules: List[ColumnRule],
+                    report: ValidationReport, row_offset: int = 0):
+        report.rows += batch.num_rows
+        for rule in rules:
+            column = batch.column(batch.schema.get_field_index(rule.name))
+            if isinstance(column, pa.ChunkedArray):
+                column = column.combine_chunks()
+            if pa.types.is_dictionary(column.type):
+                column = column.dictionary_decode()
+            if not rule.nullable:
+                missing = pc.is_null(column, nan_is_null=True)
+                self._record(report, rule.name, "null", missing, column, row_offset)
+            if rule.min is not None or rule.max is not None:
+                out_of_range = None
+                if rule.min is not None:
+                    out_of_range = pc.less(column, rule.min)
+                if rule.max is not None:
+                    above = pc.greater(column, rule.max)
+                    out_of_range = above if out_of_range is None else pc.or_(
+                        out_of_range, above)
+                self._record(report, rule.name, "range", out_of_range, column, row_offset,
+                             detail=f"expected [{rule.min}, {rule.max}]")
+            if rule.allowed is not None:
+                unexpected = pc.and_(pc.invert(pc.is_in(column, value_set=rule.allowed)),
+                                     pc.is_valid(column))
+                self._record(report, rule.name, "allowed", unexpected, column, row_offset,
+                             detail=f"expected one of {rule.allowed.to_pylist()}")
+    def _record(self, report: ValidationReport, column: str, check: str, mask: pa.Array,
+                values: pa.Array, row_offset: int, detail: str = ""):
+        mask = pc.fill_null(mask, False)
+        count = pc.sum(mask).as_py() or 0
+        if not count:
+            return
+        rows = pc.indices_nonzero(mask)[:self.max_samples]
+        report.add(
+            column, check, count,
+            rows=[row_offset + i for i in rows.to_pylist()],
+            values=values.take(rows).to_pylist(),
+            detail=detail, max_samples=self.max_samples
+        )
+
+
+def validate(df: pd.DataFrame, schema: Optional[Dict[str, Dict[str, Any]]] = None,
+             raise_on_error: bool = True) -> ValidationReport:
+    """Validate a DataFrame, converting it to Arrow one column at a time.
+
+    A column Arrow cannot convert (an object column mixing, say, floats and
+    strings) is reported as a dtype violation instead of raising.
+    """
+    schema = schema or SCHEMA
+    report = ValidationReport()
+    arrays = {}
+    for name, spec in schema.items():
+        if name not in df.columns:
+            continue
+        try:
+            arrays[name] = pa.Array.from_pandas(df[name])
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            report.add(name, "dtype", 1, detail=f"expected {spec['dtype']}, got mixed types: {e}")
+    compiled = CompiledSchema({name: spec for name, spec in schema.items()
+                               if (name, "dtype") not in report.violations})
+    table = pa.table(arrays)
+    rules = compiled.check_schema(table.schema, report)
+    if arrays:
+        compiled.check_batch(table, rules, report)
+    else:
+        report.rows += len(df)
+    if raise_on_error:
+        report.raise_for_violations()
+    return report
+
+
+def validate_table(table: pa.Table, schema: Optional[Dict[str, Dict[str, Any]]] = None,
+                   raise_on_error: bool = True) -> ValidationReport:
+    """Validate an Arrow table (or record batch) already in memory, without copying it."""
+    compiled = CompiledSchema(schema or SCHEMA)
+    report = ValidationReport()
+    rules = compiled.check_schema(table.schema, report)
+    compiled.check_batch(table, rules, report)
+    if raise_on_error:
+        report.raise_for_violations()
+    return report
+
+
+def validate_parquet(source, schema: Optional[Dict[str, Dict[str, Any]]] = None,
+                     filesystem=None, raise_on_error: bool = True) -> ValidationReport:
+    """Validate a parquet file one row group at a time, reading only the schema's columns.
+
+    ``source`` is a local path, an ``s3://`` URI or an open file; only the footer
+    and one row group's worth of the checked columns are held in memory.
+    """
+    compiled = CompiledSchema(schema or SCHEMA)
+    report = ValidationReport()
+    if isinstance(source, str) and filesystem is None and "://" in source:
+        filesystem, source = pa.fs.FileSystem.from_uri(source)
+    handle = filesystem.open_input_file(source) if filesystem is not None else source
+    try:
+        parquet = pq.ParquetFile(handle)
+        rules = compiled.check_schema(parquet.schema_arrow, report)
+        columns = [rule.name for rule in rules]
+        offset = 0
+        for i in range(parquet.num_row_groups):
+            if columns:
+                batch = parquet.read_row_group(i, columns=columns)
+                compiled.check_batch(batch, rules, report, row_offset=offset)
+            else:
+                report.rows += parquet.metadata.row_group(i).num_rows
+            offset += parquet.metadata.row_group(i).num_rows
+    finally:
+        if filesystem is not None:
+            handle.close()
+    if raise_on_error:
+        report.raise_for_violations()
+    return report
+
+
+def main():
+    import yaml
+    from src.utils.datasets import cache_from_config, open_input
+    parser = argparse.ArgumentParser()
+    parser.add_argument("config", nargs="?", default="configs/dev.yaml")
+    parser.add_argument("--path", help="Parquet file to validate; defaults to the raw data "
+                                       "in the config's bucket")
+    parser.add_argument("--output", help="Optional path for the JSON report")
+    args = parser.parse_args()
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    path = args.path or f"s3://{config['s3']['raw_bucket']}/data.parquet"
+    report = validate_parquet(open_input(path, cache_from_config(config)), raise_on_error=False)
+    print(report.summary())
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report.to_dict(), f, indent=2, default=str)
+    sys.exit(0 if report.passed else 1)
+
+
+if __name__ == "__main__":
+    main()
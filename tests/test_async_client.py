@@ -0,0 +1,71 @@
+import asyncio
+import boto3
+import pytest
+from aiohttp import web
+from botocore.exceptions import NoCredentialsError
+from src.inference.adapter import InferenceAdapter
+from src.inference.async_client import AsyncRuntimeClient
+from src.inference.metrics_sink import BufferedMetricsSink, InMemoryCloudWatch
+
+CONFIG = {
+    'aws': {'region': 'eu-central-1'},
+    'sagemaker': {'endpoint_name': 'heart-ep'},
+    'bedrock': {'model_id': 'anthropic.claude-3-sonnet', 'max_tokens': 16},
+    'http': {'max_connections': 4},
+    'cost': {'per_inference_limit_usd': 0.1}
+}
+
+
+async def run_against_stub(provider, payload, reply):
+    seen = []
+    async def handler(request):
+        seen.append((request.path, dict(request.headers), await request.json()))
+        return web.json_response(reply)
+    app = web.Application()
+    app.router.add_post('/endpoints/{name}/invocations', handler)
+    app.router.add_post('/model/{model_id}/invoke', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+    config = dict(CONFIG, provider=provider)
+    config['sagemaker'] = dict(CONFIG['sagemaker'], runtime_endpoint_url=url)
+    config['bedrock'] = dict(CONFIG['bedrock'], runtime_endpoint_url=url)
+    adapter = InferenceAdapter(config, metrics_sink=BufferedMetricsSink(InMemoryCloudWatch(), flush_interval_s=3600))
+    session = boto3.Session(aws_access_key_id='AKIDEXAMPLE', aws_secret_access_key='secret', region_name='eu-central-1')
+    adapter._async_client = AsyncRuntimeClient(config, session=session)
+    try:
+        return await adapter.apredict(payload), seen
+    finally:
+        await adapter.aclose()
+        await runner.cleanup()
+
+
+def test_apredict_sagemaker_sends_signed_request():
+    result, seen = asyncio.run(run_against_stub('sagemaker', {'feature1': 1.0}, [1]))
+    assert result == {'prediction': [1], 'provider': 'sagemaker'}
+    [(path, headers, body)] = seen
+    assert path == '/endpoints/heart-ep/invocations'
+    assert headers['Authorization'].startswith('AWS4-HMAC-SHA256')
+    assert body == {'feature1': 1.0}
+
+
+def test_apredict_bedrock_parses_completion():
+    reply = {'completion': 'hi', 'token_count': 5}
+    result, seen = asyncio.run(run_against_stub('bedrock', {'prompt': 'hello'}, reply))
+    assert result == {'prediction': 'hi', 'token_count': 5, 'provider': 'bedrock'}
+    assert seen[0][2] == {'prompt': 'hello', 'max_tokens': 16, 'temperature': 0.7}
+
+
+def test_missing_credentials_raise_instead_of_sending_unsigned(monkeypatch):
+    session = boto3.Session(region_name='eu-central-1')
+    monkeypatch.setattr(session, 'get_credentials', lambda: None)
+    client = AsyncRuntimeClient(dict(CONFIG, provider='sagemaker'), session=session)
+    async def invoke():
+        try:
+            await client.invoke_endpoint('heart-ep', b'{}')
+        finally:
+            await client.aclose()
+    with pytest.raises(NoCredentialsError):
+        asyncio.run(invoke())
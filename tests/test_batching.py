@@ -0,0 +1,104 @@
+import asyncio
+import io
+import json
+import pytest
+from src.inference.adapter import InferenceAdapter
+from src.inference.batching import BatchQueueFullError, MicroBatcher
+from src.inference.metrics_sink import BufferedMetricsSink, InMemoryCloudWatch
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_requests_are_batched_and_scattered():
+    calls = []
+    def predict_batch(payloads):
+        calls.append(len(payloads))
+        return [{'prediction': p['x'] * 2} for p in payloads]
+    async def scenario():
+        batcher = MicroBatcher(predict_batch, max_batch_size=4, max_wait_ms=50)
+        results = await asyncio.gather(*(batcher.submit({'x': i}) for i in range(10)))
+        await batcher.close()
+        return results
+    results = run(scenario())
+    assert [r['prediction'] for r in results] == [i * 2 for i in range(10)]
+    assert sorted(calls) == [2, 4, 4]
+
+
+def test_lone_request_dispatched_after_max_wait():
+    async def scenario():
+        batcher = MicroBatcher(lambda payloads: payloads, max_batch_size=64, max_wait_ms=1)
+        result = await asyncio.wait_for(batcher.submit({'x': 1}), timeout=1)
+        await batcher.close()
+        return result
+    assert run(scenario()) == {'x': 1}
+
+
+def test_batch_failure_propagates_to_every_caller():
+    def predict_batch(payloads):
+        raise RuntimeError('endpoint down')
+    async def scenario():
+        batcher = MicroBatcher(predict_batch, max_batch_size=2, max_wait_ms=10)
+        results = await asyncio.gather(batcher.submit({}), batcher.submit({}), return_exceptions=True)
+        await batcher.close()
+        return results
+    assert all(isinstance(r, RuntimeError) for r in run(scenario()))
+
+
+def test_queue_depth_is_bounded():
+    async def scenario():
+        batcher = MicroBatcher(lambda payloads: payloads, max_batch_size=1, max_queue_size=1)
+        first = asyncio.ensure_future(batcher.submit({'x': 1}))
+        await asyncio.sleep(0)
+        with pytest.raises(BatchQueueFullError):
+            await batcher.submit({'x': 2})
+        await first
+        await batcher.close()
+    run(scenario())
+
+
+class StubSageMaker:
+    def __init__(self):
+        self.bodies = []
+    def invoke_endpoint(self, EndpointName, ContentType, Body):
+        instances = json.loads(Body)['instances']
+        self.bodies.append(instances)
+        return {'Body': io.BytesIO(json.dumps({'predictions': [i['x'] for i in instances]}).encode())}
+
+
+def test_requests_collected_when_the_worker_stops_are_failed():
+    async def scenario():
+        batcher = MicroBatcher(lambda payloads: payloads, max_batch_size=8, max_wait_ms=1000)
+        lingering = asyncio.ensure_future(batcher.submit({'x': 1}))
+        await asyncio.sleep(0.01)
+        # The worker is cancelled while lingering for more requests.
+        batcher._worker.cancel()
+        with pytest.raises(RuntimeError, match='stopped'):
+            await asyncio.wait_for(lingering, timeout=1)
+        # A request queued behind a dead worker is failed, not orphaned, on restart.
+        batcher._queue.put_nowait(({'x': 2}, asyncio.get_running_loop().create_future(), 0.0))
+        queued = batcher._queue._queue[0][1]
+        batcher.max_wait_s = 0.01
+        assert await asyncio.wait_for(batcher.submit({'x': 3}), timeout=1) == {'x': 3}
+        with pytest.raises(RuntimeError, match='stopped'):
+            await queued
+        await batcher.close()
+    run(scenario())
+
+
+def test_adapter_sends_one_sagemaker_call_per_batch(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'eu-central-1')
+    config = {
+        'provider': 'sagemaker',
+        'sagemaker': {'endpoint_name': 'ep'},
+        'cost': {'per_inference_limit_usd': 0.1}
+    }
+    client = InMemoryCloudWatch()
+    adapter = InferenceAdapter(config, metrics_sink=BufferedMetricsSink(client, flush_interval_s=3600))
+    adapter.sagemaker = StubSageMaker()
+    responses = adapter.predict_batch([{'x': 1}, {'x': 2}, {'x': 3}])
+    adapter.close()
+    assert [r['prediction'] for r in responses] == [1, 2, 3]
+    assert adapter.sagemaker.bodies == [[{'x': 1}, {'x': 2}, {'x': 3}]]
+    assert client.datums('Cost')[0]['Values'] == [0.001]
@@ -0,0 +1,121 @@
+import threading
+from datetime import datetime, timezone
+import pytest
+from src.inference.adapter import InferenceAdapter
+from src.inference.budget import BudgetExceededError, CostTracker, month_bounds
+from src.inference.metrics_sink import BufferedMetricsSink, InMemoryCloudWatch
+
+# Noon on 2024-06-11: 10.5 of June's 30 days have elapsed.
+NOW = datetime(2024, 6, 11, 12, tzinfo=timezone.utc).timestamp()
+
+
+def test_month_bounds():
+    start, length = month_bounds(NOW)
+    assert start == datetime(2024, 6, 1, tzinfo=timezone.utc).timestamp()
+    assert length == 30 * 86400
+
+
+def test_totals_from_many_threads():
+    tracker = CostTracker(rollup_interval_s=0, clock=lambda: NOW)
+    def work():
+        for _ in range(1000):
+            tracker.record('bedrock', 'claude', 0.001)
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    tracker.record('sagemaker', 'ep', 0.5)
+    window = tracker.rollup()
+    assert window[('bedrock', 'claude')] == (pytest.approx(8.0), 8000)
+    assert window[('sagemaker', 'ep')] == (0.5, 1)
+    assert tracker.rollup() == {}
+    assert tracker.month_to_date_usd == pytest.approx(8.5)
+
+
+def test_projection_drives_policy():
+    tracker = CostTracker(monthly_budget_usd=100, policy='shed', rollup_interval_s=0, clock=lambda: NOW)
+    tracker.record('bedrock', 'claude', 30.0)
+    tracker.rollup()
+    # 30 USD after 10.5 days projects to about 85.7 USD: past warn_at, not yet act_at.
+    assert tracker.projected_month_usd == pytest.approx(30 / 10.5 * 30)
+    assert tracker.state == 'warn'
+    assert tracker.provider_for('bedrock') == 'bedrock'
+    tracker.record('bedrock', 'claude', 10.0)
+    tracker.rollup()
+    assert tracker.state == 'shed'
+    with pytest.raises(BudgetExceededError):
+        tracker.provider_for('bedrock')
+
+
+def test_each_worker_holds_a_share_of_the_budget():
+    tracker = CostTracker(monthly_budget_usd=200, workers=2, policy='shed', rollup_interval_s=0, clock=lambda: NOW)
+    assert tracker.budget_usd == 100
+    tracker.record('bedrock', 'claude', 40.0)
+    tracker.rollup()
+    assert tracker.state == 'shed'
+    with pytest.raises(ValueError):
+        CostTracker(monthly_budget_usd=200, workers=0, rollup_interval_s=0)
+
+
+def test_new_month_resets_spend():
+    now = [NOW]
+    tracker = CostTracker(monthly_budget_usd=100, rollup_interval_s=0, clock=lambda: now[0])
+    tracker.record('bedrock', 'claude', 90.0)
+    tracker.rollup()
+    now[0] = datetime(2024, 7, 20, tzinfo=timezone.utc).timestamp()
+    tracker.record('bedrock', 'claude', 1.0)
+    tracker.rollup()
+    assert tracker.month_to_date_usd == 1.0 and tracker.state == 'ok'
+
+
+def test_route_cheaper_needs_a_provider():
+    with pytest.raises(ValueError):
+        CostTracker(policy='route_cheaper', rollup_interval_s=0)
+    with pytest.raises(ValueError):
+        CostTracker(policy='panic', rollup_interval_s=0)
+
+
+def test_adapter_publishes_rollups_and_routes_cheaper(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'eu-central-1')
+    client = InMemoryCloudWatch()
+    config = {
+        'provider': 'bedrock',
+        'model_id': 'claude',
+        'bedrock': {'model_id': 'claude', 'max_tokens': 8},
+        'cost': {'per_inference_limit_usd': 0.1, 'monthly_budget_usd': 0.001, 'policy': 'route_cheaper',
+                 'cheaper_provider': 'sagemaker', 'rollup_interval_s': 0},
+        'cache': {'enabled': True}
+    }
+    adapter = InferenceAdapter(config, metrics_sink=BufferedMetricsSink(client, flush_interval_s=3600))
+    monkeypatch.setattr(adapter, '_bedrock_invoke',
+                        lambda payload: {'prediction': 'ok', 'token_count': 100, 'provider': 'bedrock'})
+    monkeypatch.setattr(adapter, '_sagemaker_invoke',
+                        lambda payload: {'prediction': 'cheap', 'provider': 'sagemaker'})
+    for i in range(3):
+        assert adapter.predict({'prompt': str(i)})['provider'] == 'bedrock'
+    adapter.cost_tracker.rollup()
+    assert adapter.predict({'prompt': '0'})['provider'] == 'sagemaker'
+    # The cheaper answer is cached under its own provider, not served once the budget recovers.
+    adapter.cost_tracker.state = 'ok'
+    assert adapter.predict({'prompt': '0'})['prediction'] == 'ok'
+    adapter.close()
+    cost = client.datums('Cost')
+    assert cost[0]['Dimensions'] == [{'Name': 'Provider', 'Value': 'bedrock'}, {'Name': 'ModelId', 'Value': 'claude'}]
+    assert sum(v * c for d in cost for v, c in zip(d['Values'], d['Counts'])) == pytest.approx(3 * 100 * 0.00002 + 0.001)
+    assert client.datums('ProjectedMonthlyCost')
+
+
+def test_cheaper_local_provider_without_a_model_sheds(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'eu-central-1')
+    config = {
+        'provider': 'sagemaker',
+        'cost': {'per_inference_limit_usd': 0.1, 'monthly_budget_usd': 1, 'policy': 'route_cheaper',
+                 'cheaper_provider': 'local', 'rollup_interval_s': 0}
+    }
+    adapter = InferenceAdapter(config, metrics_sink=BufferedMetricsSink(InMemoryCloudWatch(), flush_interval_s=3600))
+    assert adapter.cost_tracker.policy == 'shed'
+    adapter.cost_tracker.state = adapter.cost_tracker.policy
+    with pytest.raises(BudgetExceededError):
+        adapter.predict({'x': 1})
+    adapter.close()
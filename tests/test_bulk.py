@@ -0,0 +1,55 @@
+import asyncio
+import gzip
+import json
+from src.inference.bulk import iter_jsonl_lines, score_jsonl
+
+
+async def stream(data, piece=7):
+    for i in range(0, len(data), piece):
+        yield data[i:i + piece]
+
+
+def collect(gen):
+    async def consume():
+        return [item async for item in gen]
+    return asyncio.run(consume())
+
+
+def score(data, predict_batch, **kwargs):
+    output = b''.join(collect(score_jsonl(stream(data), predict_batch, **kwargs)))
+    return [json.loads(line) for line in output.decode().splitlines()]
+
+
+def double(payloads):
+    return [{'prediction': p['x'] * 2} for p in payloads]
+
+
+def test_rows_are_scored_in_chunks():
+    calls = []
+    def predict_batch(payloads):
+        calls.append(len(payloads))
+        return double(payloads)
+    data = b''.join(json.dumps({'x': i}).encode() + b'\n' for i in range(5))
+    results = score(data, predict_batch, chunk_size=2)
+    assert results == [{'line': i + 1, 'prediction': i * 2} for i in range(5)]
+    assert calls == [2, 2, 1]
+
+
+def test_errors_are_reported_per_row():
+    def predict_batch(payloads):
+        if any(p['x'] < 0 for p in payloads):
+            raise ValueError('negative input')
+        return double(payloads)
+    data = b'{"x": 1}\nnot json\n\n[1, 2]\n{"x": -1}\n{"x": 3}'
+    results = score(data, predict_batch, chunk_size=10)
+    assert results[0] == {'line': 1, 'prediction': 2}
+    assert results[1]['line'] == 2 and results[1]['error'].startswith('invalid JSON')
+    assert results[2] == {'line': 4, 'error': 'row is not a JSON object'}
+    assert results[3] == {'line': 5, 'error': 'ValueError: negative input'}
+    assert results[4] == {'line': 6, 'prediction': 6}
+
+
+def test_gzip_input_and_oversized_lines():
+    data = gzip.compress(b'{"x": 1}\n' + b'{"x": "' + b'a' * 100 + b'"}\n{"x": 2}\n')
+    lines = collect(iter_jsonl_lines(stream(data), gzipped=True, max_line_bytes=50))
+    assert lines == [(1, b'{"x": 1}'), (2, None), (3, b'{"x": 2}')]
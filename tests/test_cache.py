@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+from src.inference.adapter import InferenceAdapter
+from src.inference.cache import ResponseCache, cache_key
+from src.inference.metrics_sink import BufferedMetricsSink, InMemoryCloudWatch
+
+
+def test_key_is_canonical_and_versioned():
+    key = cache_key({'a': 1, 'b': 2}, 'sagemaker', 'm', 'v1')
+    assert key == cache_key({'b': 2, 'a': 1}, 'sagemaker', 'm', 'v1')
+    assert key != cache_key({'a': 1, 'b': 2}, 'sagemaker', 'm', 'v2')
+    assert key != cache_key({'a': 1, 'b': 2}, 'bedrock', 'm', 'v1')
+
+
+def test_lru_and_memory_cap_evict_oldest():
+    cache = ResponseCache(max_entries=2)
+    cache.put('a', {'p': 1})
+    cache.put('b', {'p': 2})
+    cache.get('a')
+    cache.put('c', {'p': 3})
+    assert cache.get('b') is None
+    assert cache.get('a') == {'p': 1}
+    assert cache.evictions == 1
+    small = ResponseCache(max_bytes=20)
+    small.put('a', {'p': 'x' * 5})
+    small.put('b', {'p': 'y' * 5})
+    assert small.get('a') is None and small.get('b') is not None
+
+
+def test_ttl_expiry_and_disk_tier(tmp_path):
+    cache = ResponseCache(ttl_s=0.05, disk_dir=str(tmp_path))
+    cache.put('k', {'p': 1})
+    reloaded = ResponseCache(ttl_s=0.05, disk_dir=str(tmp_path))
+    assert reloaded.get('k') == {'p': 1}
+    time.sleep(0.06)
+    assert cache.get('k') is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_disk_tier_is_bounded_and_swept(tmp_path):
+    cache = ResponseCache(disk_dir=str(tmp_path), max_disk_entries=10)
+    for i in range(25):
+        cache.put(f'k{i}', {'p': i})
+        time.sleep(0.002)
+    assert len(list(tmp_path.iterdir())) <= 11
+    assert ResponseCache(disk_dir=str(tmp_path)).get('k24') == {'p': 24}
+    assert ResponseCache(disk_dir=str(tmp_path)).get('k0') is None
+    small = ResponseCache(disk_dir=str(tmp_path), max_disk_bytes=0)
+    assert list(tmp_path.iterdir()) == [] and small.sweep_disk() == 0
+    expired = ResponseCache(ttl_s=0.01, disk_dir=str(tmp_path))
+    expired.put('old', {'p': 0})
+    time.sleep(0.02)
+    assert expired.sweep_disk() == 1 and list(tmp_path.iterdir()) == []
+
+
+def test_concurrent_identical_requests_call_upstream_once():
+    cache = ResponseCache()
+    calls = []
+    release = threading.Event()
+    def compute():
+        calls.append(1)
+        release.wait(1)
+        return {'p': 1}
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert sorted(hit for _, hit in results) == [False, True, True, True, True]
+    assert (cache.hits, cache.misses) == (4, 1)
+
+
+def test_async_requests_are_coalesced():
+    cache = ResponseCache()
+    calls = []
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'p': 1}
+    async def scenario():
+        return await asyncio.gather(*(cache.aget_or_compute('k', compute) for _ in range(3)))
+    assert [r for r, _ in asyncio.run(scenario())] == [{'p': 1}] * 3
+    assert len(calls) == 1
+
+
+def test_cancelled_leader_hands_over_to_a_follower():
+    cache = ResponseCache()
+    calls = []
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {'p': len(calls)}
+    async def scenario():
+        leader = asyncio.ensure_future(cache.aget_or_compute('k', compute))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.ensure_future(cache.aget_or_compute('k', compute)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(*followers)
+    results = asyncio.run(scenario())
+    assert [r for r, _ in results] == [{'p': 2}] * 2
+    assert len(calls) == 2 and (cache.hits, cache.misses) == (1, 2)
+
+
+def test_adapter_reports_hits_and_cost_saved(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'eu-central-1')
+    client = InMemoryCloudWatch()
+    config = {
+        'provider': 'bedrock',
+        'bedrock': {'model_id': 'claude', 'max_tokens': 8},
+        'model': {'version': '3'},
+        'cache': {'enabled': True},
+        'cost': {'per_inference_limit_usd': 0.1}
+    }
+    adapter = InferenceAdapter(config, metrics_sink=BufferedMetricsSink(client, flush_interval_s=3600))
+    calls = []
+    def bedrock_invoke(payload):
+        calls.append(payload)
+        return {'prediction': 'ok', 'token_count': 100, 'provider': 'bedrock'}
+    monkeypatch.setattr(adapter, '_bedrock_invoke', bedrock_invoke)
+    for _ in range(3):
+        assert adapter.predict({'prompt': 'hi'})['prediction'] == 'ok'
+    adapter.close()
+    assert len(calls) == 1
+    assert client.datums('CacheHits')[0]['Counts'] == [2.0]
+    assert client.datums('CacheMisses')[0]['Counts'] == [1.0]
+    saved = client.datums('CostSaved')[0]
+    assert sum(v * c for v, c in zip(saved['Values'], saved['Counts'])) == 2 * 100 * 0.00002
@@ -0,0 +1,206 @@
+import ast
+import os
+import sys
+import time
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pytest
+
+from src.app.run_pipeline import pipeline_steps
+from src.pipelines.dag import (CANCELLED, FAILED, HIT, RAN, PipelineFailed, Step, StepStore,
+                               dependencies, run_dag)
+from src.utils.fingerprint import FingerprintIndex
+
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+
+def copy_step(name, source, target, **kwargs):
+    code = f"import shutil; shutil.copy({str(source)!r}, {str(target)!r})"
+    return Step(name, python(code), inputs=[str(source)], outputs=[str(target)], **kwargs)
+
+
+def statuses(results):
+    return {r.name: r.status for r in results}
+
+
+def test_unchanged_steps_are_skipped_and_changes_rerun_downstream(tmp_path):
+    (tmp_path / "raw.txt").write_text("raw")
+    (tmp_path / "other.txt").write_text("other")
+    steps = [
+        copy_step("features", tmp_path / "raw.txt", tmp_path / "features.txt"),
+        copy_step("train", tmp_path / "features.txt", tmp_path / "model.txt"),
+        copy_step("side", tmp_path / "other.txt", tmp_path / "side.txt"),
+    ]
+    store = StepStore(str(tmp_path / "store"))
+    assert set(statuses(run_dag(steps, store)).values()) == {RAN}
+    assert set(statuses(run_dag(steps, store)).values()) == {HIT}
+    (tmp_path / "raw.txt").write_text("raw, changed")
+    assert statuses(run_dag(steps, store)) == {"features": RAN, "train": RAN, "side": HIT}
+    assert (tmp_path / "model.txt").read_text() == "raw, changed"
+    # A deleted output is not a hit, and neither is a forced run.
+    (tmp_path / "side.txt").unlink()
+    assert statuses(run_dag(steps, store))["side"] == RAN
+    assert set(statuses(run_dag(steps, store, force=True)).values()) == {RAN}
+
+
+def test_code_and_command_are_part_of_the_key(tmp_path):
+    (tmp_path / "raw.txt").write_text("raw")
+    script = tmp_path / "step.py"
+    script.write_text("print('v1')")
+    store = StepStore(str(tmp_path / "store"))
+    step = Step("run", [sys.executable, str(script)], inputs=[str(tmp_path / "raw.txt")],
+                code=[str(script)])
+    index = FingerprintIndex(str(tmp_path / "index.json"))
+    assert run_dag([step], store, index=index)[0].status == RAN
+    assert run_dag([step], store, index=index)[0].status == HIT
+    script.write_text("print('v2')")
+    assert run_dag([step], store, index=index)[0].status == RAN
+    step.command.append("--flag")
+    assert run_dag([step], store, index=index)[0].status == RAN
+    # Bytecode written under a code directory by running the step is not part of the key.
+    package = tmp_path / "pkg"
+    (package / "__pycache__").mkdir(parents=True)
+    (package / "mod.py").write_text("x = 1")
+    packaged = Step("pkg", python("pass"), code=[str(package)])
+    assert run_dag([packaged], store, index=index)[0].status == RAN
+    (package / "__pycache__" / "mod.cpython-311.pyc").write_bytes(b"bytecode")
+    assert run_dag([packaged], store, index=index)[0].status == HIT
+    (package / "mod.py").write_text("x = 2")
+    assert run_dag([packaged], store, index=index)[0].status == RAN
+    uncached = Step("always", python("pass"), cache=False)
+    assert [run_dag([uncached], store)[0].status for _ in range(2)] == [RAN, RAN]
+
+
+def test_independent_steps_run_concurrently(tmp_path):
+    steps = [Step(name, python("import time; time.sleep(1)")) for name in ("a", "b", "c")]
+    steps.append(Step("d", python("pass"), after=["a", "b", "c"]))
+    start = time.perf_counter()
+    results = run_dag(steps, StepStore(str(tmp_path)), max_workers=3)
+    assert time.perf_counter() - start < 2.5
+    assert all(r.seconds >= 1 for r in results[:3])
+
+
+def test_first_failure_stops_the_run(tmp_path):
+    steps = [
+        Step("slow", python("import time; time.sleep(30)")),
+        Step("broken", python("import sys; sys.exit(3)")),
+        Step("downstream", python("pass"), after=["broken"]),
+    ]
+    start = time.perf_counter()
+    with pytest.raises(PipelineFailed) as info:
+        run_dag(steps, StepStore(str(tmp_path)), max_workers=2)
+    assert time.perf_counter() - start < 10
+    assert statuses(info.value.results) == {"slow": CANCELLED, "broken": FAILED,
+                                            "downstream": CANCELLED}
+    assert info.value.results[1].returncode == 3
+
+
+def test_dependencies_from_outputs_and_validation(tmp_path):
+    steps = [
+        Step("train", python("pass"), inputs=["features.parquet"], after=["tune"]),
+        Step("features", python("pass"), outputs=["features.parquet"]),
+        Step("tune", python("pass")),
+    ]
+    assert dependencies(steps) == {"train": ["tune", "features"], "features": [], "tune": []}
+    with pytest.raises(ValueError, match="Cycle"):
+        dependencies([Step("a", [], after=["b"]), Step("b", [], after=["a"])])
+    with pytest.raises(ValueError, match="unknown"):
+        dependencies([Step("a", [], after=["missing"])])
+
+
+def test_pipeline_runs_evaluation_and_explainability_in_parallel():
+    config = {"s3": {"raw_bucket": "raw", "features_bucket": "features"}}
+    deps = dependencies(pipeline_steps("configs/dev.yaml", config))
+    assert deps["evaluation"] == deps["explainability"] == ["training"]
+    assert deps["tuning"] == []
+    assert set(deps["register"]) == {"evaluation", "explainability"}
+    features = pipeline_steps("configs/dev.yaml", config)[1]
+    assert features.outputs[0].startswith("s3://features/features_")
+    assert features.command[-3:] == ["--output", features.outputs[0], "--overwrite"]
+
+
+def test_pipeline_step_code_covers_the_packages_it_imports():
+    config = {"s3": {"raw_bucket": "raw", "features_bucket": "features"}}
+    for step in pipeline_steps("configs/dev.yaml", config):
+        imported = set()
+        for directory in step.code:
+            for path in Path(directory).rglob("*.py"):
+                for node in ast.walk(ast.parse(path.read_text())):
+                    names = ([node.module or ""] if isinstance(node, ast.ImportFrom)
+                             else [a.name for a in getattr(node, "names", [])]
+                             if isinstance(node, ast.Import) else [])
+                    imported.update("/".join(n.split(".")[:2]) for n in names
+                                    if n.startswith("src."))
+        assert imported <= set(step.code), step.name
+
+
+def test_in_process_steps_hand_over_arrow_tables(tmp_path):
+    (tmp_path / "raw.txt").write_text("raw")
+    calls = []
+    def ingest(inputs):
+        calls.append("ingest")
+        return pa.table({"x": [1.0, 2.0, 3.0]})
+    def double(inputs):
+        calls.append("double")
+        return inputs["ingest"].set_column(0, "x", pc.multiply(inputs["ingest"]["x"], 2))
+    def total(inputs):
+        calls.append("total")
+        (tmp_path / "total.txt").write_text(str(pc.sum(inputs["double"]["x"]).as_py()))
+        return {"rows": inputs["ingest"].num_rows}
+    steps = [
+        Step("ingest", python("raise SystemExit(1)"), inputs=[str(tmp_path / "raw.txt")],
+             function=ingest),
+        Step("double", python("raise SystemExit(1)"), after=["ingest"], function=double),
+        Step("total", python("raise SystemExit(1)"), after=["ingest", "double"],
+             outputs=[str(tmp_path / "total.txt")], function=total),
+        copy_step("copy", tmp_path / "raw.txt", tmp_path / "copy.txt", after=["total"]),
+    ]
+    store = StepStore(str(tmp_path / "store"))
+    assert set(statuses(run_dag(steps, store, in_process=True)).values()) == {RAN}
+    assert (tmp_path / "total.txt").read_text() == "12.0"
+    assert (tmp_path / "copy.txt").read_text() == "raw"
+    assert calls == ["ingest", "double", "total"]
+    # Hits hand the stored values, tables memory-mapped, to steps that run.
+    (tmp_path / "total.txt").unlink()
+    assert statuses(run_dag(steps, store, in_process=True)) == {
+        "ingest": HIT, "double": HIT, "total": RAN, "copy": HIT}
+    assert (tmp_path / "total.txt").read_text() == "12.0"
+    key = run_dag(steps, store, in_process=True)[1].key
+    assert store.get("double", key)["value"] == "arrow"
+    assert store.get_value("double", key, "arrow")["x"].to_pylist() == [2.0, 4.0, 6.0]
+    # Without in_process the commands run, and these ones fail.
+    with pytest.raises(PipelineFailed):
+        run_dag(steps, store, force=True)
+
+
+def test_in_process_failure_stops_the_run(tmp_path):
+    def broken(inputs):
+        raise ValueError("bad data")
+    steps = [
+        Step("broken", [], function=broken),
+        Step("downstream", [], after=["broken"], function=lambda inputs: None),
+    ]
+    with pytest.raises(PipelineFailed) as info:
+        run_dag(steps, StepStore(str(tmp_path)), in_process=True)
+    assert statuses(info.value.results) == {"broken": FAILED, "downstream": CANCELLED}
+
+
+def test_only_the_latest_values_of_each_step_are_kept(tmp_path):
+    raw = tmp_path / "raw.txt"
+    step = Step("ingest", [], inputs=[str(raw)],
+                function=lambda inputs: pa.table({"text": [raw.read_text()]}))
+    store = StepStore(str(tmp_path / "store"), keep_values=2)
+    keys = []
+    for text in ("v1", "v2", "v3"):
+        raw.write_text(text)
+        keys.append(run_dag([step], store, in_process=True)[0].key)
+    assert sorted(os.listdir(tmp_path / "store" / "ingest")) == sorted(
+        [f"{k}.json" for k in keys] + [f"{k}.arrow" for k in keys[1:]])
+    # The pruned value is a miss, and running it again keeps the newest two.
+    raw.write_text("v1")
+    assert run_dag([step], store, in_process=True)[0].status == RAN
+    assert not os.path.exists(tmp_path / "store" / "ingest" / f"{keys[1]}.arrow")
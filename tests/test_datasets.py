@@ -0,0 +1,121 @@
+import io
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from src.utils.datasets import DatasetCache, read_frame, read_table
+from src.utils.fingerprint import ObjectChanged, S3Filesystem
+
+moto = pytest.importorskip("moto")
+boto3 = pytest.importorskip("boto3")
+mock_aws = getattr(moto, "mock_aws", None) or moto.mock_s3
+
+
+class CountingS3(S3Filesystem):
+    def __init__(self, client):
+        super().__init__(client)
+        self.gets = 0
+        self.bytes_read = 0
+    def open(self, uri, stat=None):
+        self.gets += 1
+        return super().open(uri, stat)
+    def read_range(self, uri, start, length, stat=None):
+        self.gets += 1
+        data = super().read_range(uri, start, length, stat)
+        self.bytes_read += len(data)
+        return data
+
+
+def parquet_bytes(n=100_000, seed=0):
+    rng = np.random.default_rng(seed)
+    buffer = io.BytesIO()
+    table = pa.table({"id": np.arange(n), "x": rng.normal(size=n), "y": rng.normal(size=n)})
+    pq.write_table(table, buffer, row_group_size=n // 10, compression="none")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="features")
+        yield client
+
+
+def test_objects_are_fetched_once_per_etag(s3, tmp_path):
+    s3.put_object(Bucket="features", Key="train.parquet", Body=parquet_bytes())
+    fs = CountingS3(s3)
+    cache = DatasetCache(str(tmp_path / "cache"))
+    uri = "s3://features/train.parquet"
+    table = read_table(uri, columns=["id"], row_groups=[2, 3], cache=cache, filesystem=fs)
+    assert table.column_names == ["id"]
+    assert table["id"].to_pylist() == list(range(20_000, 40_000))
+    assert (cache.misses, fs.gets) == (1, 1)
+    # Another process, same directory: served from disk with no GET.
+    again = DatasetCache(str(tmp_path / "cache"))
+    assert read_frame(uri, cache=again, filesystem=fs).shape == (100_000, 3)
+    assert (again.hits, fs.gets) == (1, 1)
+    s3.put_object(Bucket="features", Key="train.parquet", Body=parquet_bytes(n=1000, seed=1))
+    assert read_table(uri, cache=again, filesystem=fs).num_rows == 1000
+    assert (again.misses, fs.gets) == (1, 2)
+
+
+def test_versioned_objects_and_prefixes(s3, tmp_path):
+    s3.put_bucket_versioning(Bucket="features", VersioningConfiguration={"Status": "Enabled"})
+    s3.put_object(Bucket="features", Key="parts/part-00000.parquet", Body=parquet_bytes(n=100))
+    s3.put_object(Bucket="features", Key="parts/part-00001.parquet", Body=parquet_bytes(n=50))
+    s3.put_object(Bucket="features", Key="parts/_SUCCESS", Body=b"")
+    fs = S3Filesystem(s3)
+    cache = DatasetCache(str(tmp_path))
+    assert read_table("s3://features/parts", columns=["x"], cache=cache, filesystem=fs) \
+        .num_rows == 150
+    stat = fs.stat("s3://features/parts/part-00000.parquet")
+    assert stat.version is not None
+    with pytest.raises(ValueError, match="single file"):
+        read_table("s3://features/parts", row_groups=[0], cache=cache, filesystem=fs)
+
+
+def test_least_recently_used_copies_are_evicted(s3, tmp_path):
+    body = parquet_bytes(n=10_000)
+    for name in ("a", "b", "c"):
+        s3.put_object(Bucket="features", Key=f"{name}.parquet", Body=body)
+    fs = S3Filesystem(s3)
+    cache = DatasetCache(str(tmp_path), max_bytes=int(2.5 * len(body)))
+    for name in ("a", "b", "a", "c"):
+        read_table(f"s3://features/{name}.parquet", cache=cache, filesystem=fs)
+    assert (cache.hits, cache.misses) == (1, 3)
+    assert len(os.listdir(tmp_path / "objects")) == 2
+    read_table("s3://features/a.parquet", cache=cache, filesystem=fs)
+    read_table("s3://features/b.parquet", cache=cache, filesystem=fs)
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_objects_larger_than_the_cache_are_read_by_range(s3, tmp_path):
+    body = parquet_bytes()
+    s3.put_object(Bucket="features", Key="big.parquet", Body=body)
+    fs = CountingS3(s3)
+    cache = DatasetCache(str(tmp_path), max_bytes=len(body) // 2)
+    table = read_table("s3://features/big.parquet", columns=["x"], row_groups=[0],
+                       cache=cache, filesystem=fs)
+    assert table.num_rows == 10_000 and table.column_names == ["x"]
+    assert fs.bytes_read < len(body) / 10
+    assert cache.misses == 0 and not os.path.exists(tmp_path / "objects")
+
+
+def test_fetches_are_pinned_to_the_version_that_was_looked_up(s3, tmp_path):
+    uri = "s3://features/train.parquet"
+    s3.put_object(Bucket="features", Key="train.parquet", Body=parquet_bytes(n=100))
+    fs = S3Filesystem(s3)
+    stale = fs.stat(uri)
+    s3.put_object(Bucket="features", Key="train.parquet", Body=parquet_bytes(n=200))
+    cache = DatasetCache(str(tmp_path))
+    # Overwritten between the HEAD and the GET: nothing is stored under the old ETag.
+    with pytest.raises(ObjectChanged):
+        cache.get(uri, stale, fs)
+    assert not os.listdir(tmp_path / "objects")
+    with pytest.raises(ObjectChanged):
+        fs.read_range(uri, 0, 4, stale)
+    assert read_table(uri, cache=cache, filesystem=fs).num_rows == 200
@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from src.features.make_features import add_features, add_features_arrow, stream_features
+
+
+def raw_frame(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "feature1": rng.normal(size=n),
+        "feature2": rng.normal(size=n),
+        "target": rng.integers(0, 2, n),
+        "note": [f"row{i}" for i in range(n)]
+    })
+    df.loc[3, "feature1"] = np.nan
+    df.loc[4, "feature2"] = -1.0
+    return df
+
+
+def test_streaming_matches_in_memory(tmp_path):
+    pq.write_table(pa.Table.from_pandas(raw_frame(), preserve_index=False), tmp_path / "raw.parquet",
+                   row_group_size=700)
+    add_features(pd.read_parquet(tmp_path / "raw.parquet")).to_parquet(tmp_path / "memory.parquet")
+    paths = stream_features(str(tmp_path / "raw.parquet"), str(tmp_path / "out"), batch_size=256,
+                            row_group_size=1000, rows_per_file=2000, workers=3)
+    assert len(paths) == 3
+    # Parts end on input row-group boundaries (3 x 700 rows); output row groups are 1000 rows.
+    row_groups = [[pq.ParquetFile(p).metadata.row_group(i).num_rows
+                   for i in range(pq.ParquetFile(p).metadata.num_row_groups)] for p in paths]
+    assert row_groups == [[1000, 1000, 100], [1000, 1000, 100], [800]]
+    expected = pq.read_table(tmp_path / "memory.parquet")
+    actual = pq.read_table(tmp_path / "out")
+    assert actual.schema.remove_metadata() == expected.schema.remove_metadata()
+    for name in expected.column_names:
+        left, right = expected.column(name).combine_chunks(), actual.column(name).combine_chunks()
+        assert left.is_null().equals(right.is_null())
+        if pa.types.is_floating(left.type):
+            # Bitwise, so NaN and -0.0 count too.
+            assert left.to_numpy(zero_copy_only=False).tobytes() == right.to_numpy(zero_copy_only=False).tobytes()
+        else:
+            assert left.equals(right)
+
+
+def test_projection_and_rerun(tmp_path):
+    pq.write_table(pa.Table.from_pandas(raw_frame(100), preserve_index=False), tmp_path / "raw.parquet")
+    stream_features(str(tmp_path / "raw.parquet"), str(tmp_path / "out"), rows_per_file=10)
+    with pytest.raises(FileExistsError):
+        stream_features(str(tmp_path / "raw.parquet"), str(tmp_path / "out"))
+    paths = stream_features(str(tmp_path / "raw.parquet"), str(tmp_path / "out"),
+                            columns=["feature1", "feature2"], overwrite=True)
+    table = pq.read_table(tmp_path / "out")
+    assert len(paths) == 1 and table.num_rows == 100
+    assert table.column_names == ["feature1", "feature2", "feature3", "feature4"]
+
+
+def test_integer_inputs_use_true_division():
+    df = pd.DataFrame({"feature1": [1, 3, 5], "feature2": [1, 1, -1]})
+    batch = add_features_arrow(pa.RecordBatch.from_pandas(df, preserve_index=False))
+    expected = add_features(df.copy())
+    assert batch.column("feature3").to_pylist() == expected["feature3"].tolist()
+    assert batch.column("feature4").type == pa.float64()
+    assert batch.column("feature4").to_pylist() == expected["feature4"].tolist()
+
+
+def telco_frame(n=300, seed=1):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "gender": pd.array(rng.choice(["Female", "Male"], n), dtype=object),
+        "Contract": pd.array(rng.choice(["Month-to-month", "One year", "Two year"], n), dtype=object),
+        "tenure": rng.integers(0, 72, n),
+        "MonthlyCharges": rng.uniform(18, 120, n),
+        "Churn": pd.array(rng.choice(["Yes", "No"], n), dtype=object)
+    })
+    df.loc[5, "MonthlyCharges"] = np.nan
+    return df
+
+
+def legacy_telco_features(df):
+    # The per-call refit that TabularTransformer replaces, for the columns above.
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+    df = df.copy()
+    for col in ["gender", "Contract"]:
+        df[col] = LabelEncoder().fit_transform(df[col].astype(str))
+    df = df.fillna(df.median(numeric_only=True))
+    num_cols = ["gender", "Contract", "tenure", "MonthlyCharges"]
+    df[num_cols] = StandardScaler().fit_transform(df[num_cols])
+    return df
+
+
+def test_transformer_matches_refit_and_reuses_state(tmp_path):
+    from src.features.feature_engineering import TabularTransformer, telco_churn_features
+    df = telco_frame()
+    expected = legacy_telco_features(df)
+    actual = telco_churn_features(df)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+    transformer = TabularTransformer().fit(df)
+    transformer.save(str(tmp_path / "transformer.json"))
+    loaded = TabularTransformer.load(str(tmp_path / "transformer.json"))
+    new = telco_frame(20, seed=2)
+    pd.testing.assert_frame_equal(loaded.transform(new), transformer.transform(new))
+    assert loaded.transform(new)["Churn"].tolist() == new["Churn"].tolist()
+
+
+def test_transform_rows_matches_frame_and_buckets_unknowns():
+    from src.features.feature_engineering import TabularTransformer
+    transformer = TabularTransformer().fit(telco_frame())
+    rows = [
+        {"gender": "Male", "Contract": "One year", "tenure": 3, "MonthlyCharges": 50.5},
+        {"gender": "Other", "Contract": "Two year", "tenure": 70},
+    ]
+    X = transformer.transform_rows(rows)
+    frame = transformer.transform(pd.DataFrame(rows).astype({"gender": object, "Contract": object}))
+    np.testing.assert_array_equal(X, frame[transformer.feature_names].to_numpy())
+    unknown = (len(transformer.categories["gender"]) - transformer.mean[0]) / transformer.scale[0]
+    assert X[1, 0] == unknown
+    assert X[1, 3] == (transformer.medians[3] - transformer.mean[3]) / transformer.scale[3]
+
+
+def test_missing_categoricals_share_one_code():
+    from src.features.feature_engineering import TabularTransformer
+    df = telco_frame(50)
+    df.loc[0, "gender"] = None
+    transformer = TabularTransformer().fit(df)
+    assert transformer.categories["gender"] == ["Female", "Male", "nan"]
+    X = transformer.transform_rows([{"gender": None}, {"gender": float("nan")}, {}])
+    assert X[0, 0] == X[1, 0] == X[2, 0] == transformer.transform(df.iloc[:1])["gender"].iloc[0]
+
+
+def test_row_path_matches_frame_and_arrow_paths():
+    from src.features.definitions import DERIVED_FEATURES
+    values = [0.0, -0.0, 1.0, -1.0, 2.5, -2.0, 1e308, float("nan"), float("inf")]
+    rows = [{"feature1": a, "feature2": b} for a in values for b in values]
+    rows += [{"feature1": 3, "feature2": -1}, {"feature1": 7, "feature2": 2}]
+    frame = DERIVED_FEATURES.apply_frame(pd.DataFrame(rows[:-2]))
+    batch = DERIVED_FEATURES.apply_arrow(pa.RecordBatch.from_pylist(rows[:-2]))
+    ints = DERIVED_FEATURES.apply_frame(pd.DataFrame(rows[-2:]))
+    computed = DERIVED_FEATURES.apply_rows(rows)
+    for name in ("feature3", "feature4"):
+        row_values = np.array([row[name] for row in computed], dtype=np.float64)
+        expected = np.concatenate([frame[name].to_numpy(), ints[name].to_numpy(dtype=np.float64)])
+        assert row_values.tobytes() == expected.tobytes()
+        assert batch.column(name).to_numpy().tobytes() == frame[name].to_numpy().tobytes()
+
+
+def test_preprocess_request_adds_features_to_rows_only():
+    from src.features.definitions import FeatureError
+    from src.inference.preprocessor import preprocess_request
+    prompt = {"prompt": "hi"}
+    assert preprocess_request(prompt) is prompt
+    assert preprocess_request({"feature1": 2.0, "feature2": 3.0}) == {
+        "feature1": 2.0, "feature2": 3.0, "feature3": 6.0, "feature4": 0.5
+    }
+    batch = preprocess_request({"instances": [{"feature1": 1, "feature2": None}, {"x": 1}]})
+    assert batch["instances"] == [{"feature1": 1, "feature2": None, "feature3": None, "feature4": None}, {"x": 1}]
+    with pytest.raises(FeatureError):
+        preprocess_request({"feature1": "a", "feature2": 1})
+
+
+def test_server_scores_with_derived_features(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    from tests.test_startup import load_server
+    server = load_server(monkeypatch, tmp_path, warm_up=False)
+    async def apredict(payload):
+        return {"prediction": payload["feature3"], "provider": "local"}
+    with TestClient(server.app) as client:
+        client.post("/predict", json={"x": 1})
+        monkeypatch.setattr(server.adapter, "apredict", apredict)
+        assert client.post("/predict", json={"feature1": 2.0, "feature2": 4.0}).json()["prediction"] == 8.0
+        response = client.post("/predict", json={"feature1": "2", "feature2": 4.0})
+        assert response.status_code == 400 and "feature1" in response.json()["error"]
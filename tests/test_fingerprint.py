@@ -0,0 +1,115 @@
+import hashlib
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from src.utils.fingerprint import FingerprintIndex, LocalFilesystem, S3Filesystem, fingerprint
+
+
+class CountingFilesystem(LocalFilesystem):
+    def __init__(self):
+        self.bytes_read = 0
+    def open(self, path):
+        f = super().open(path)
+        read = f.read
+        def counted(n=-1):
+            data = read(n)
+            self.bytes_read += len(data)
+            return data
+        f.read = counted
+        return f
+    def read_range(self, path, start, length):
+        data = super().read_range(path, start, length)
+        self.bytes_read += len(data)
+        return data
+
+
+def write_parquet(path, n=200_000, seed=0):
+    rng = np.random.default_rng(seed)
+    table = pa.table({"feature1": rng.normal(size=n), "feature2": rng.normal(size=n)})
+    pq.write_table(table, path, row_group_size=50_000)
+
+
+def test_content_hash_streams_in_chunks(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_bytes(os.urandom(100_000))
+    fs = CountingFilesystem()
+    result = fingerprint(str(path), filesystem=fs, chunk_size=4096)
+    assert result.digest == f"sha256:{hashlib.sha256(path.read_bytes()).hexdigest()}"
+    assert fs.bytes_read == 100_000 and not result.cached
+
+
+def test_parquet_footer_only_confirms_files_already_indexed(tmp_path):
+    path = tmp_path / "data.parquet"
+    write_parquet(path)
+    index = FingerprintIndex(str(tmp_path / "index.json"))
+    first = fingerprint(str(path), index)
+    assert first.digest == f"sha256:{hashlib.sha256(path.read_bytes()).hexdigest()}"
+    fs = CountingFilesystem()
+    again = fingerprint(str(path), index, filesystem=fs)
+    assert again.cached and again.digest == first.digest
+    assert fs.bytes_read < os.path.getsize(path) / 100
+
+
+@pytest.mark.parametrize("compression, before, after", [
+    ("snappy", {"target": [0, 1] * 500}, {"target": [1, 0] * 500}),
+    ("none", {"x": [2.0] * 1000}, {"x": [2.0] * 999 + [2.5]}),
+])
+def test_files_with_identical_footers_get_different_digests(tmp_path, compression,
+                                                            before, after):
+    a, b = tmp_path / "a.parquet", tmp_path / "b.parquet"
+    pq.write_table(pa.table(before), a, compression=compression)
+    pq.write_table(pa.table(after), b, compression=compression)
+    index = FingerprintIndex(str(tmp_path / "index.json"))
+    assert fingerprint(str(a), index).digest != fingerprint(str(b), index).digest
+
+
+def test_index_skips_unchanged_files_and_notices_changes(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("a,b\n1,2\n")
+    index_path = str(tmp_path / "index" / "fingerprints.json")
+    first = fingerprint(str(path), FingerprintIndex(index_path))
+    fs = CountingFilesystem()
+    again = fingerprint(str(path), FingerprintIndex(index_path), filesystem=fs)
+    assert again.cached and again.digest == first.digest and fs.bytes_read == 0
+    path.write_text("a,b\n1,3\n")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1000))
+    changed = fingerprint(str(path), FingerprintIndex(index_path))
+    assert not changed.cached and changed.digest != first.digest
+
+
+def test_directory_manifest(tmp_path):
+    (tmp_path / "out" / "nested").mkdir(parents=True)
+    write_parquet(tmp_path / "out" / "part-00000.parquet", n=1000)
+    (tmp_path / "out" / "nested" / "notes.txt").write_text("hello")
+    index = FingerprintIndex(str(tmp_path / "index.json"))
+    result = fingerprint(str(tmp_path / "out"), index)
+    assert result.method == "manifest" and result.files == 2
+    assert len(index.entries) == 2
+    # Relative paths, so a copy of the directory has the same fingerprint.
+    os.rename(tmp_path / "out", tmp_path / "moved")
+    assert fingerprint(str(tmp_path / "moved")).digest == result.digest
+
+
+def test_s3_objects_are_identified_by_etag():
+    moto = pytest.importorskip("moto")
+    boto3 = pytest.importorskip("boto3")
+    mock = getattr(moto, "mock_aws", None) or moto.mock_s3
+    with mock():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="raw")
+        body = b"a,b\n1,2\n"
+        client.put_object(Bucket="raw", Key="snap/a.csv", Body=body)
+        client.put_object(Bucket="raw", Key="snap/b.csv", Body=b"a,b\n3,4\n")
+        fs = S3Filesystem(client)
+        single = fingerprint("s3://raw/snap/a.csv", filesystem=fs)
+        assert single.digest == "etag:" + hashlib.md5(body).hexdigest()
+        manifest = fingerprint("s3://raw/snap", filesystem=fs)
+        assert manifest.files == 2 and manifest.size == 16
+        full = fingerprint("s3://raw/snap/a.csv", method="sha256", filesystem=fs)
+        assert full.digest == "sha256:" + hashlib.sha256(body).hexdigest()
+        with pytest.raises(FileNotFoundError):
+            fingerprint("s3://raw/missing", filesystem=fs)
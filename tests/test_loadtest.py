@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from scripts.loadtest import find_knee, load_payloads, parse_mix, summarize
+
+
+def test_summary_percentiles_and_slo():
+    level = summarize(4, [float(v) for v in range(1, 1001)], errors=10, elapsed_s=2.0,
+                      threshold_ms=995, error_rate_threshold=0.02)
+    assert level['throughput_rps'] == 500.0
+    assert level['error_rate'] == pytest.approx(10 / 1010)
+    assert level['p50_ms'] == pytest.approx(500.5) and level['p99_ms'] == pytest.approx(990.01)
+    assert level['p999_ms'] > level['p99_ms'] and level['within_slo']
+    assert not summarize(4, [1.0], errors=1, elapsed_s=1.0, threshold_ms=995, error_rate_threshold=0.02)['within_slo']
+
+
+def test_knee_is_last_level_with_real_throughput_gain():
+    levels = [{'concurrency': c, 'throughput_rps': t} for c, t in ((1, 100), (2, 190), (4, 370), (8, 390), (16, 420))]
+    assert find_knee(levels)['concurrency'] == 4
+    assert find_knee([]) is None
+
+
+def test_mix_and_replay(tmp_path):
+    assert parse_mix('predict=0.9,batch=0.1') == {'predict': 0.9, 'batch': 0.1}
+    with pytest.raises(ValueError):
+        parse_mix('predict,stream')
+    replay = tmp_path / 'requests.jsonl'
+    replay.write_text('{"payload": {"a": 1}}\n\n{"b": 2}\n')
+    assert load_payloads(str(replay), [64]) == [{'a': 1}, {'b': 2}]
+    assert len(load_payloads(None, [10, 100])[1]['input']) == 100
+
+
+def test_end_to_end_against_local_server(tmp_path):
+    output = tmp_path / 'report.json'
+    subprocess.run(
+        [sys.executable, 'scripts/loadtest.py', '--provider', 'local', '--concurrency', '1', '4',
+         '--duration-s', '0.5', '--warmup-s', '0', '--mix', 'predict=0.8,batch=0.2', '--batch-rows', '8',
+         '--output', str(output)],
+        env=dict(os.environ, PYTHONPATH=os.getcwd()), check=True, capture_output=True, timeout=120
+    )
+    report = json.loads(output.read_text())
+    assert [level['concurrency'] for level in report['levels']] == [1, 4]
+    assert all(level['errors'] == 0 and level['requests'] > 0 for level in report['levels'])
+    assert report['latency_threshold_ms'] == 500 and report['knee'] is not None
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from src.inference.adapter import InferenceAdapter
+from src.inference.local_model import LocalModel, SignatureError
+from src.inference.metrics_sink import BufferedMetricsSink, InMemoryCloudWatch
+
+mlflow_sklearn = pytest.importorskip('mlflow.sklearn')
+from mlflow.models.signature import infer_signature  # noqa: E402
+
+
+def save_model(path, label):
+    X = pd.DataFrame({'feature1': np.arange(20, dtype=float), 'feature2': np.ones(20)})
+    y = np.full(20, label)
+    y[0] = 1 - label
+    model = RandomForestClassifier(n_estimators=3, random_state=0).fit(X, y)
+    mlflow_sklearn.save_model(
+        model, str(path), signature=infer_signature(X, model.predict(X)),
+        serialization_format=mlflow_sklearn.SERIALIZATION_FORMAT_CLOUDPICKLE, pip_requirements=['scikit-learn']
+    )
+
+
+def test_adapter_serves_local_model_in_process(tmp_path, monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'eu-central-1')
+    save_model(tmp_path / 'model', label=1)
+    config = {
+        'provider': 'local',
+        'local_model': {'enabled': True, 'model_uri': str(tmp_path / 'model')},
+        'cost': {'per_inference_limit_usd': 0.1}
+    }
+    adapter = InferenceAdapter(config, metrics_sink=BufferedMetricsSink(InMemoryCloudWatch(), flush_interval_s=3600))
+    assert adapter.predict({'feature1': 5.0, 'feature2': 1.0})['prediction'] == 1
+    batch = adapter.predict_batch([{'feature1': 5.0, 'feature2': 1.0}] * 3)
+    assert [r['prediction'] for r in batch] == [1, 1, 1]
+    with pytest.raises(SignatureError, match='feature2'):
+        adapter.predict({'feature1': 5.0})
+    adapter.close()
+
+
+def test_reload_swaps_model_without_failing_inflight_requests(tmp_path):
+    save_model(tmp_path / 'model', label=1)
+    local = LocalModel(str(tmp_path / 'model'))
+    local.start()
+    first_version = local.version
+    assert local.reload() is False
+    errors = []
+    stop = threading.Event()
+    def traffic():
+        while not stop.is_set():
+            try:
+                local.predict_rows([{'feature1': 5.0, 'feature2': 1.0}])
+            except Exception as e:
+                errors.append(e)
+    worker = threading.Thread(target=traffic)
+    worker.start()
+    time.sleep(0.01)
+    save_model(tmp_path / 'model_v2', label=0)
+    for name in os.listdir(tmp_path / 'model_v2'):
+        os.replace(tmp_path / 'model_v2' / name, tmp_path / 'model' / name)
+    os.utime(tmp_path / 'model' / 'MLmodel', (time.time() + 5, time.time() + 5))
+    assert local.reload() is True
+    stop.set()
+    worker.join()
+    assert errors == []
+    assert local.version != first_version
+    assert local.predict_rows([{'feature1': 5.0, 'feature2': 1.0}])[0] == [0]
+
+
+def test_compiled_backend_matches_pyfunc(tmp_path, monkeypatch):
+    import mlflow.sklearn
+    save_model(tmp_path / 'model', label=1)
+    monkeypatch.setattr(mlflow.sklearn, 'load_model', None)  # the pyfunc load is reused
+    rows = [{'feature1': float(i), 'feature2': 1.0} for i in range(20)]
+    plain = LocalModel(str(tmp_path / 'model'))
+    compiled = LocalModel(str(tmp_path / 'model'), compiled=True)
+    plain.start()
+    compiled.start()
+    assert compiled._current.compiled is not None
+    assert compiled.predict_rows(rows)[0] == plain.predict_rows(rows)[0]
+    with pytest.raises(SignatureError):
+        compiled.predict_rows([{'feature1': 'abc', 'feature2': 1.0}])
+
+
+def test_feature_transformer_saved_with_model_is_applied(tmp_path):
+    from src.features.feature_engineering import TRANSFORMER_FILE, TabularTransformer
+    raw = pd.DataFrame({
+        'plan': pd.array(['basic', 'pro'] * 10, dtype=object),
+        'tenure': np.arange(20, dtype=float)
+    })
+    y = (raw['plan'] == 'pro').astype(int)
+    transformer = TabularTransformer().fit(raw)
+    X = transformer.transform(raw)
+    model = RandomForestClassifier(n_estimators=3, random_state=0).fit(X, y)
+    mlflow_sklearn.save_model(
+        model, str(tmp_path / 'model'), signature=infer_signature(X, model.predict(X)),
+        serialization_format=mlflow_sklearn.SERIALIZATION_FORMAT_CLOUDPICKLE, pip_requirements=['scikit-learn']
+    )
+    transformer.save(str(tmp_path / 'model' / TRANSFORMER_FILE))
+    rows = [{'plan': 'pro', 'tenure': 3.0}, {'plan': 'basic', 'tenure': None}, {'plan': 'new', 'tenure': 1.0}]
+    expected = model.predict(transformer.transform(pd.DataFrame(rows).astype({'plan': object}))).tolist()
+    for compiled in (False, True):
+        local = LocalModel(str(tmp_path / 'model'), compiled=compiled)
+        local.start()
+        assert local._current.transformer is not None
+        assert local.predict_rows(rows)[0] == expected
+    with pytest.raises(SignatureError):
+        local.predict_rows([{'plan': 'pro', 'tenure': 'long'}])
+
+
+
+def test_registry_stage_falls_back_from_alias(monkeypatch):
+    from mlflow.exceptions import MlflowException
+    calls = []
+    class Client:
+        def __init__(self, tracking_uri=None):
+            pass
+        def get_model_version_by_alias(self, name, alias):
+            calls.append(('alias', name, alias))
+            if alias == 'champion':
+                return SimpleNamespace(version='7')
+            raise MlflowException(f"Registered model alias {alias} not found.")
+        def get_latest_versions(self, name, stages):
+            calls.append(('stage', name, stages))
+            return [SimpleNamespace(version=4)] if stages == ['Production'] else []
+    monkeypatch.setattr('mlflow.tracking.MlflowClient', Client)
+    assert LocalModel('models:/heart/champion')._resolve_version() == '7'
+    assert LocalModel('models:/heart/production')._resolve_version() == '4'
+    assert calls[-1] == ('stage', 'heart', ['Production'])
+    with pytest.raises(RuntimeError, match='stage Staging'):
+        LocalModel('models:/heart/Staging')._resolve_version()
+    with pytest.raises(MlflowException):
+        LocalModel('models:/heart/typo')._resolve_version()
@@ -0,0 +1,73 @@
+import time
+from src.inference.adapter import InferenceAdapter
+from src.inference.metrics_sink import BufferedMetricsSink, InMemoryCloudWatch, MAX_VALUES_PER_DATUM
+
+
+def make_sink(**kwargs):
+    client = InMemoryCloudWatch()
+    kwargs.setdefault('flush_interval_s', 3600)
+    return client, BufferedMetricsSink(client, **kwargs)
+
+
+def test_flush_aggregates_into_values_and_counts():
+    client, sink = make_sink()
+    for value in [10.0, 10.0, 20.0]:
+        sink.put('Latency', value, unit='Milliseconds', dimensions={'Provider': 'local'})
+    assert client.requests == []
+    assert sink.flush() == 3
+    [datum] = client.datums('Latency')
+    assert dict(zip(datum['Values'], datum['Counts'])) == {10.0: 2.0, 20.0: 1.0}
+    assert datum['Dimensions'] == [{'Name': 'Provider', 'Value': 'local'}]
+    sink.close()
+
+
+def test_many_distinct_values_become_statistic_set():
+    client, sink = make_sink()
+    for value in range(MAX_VALUES_PER_DATUM + 1):
+        sink.put('Latency', value)
+    sink.close()
+    [datum] = client.datums('Latency')
+    assert datum['StatisticValues'] == {
+        'SampleCount': MAX_VALUES_PER_DATUM + 1.0,
+        'Sum': float(sum(range(MAX_VALUES_PER_DATUM + 1))),
+        'Minimum': 0.0,
+        'Maximum': float(MAX_VALUES_PER_DATUM)
+    }
+
+
+def test_bounded_queue_drops_oldest():
+    client, sink = make_sink(max_queue_size=3, max_batch_size=100)
+    for value in [1, 2, 3, 4, 5]:
+        sink.put('Cost', value)
+    sink.close()
+    [datum] = client.datums('Cost')
+    assert sorted(datum['Values']) == [3.0, 4.0, 5.0]
+    assert client.datums('MetricsDropped')[0]['Values'] == [2.0]
+    assert sink.dropped == 2
+
+
+def test_batch_size_triggers_background_flush():
+    client, sink = make_sink(max_batch_size=2)
+    sink.put('Cost', 1)
+    sink.put('Cost', 2)
+    deadline = time.time() + 2
+    while not client.datums('Cost') and time.time() < deadline:
+        time.sleep(0.01)
+    assert client.datums('Cost')
+    sink.close()
+
+
+def test_adapter_logs_metrics_without_cloudwatch_round_trip(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'eu-central-1')
+    client, sink = make_sink()
+    config = {'provider': 'local', 'model_id': 'm1', 'cost': {'per_inference_limit_usd': 0.1}}
+    adapter = InferenceAdapter(config, metrics_sink=sink)
+    adapter.cloudwatch = None
+    adapter.predict({'input': 'x'})
+    assert client.requests == []
+    adapter.close()
+    assert client.datums('Latency')[0]['Dimensions'] == [
+        {'Name': 'Provider', 'Value': 'local'},
+        {'Name': 'ModelId', 'Value': 'm1'}
+    ]
+    assert client.datums('Cost')[0]['Values'] == [0.0]
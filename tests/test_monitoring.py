@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+import textwrap
+from prometheus_client import REGISTRY
+from src.utils.monitoring import RequestTimer, log_error
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_request_timer_labels_every_stage():
+    before = sample('inference_stage_latency_ms_count', stage='parse', provider='p', model_version='7')
+    timer = RequestTimer()
+    for stage in ('parse', 'preprocess', 'provider', 'postprocess'):
+        with timer.stage(stage):
+            pass
+    timer.observe('p', '7')
+    assert sample('inference_stage_latency_ms_count', stage='parse', provider='p', model_version='7') == before + 1
+    assert sample('inference_stage_latency_ms_bucket', stage='provider', provider='p', model_version='7', le='500.0') >= 1
+    assert sample('inference_request_latency_ms_count', provider='p', model_version='7') >= 1
+
+
+def test_errors_are_counted_by_type():
+    before = sample('inference_errors_total', endpoint='/x', error_type='KeyError')
+    log_error('/x', KeyError('k'))
+    assert sample('inference_errors_total', endpoint='/x', error_type='KeyError') == before + 1
+
+
+def test_server_instruments_predict(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    from tests.test_startup import load_server
+    server = load_server(monkeypatch, tmp_path, warm_up=False)
+    with TestClient(server.app) as client:
+        assert client.post('/predict', json={'x': 1}).status_code == 200
+        bad = client.post('/predict', content=b'{not json', headers={'Content-Type': 'application/json'})
+        assert bad.status_code == 400
+        text = client.get('/metrics').text
+    version = str(server.config['model']['version'])
+    assert f'inference_stage_latency_ms_count{{model_version="{version}",provider="local",stage="provider"}}' in text
+    assert sample('inference_errors_total', endpoint='/predict', error_type='JSONDecodeError') >= 1
+    assert sample('inference_request_size_bytes_count', endpoint='/predict') >= 2
+    assert sample('inference_in_flight_requests', endpoint='/predict') == 0
+
+
+def test_multiprocess_metrics_are_aggregated(tmp_path):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path), PYTHONPATH=os.getcwd())
+    worker = textwrap.dedent("""
+        from src.utils.monitoring import RequestTimer, log_error
+        timer = RequestTimer()
+        with timer.stage('provider'):
+            pass
+        timer.observe('sagemaker', '3')
+        log_error('/predict', ValueError())
+    """)
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', worker], env=env, check=True)
+    render = "from src.utils.monitoring import render_metrics; print(render_metrics()[0].decode())"
+    text = subprocess.run([sys.executable, '-c', render], env=env, check=True, capture_output=True, text=True).stdout
+    assert 'inference_errors_total{endpoint="/predict",error_type="ValueError"} 2.0' in text
+    assert 'inference_request_latency_ms_count{model_version="3",provider="sagemaker"} 2.0' in text
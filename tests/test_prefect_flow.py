@@ -0,0 +1,56 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+pytest.importorskip("prefect")
+mlflow = pytest.importorskip("mlflow")
+from prefect.testing.utilities import prefect_test_harness
+
+from src.pipelines.prefect import flows
+
+
+@pytest.fixture(scope="module", autouse=True)
+def prefect_server():
+    with prefect_test_harness():
+        yield
+
+
+def write_raw(path, seed=0, n=200):
+    rng = np.random.default_rng(seed)
+    pq.write_table(pa.table({
+        "feature1": rng.normal(size=n),
+        "feature2": rng.normal(size=n),
+        "target": rng.integers(0, 2, size=n),
+    }), path)
+
+
+def runs(config):
+    mlflow.set_tracking_uri(config["mlflow"]["tracking_uri"])
+    return len(mlflow.search_runs(experiment_names=[config["mlflow"]["experiment_name"]]))
+
+
+def test_training_flow_passes_references_and_reuses_results(tmp_path):
+    raw, features = tmp_path / "data.parquet", tmp_path / "features.parquet"
+    write_raw(raw)
+    config = {
+        "s3": {"raw_bucket": "unused", "features_bucket": "unused"},
+        "features": {"streaming": False},
+        "mlflow": {"tracking_uri": f"file://{tmp_path}/mlruns", "experiment_name": "flow"},
+        "fingerprint": {"index_path": str(tmp_path / "fingerprints.json")},
+    }
+    pipeline = flows.train_pipeline.with_options(
+        result_storage=flows.LocalFileSystem(basepath=str(tmp_path / "results"))
+    )
+    before = raw.read_bytes()
+    run_id = pipeline(config, str(raw), str(features))
+    assert raw.read_bytes() == before
+    assert pq.read_schema(features).names == ["feature1", "feature2", "target",
+                                              "feature3", "feature4"]
+    # Nothing changed: every data task is a cache hit and training is not repeated.
+    assert pipeline(config, str(raw), str(features)) == run_id
+    assert runs(config) == 1
+    # New raw data invalidates the features and the model.
+    write_raw(raw, seed=1)
+    assert pipeline(config, str(raw), str(features)) != run_id
+    assert runs(config) == 2
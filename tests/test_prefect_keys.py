@@ -0,0 +1,48 @@
+import ast
+from pathlib import Path
+from types import SimpleNamespace
+
+from src.pipelines.prefect.keys import cache_key
+from src.utils.fingerprint import Fingerprint
+
+FLOWS = Path("src/pipelines/prefect/flows.py")
+
+
+def context(task_key="engineer_features"):
+    return SimpleNamespace(task=SimpleNamespace(task_key=task_key))
+
+
+def test_key_covers_code_arguments_and_config(tmp_path):
+    code = tmp_path / "pkg"
+    code.mkdir()
+    (code / "mod.py").write_text("x = 1")
+    config = {"features": {"streaming": False},
+              "fingerprint": {"index_path": str(tmp_path / "index.json")}}
+    key = cache_key([str(code)], ["features"])
+    ref = Fingerprint("s3://raw/data.parquet", "etag:1", 100)
+    params = {"ref": ref, "config": config, "output_path": "s3://f/features_20240101.parquet"}
+    first = key(context(), params)
+    assert key(context(), dict(params)) == first
+    # A new day's output path is a new key, not yesterday's cache entry.
+    assert key(context(), {**params, "output_path": "s3://f/features_20240102.parquet"}) != first
+    assert key(context(), {**params, "ref": Fingerprint(ref.uri, "etag:2", 100)}) != first
+    assert key(context(), {**params, "config": {**config, "features": {"streaming": True}}}) != first
+    (code / "__pycache__").mkdir()
+    (code / "__pycache__" / "mod.cpython-311.pyc").write_bytes(b"bytecode")
+    assert key(context(), params) == first
+    (code / "mod.py").write_text("x = 2")
+    assert key(context(), params) != first
+
+
+def test_cached_tasks_declare_shared_code_and_a_required_output_path():
+    tasks = {}
+    for node in ast.parse(FLOWS.read_text()).body:
+        for decorator in getattr(node, "decorator_list", []):
+            for keyword in getattr(decorator, "keywords", []):
+                if keyword.arg == "cache_key_fn":
+                    tasks[node.name] = (node, ast.literal_eval(keyword.value.args[0]))
+    assert set(tasks) == {"validate_schema", "engineer_features", "train_model"}
+    for name, (_, code) in tasks.items():
+        assert "src/utils" in code, name
+    features = tasks["engineer_features"][0].args
+    assert [a.arg for a in features.args][-1] == "output_path" and not features.defaults
@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import time
+import pytest
+from src.inference.adapter import InferenceAdapter
+from src.inference.metrics_sink import BufferedMetricsSink, InMemoryCloudWatch
+from src.inference.routing import ProviderRouter, ProviderStats
+
+
+def sleeper(name, delay_s, fail=False):
+    def invoke(payload):
+        time.sleep(delay_s)
+        if fail:
+            raise RuntimeError(f"{name} unavailable")
+        return {'prediction': name, 'provider': name}
+    return invoke
+
+
+def async_sleeper(name, delay_s, fail=False):
+    async def invoke(payload):
+        await asyncio.sleep(delay_s)
+        if fail:
+            raise RuntimeError(f"{name} unavailable")
+        return {'prediction': name, 'provider': name}
+    return invoke
+
+
+def test_stats_track_percentiles_and_error_rate():
+    stats = ProviderStats(window=100, error_decay=0.5)
+    for latency in range(1, 101):
+        stats.record(float(latency), ok=True)
+    assert stats.percentile(50) == pytest.approx(50.5)
+    stats.record(1.0, ok=False)
+    assert stats.error_rate == 0.5 and stats.count == 100
+
+
+def test_rank_prefers_fast_healthy_provider():
+    router = ProviderRouter({'a': sleeper('a', 0), 'b': sleeper('b', 0)}, error_penalty_ms=1000)
+    assert router.rank() == ['a', 'b']
+    for _ in range(10):
+        router.stats['a'].record(50.0, ok=True)
+        router.stats['b'].record(10.0, ok=True)
+    assert router.rank() == ['b', 'a']
+    for _ in range(10):
+        router.stats['b'].record(10.0, ok=False)
+    assert router.rank() == ['a', 'b']
+    router.close()
+
+
+def test_provider_without_samples_scores_neutral():
+    router = ProviderRouter({'a': sleeper('a', 0), 'b': sleeper('b', 0), 'c': sleeper('c', 0)})
+    for _ in range(10):
+        router.stats['b'].record(50.0, ok=True)
+        router.stats['c'].record(10.0, ok=True)
+    # 'a' has no data: ranked at the mean (30 ms), not ahead of a proven fast provider.
+    assert router.rank() == ['c', 'a', 'b']
+    router.close()
+
+
+def test_slow_primary_is_hedged():
+    router = ProviderRouter({'slow': sleeper('slow', 0.5), 'fast': sleeper('fast', 0.01)}, default_hedge_ms=20)
+    start = time.perf_counter()
+    result = router.route({})
+    assert result.provider == 'fast' and result.hedged
+    assert time.perf_counter() - start < 0.3
+    router.close()
+
+
+def test_losing_attempts_are_reported():
+    discarded = []
+    done = threading.Event()
+    def on_discard(name, response):
+        discarded.append((name, response))
+        done.set()
+    def make_router():
+        return ProviderRouter({'slow': sleeper('slow', 0.1), 'fast': sleeper('fast', 0)},
+                              {'slow': async_sleeper('slow', 1.0), 'fast': async_sleeper('fast', 0)},
+                              default_hedge_ms=20, on_discard=on_discard)
+    router = make_router()
+    assert router.route({}).provider == 'fast'
+    assert done.wait(1) and discarded == [('slow', {'prediction': 'slow', 'provider': 'slow'})]
+    router.close()
+    discarded.clear()
+    router = make_router()
+    async def aroute():
+        result = await router.aroute({})
+        await asyncio.sleep(0.01)  # Let the cancelled loser finish.
+        return result
+    assert asyncio.run(aroute()).provider == 'fast'
+    assert discarded == [('slow', None)]
+    router.close()
+
+
+def test_hedge_delay_follows_observed_percentile():
+    router = ProviderRouter({'a': sleeper('a', 0)}, min_samples=5, default_hedge_ms=250)
+    assert router.hedge_delay_s('a') == 0.25
+    for latency in (10.0, 10.0, 10.0, 10.0, 30.0):
+        router.stats['a'].record(latency, ok=True)
+    assert router.hedge_delay_s('a') == pytest.approx(0.026)
+    router.close()
+
+
+def test_failed_primary_falls_back_without_waiting():
+    router = ProviderRouter({'down': sleeper('down', 0, fail=True), 'up': sleeper('up', 0)}, default_hedge_ms=1000)
+    start = time.perf_counter()
+    result = router.route({})
+    assert result.provider == 'up' and not result.hedged
+    assert time.perf_counter() - start < 0.5
+    assert router.stats['down'].error_rate > 0
+    router.close()
+
+
+def test_all_providers_failing_raises_last_error():
+    router = ProviderRouter({'a': sleeper('a', 0, fail=True), 'b': sleeper('b', 0, fail=True)})
+    with pytest.raises(RuntimeError, match='b unavailable'):
+        router.route({})
+    router.close()
+
+
+def test_async_route_hedges_and_cancels_loser():
+    router = ProviderRouter(
+        {'slow': sleeper('slow', 0), 'fast': sleeper('fast', 0)},
+        {'slow': async_sleeper('slow', 1.0), 'fast': async_sleeper('fast', 0.01)},
+        default_hedge_ms=20
+    )
+    start = time.perf_counter()
+    result = asyncio.run(router.aroute({}))
+    assert result.provider == 'fast' and result.hedged
+    assert time.perf_counter() - start < 0.5
+    # The cancelled attempt still contributes a (lower-bound) latency sample.
+    assert router.stats['slow'].count == 1
+    router.close()
+
+
+def test_adapter_attributes_metrics_to_serving_provider(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'eu-central-1')
+    client = InMemoryCloudWatch()
+    config = {
+        'provider': 'sagemaker',
+        'sagemaker': {'endpoint_name': 'ep'},
+        'routing': {'enabled': True, 'providers': ['sagemaker', 'bedrock', 'local'], 'default_hedge_ms': 20},
+        'cost': {'per_inference_limit_usd': 0.1}
+    }
+    adapter = InferenceAdapter(config, metrics_sink=BufferedMetricsSink(client, flush_interval_s=3600))
+    # No local model is loaded, so its placeholder is not a routing candidate.
+    assert adapter.router.order == ['sagemaker', 'bedrock']
+    monkeypatch.setattr(adapter, '_sagemaker_invoke', sleeper('sagemaker', 0.3))
+    monkeypatch.setattr(adapter, '_bedrock_invoke', sleeper('bedrock', 0))
+    response = adapter.predict({'x': 1})
+    time.sleep(0.5)
+    adapter.close()
+    assert response['provider'] == 'bedrock'
+    latency = client.datums('Latency')
+    assert [d['Dimensions'] for d in latency] == [[{'Name': 'Provider', 'Value': 'bedrock'}, {'Name': 'ModelId', 'Value': 'unknown'}]]
+    assert client.datums('HedgedRequests')[0]['Dimensions'] == [{'Name': 'Provider', 'Value': 'bedrock'}]
+    # The losing SageMaker call is still billed.
+    assert adapter.cost_tracker.totals()[('sagemaker', 'unknown')] == (0.001, 1)
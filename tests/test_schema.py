@@ -1,5 +1,8 @@
 import pandas as pd
-from src.validation.validators import validate
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from src.validation.validators import SchemaValidationError, validate, validate_parquet
 
 def test_schema_pass():
     df = pd.DataFrame({
@@ -8,3 +11,53 @@ def test_schema_pass():
         "target": [1]
     })
     validate(df)
+
+
+def test_schema_reports_every_violation():
+    df = pd.DataFrame({
+        "feature1": [1.0, float("nan"), 3.0],
+        "feature2": ["a", "b", "c"],
+        "target": [0, 1, 2]
+    })
+    with pytest.raises(SchemaValidationError) as excinfo:
+        validate(df)
+    violations = excinfo.value.report.violations
+    assert set(violations) == {("feature1", "null"), ("feature2", "dtype"), ("target", "allowed")}
+    assert violations[("feature1", "null")].sample_rows == [1]
+    assert violations[("target", "allowed")].sample_values == [2]
+
+
+def test_schema_ranges_and_missing_columns():
+    schema = {"x": {"dtype": "float", "min": 0, "max": 1}, "y": {"dtype": "int"}}
+    report = validate(pd.DataFrame({"x": [-1.0, 0.5, 2.0, None]}), schema, raise_on_error=False)
+    assert not report.passed
+    assert report.violations[("x", "range")].count == 2
+    assert report.violations[("x", "range")].sample_rows == [0, 2]
+    assert ("y", "missing_column") in report.violations
+
+
+def test_mixed_type_column_is_a_dtype_violation():
+    df = pd.DataFrame({"feature1": [1.0, "a"], "feature2": [2.0, 3.0], "target": [0, 1]})
+    report = validate(df, raise_on_error=False)
+    assert set(report.violations) == {("feature1", "dtype")}
+    assert "expected float" in report.violations[("feature1", "dtype")].detail
+    assert report.rows == 2
+    with pytest.raises(SchemaValidationError):
+        validate(df)
+    only = validate(df[["feature1"]], {"feature1": {"dtype": "float"}}, raise_on_error=False)
+    assert set(only.violations) == {("feature1", "dtype")} and only.rows == 2
+
+
+def test_parquet_is_validated_by_row_group(tmp_path):
+    df = pd.DataFrame({
+        "feature1": [float(i) for i in range(100)],
+        "feature2": [1.0] * 100,
+        "target": [i % 2 for i in range(100)]
+    })
+    df.loc[75, "target"] = 5
+    path = tmp_path / "data.parquet"
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, row_group_size=10)
+    report = validate_parquet(str(path), raise_on_error=False)
+    assert report.rows == 100
+    assert report.violations[("target", "allowed")].sample_rows == [75]
+    assert report.to_dict()["passed"] is False
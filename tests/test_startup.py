@@ -0,0 +1,96 @@
+import importlib
+import sys
+import time
+import pytest
+import yaml
+from src.utils.config import config_path, load_config
+
+
+def test_config_is_chosen_by_environment(monkeypatch):
+    monkeypatch.delenv('ML_CONFIG', raising=False)
+    monkeypatch.delenv('ML_ENV', raising=False)
+    assert config_path() == 'configs/dev.yaml'
+    monkeypatch.setenv('ML_ENV', 'prod')
+    assert config_path() == 'configs/prod.yaml'
+    assert load_config()['aws']['account_id'] == 333333333333
+    monkeypatch.setenv('ML_CONFIG', '/etc/ml/custom.yaml')
+    assert config_path() == '/etc/ml/custom.yaml'
+    monkeypatch.setenv('ML_ENV', 'qa')
+    monkeypatch.delenv('ML_CONFIG')
+    with pytest.raises(ValueError, match='qa'):
+        config_path()
+
+
+def load_server(monkeypatch, tmp_path, warm_up):
+    config = load_config('dev')
+    config['provider'] = 'local'
+    config['startup'] = {'warm_up': warm_up, 'retry_interval_s': 0.01}
+    path = tmp_path / 'config.yaml'
+    path.write_text(yaml.safe_dump(config))
+    monkeypatch.setenv('ML_CONFIG', str(path))
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'eu-central-1')
+    sys.modules.pop('src.inference.server', None)
+    return importlib.import_module('src.inference.server')
+
+
+def test_import_does_not_build_clients(monkeypatch, tmp_path):
+    sys.modules.pop('src.inference.adapter', None)
+    server = load_server(monkeypatch, tmp_path, warm_up=True)
+    assert server.adapter is None
+    assert 'src.inference.adapter' not in sys.modules
+
+
+def test_readiness_follows_background_warm_up(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    server = load_server(monkeypatch, tmp_path, warm_up=True)
+    assert TestClient(server.app).get('/ready').json() == {'status': 'starting'}
+    with TestClient(server.app) as client:
+        assert client.get('/health').status_code == 200
+        for _ in range(100):
+            if client.get('/ready').status_code == 200:
+                break
+            time.sleep(0.05)
+        assert client.get('/ready').json()['status'] == 'ready'
+    # Clients for providers the config does not use are never created.
+    assert server.adapter.sagemaker._client is None and server.adapter.bedrock._client is None
+
+
+def test_lazy_mode_builds_adapter_on_first_request(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    server = load_server(monkeypatch, tmp_path, warm_up=False)
+    with TestClient(server.app) as client:
+        assert client.get('/ready').status_code == 503
+        assert client.post('/predict', json={'x': 1}).json()['prediction'] == 'mock_prediction'
+        assert client.get('/ready').status_code == 200
+
+
+def wait_ready(client):
+    for _ in range(100):
+        if client.get('/ready').status_code == 200:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_readiness_probe_builds_adapter_in_lazy_mode(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    server = load_server(monkeypatch, tmp_path, warm_up=False)
+    with TestClient(server.app) as client:
+        assert client.get('/ready').json() == {'status': 'starting'}
+        assert wait_ready(client)
+
+
+def test_failed_warm_up_is_retried(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    server = load_server(monkeypatch, tmp_path, warm_up=True)
+    build = server._build_adapter
+    attempts = []
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError('model store unavailable')
+        return build()
+    monkeypatch.setattr(server, '_build_adapter', flaky)
+    with TestClient(server.app) as client:
+        assert wait_ready(client)
+    assert len(attempts) == 2 and server.startup_error is None
@@ -0,0 +1,129 @@
+import base64
+import json
+import struct
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src.inference.adapter import InferenceAdapter
+from src.inference.budget import BudgetExceededError
+from src.inference.metrics_sink import BufferedMetricsSink, InMemoryCloudWatch
+
+CHUNKS = [
+    {'completion': 'Hello', 'stop_reason': None},
+    {'completion': ' world', 'stop_reason': None},
+    {'completion': '!', 'stop_reason': 'stop_sequence',
+     'amazon-bedrock-invocationMetrics': {'inputTokenCount': 5, 'outputTokenCount': 4}}
+]
+
+
+def event_message(chunk):
+    """One AWS event-stream message carrying a Bedrock ``chunk`` event."""
+    payload = json.dumps({'bytes': base64.b64encode(json.dumps(chunk).encode()).decode()}).encode()
+    headers = b''
+    for name, value in ((':event-type', 'chunk'), (':content-type', 'application/json'), (':message-type', 'event')):
+        headers += bytes([len(name)]) + name.encode() + b'\x07' + struct.pack('>H', len(value)) + value.encode()
+    prelude = struct.pack('>II', 16 + len(headers) + len(payload), len(headers))
+    message = prelude + struct.pack('>I', zlib.crc32(prelude)) + headers + payload
+    return message + struct.pack('>I', zlib.crc32(message))
+
+
+@pytest.fixture
+def fake_bedrock():
+    """Local Bedrock runtime that answers invoke-with-response-stream with a real event stream."""
+    requests = []
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            requests.append((self.path, json.loads(self.rfile.read(int(self.headers['Content-Length'])))))
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/vnd.amazon.eventstream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in CHUNKS:
+                message = event_message(chunk)
+                self.wfile.write(f"{len(message):x}\r\n".encode() + message + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        def log_message(self, *args):
+            pass
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", requests
+    server.shutdown()
+
+
+def make_adapter(monkeypatch, endpoint_url, client, **cost):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'test')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'test')
+    config = {
+        'provider': 'bedrock',
+        'aws': {'region': 'eu-central-1'},
+        'bedrock': {'model_id': 'anthropic.claude-v2', 'max_tokens': 16, 'runtime_endpoint_url': endpoint_url},
+        'model': {'version': '1'},
+        'cost': {'per_inference_limit_usd': 0.1, **cost}
+    }
+    return InferenceAdapter(config, metrics_sink=BufferedMetricsSink(client, flush_interval_s=3600))
+
+
+def test_stream_yields_tokens_with_running_cost(monkeypatch, fake_bedrock):
+    url, requests = fake_bedrock
+    client = InMemoryCloudWatch()
+    adapter = make_adapter(monkeypatch, url, client)
+    events = list(adapter.predict_stream({'prompt': 'hi'}))
+    adapter.close()
+    assert requests[0][0] == '/model/anthropic.claude-v2/invoke-with-response-stream'
+    assert [e['text'] for e in events if e['type'] == 'token'] == ['Hello', ' world', '!']
+    assert [e['token_count'] for e in events[:-1]] == [1, 2, 4]
+    assert events[1]['cost_usd'] == pytest.approx(2 * 0.00002)
+    done = events[-1]
+    assert done['type'] == 'done' and done['prediction'] == 'Hello world!'
+    assert done['token_count'] == 4 and done['stop_reason'] == 'stop_sequence'
+    assert done['ttft_ms'] is not None
+    cost = client.datums('Cost')[0]
+    assert sum(v * c for v, c in zip(cost['Values'], cost['Counts'])) == pytest.approx(4 * 0.00002)
+    assert client.datums('TimeToFirstToken')[0]['Dimensions'][0] == {'Name': 'Provider', 'Value': 'bedrock'}
+
+
+def test_disconnect_still_records_cost(monkeypatch, fake_bedrock):
+    client = InMemoryCloudWatch()
+    adapter = make_adapter(monkeypatch, fake_bedrock[0], client)
+    stream = adapter.predict_stream({'prompt': 'hi'})
+    assert next(stream)['text'] == 'Hello'
+    stream.close()
+    adapter.close()
+    cost = client.datums('Cost')[0]
+    assert sum(v * c for v, c in zip(cost['Values'], cost['Counts'])) == pytest.approx(0.00002)
+
+
+def test_budget_policy_applies_before_streaming(monkeypatch, fake_bedrock):
+    url, requests = fake_bedrock
+    adapter = make_adapter(monkeypatch, url, InMemoryCloudWatch(), policy='route_cheaper',
+                           cheaper_provider='local', rollup_interval_s=0)
+    adapter.cost_tracker.state = 'route_cheaper'
+    assert list(adapter.predict_stream({'prompt': 'hi'})) == [
+        {'type': 'done', 'prediction': 'mock_prediction', 'provider': 'local'}
+    ]
+    adapter.cost_tracker.state = 'shed'
+    adapter.cost_tracker.monthly_budget_usd = 1.0
+    with pytest.raises(BudgetExceededError):
+        adapter.predict_stream({'prompt': 'hi'})
+    adapter.close()
+    assert requests == []
+
+
+def test_server_streams_server_sent_events(monkeypatch, tmp_path, fake_bedrock):
+    from fastapi.testclient import TestClient
+    from tests.test_startup import load_server
+    server = load_server(monkeypatch, tmp_path, warm_up=False)
+    server.adapter = make_adapter(monkeypatch, fake_bedrock[0], InMemoryCloudWatch())
+    with TestClient(server.app) as client:
+        sse = client.post('/predict/stream', json={'prompt': 'hi'})
+        assert sse.headers['content-type'].startswith('text/event-stream')
+        frames = [f for f in sse.text.split('\n\n') if f]
+        assert frames[0].startswith('event: token\ndata: ')
+        assert json.loads(frames[-1].split('data: ', 1)[1])['prediction'] == 'Hello world!'
+        ndjson = client.post('/predict/stream', json={'prompt': 'hi'}, headers={'Accept': 'application/x-ndjson'})
+        lines = [json.loads(line) for line in ndjson.text.splitlines()]
+        assert [line['type'] for line in lines] == ['token', 'token', 'token', 'done']
+        server.adapter.cost_tracker.monthly_budget_usd = 1.0
+        server.adapter.cost_tracker.state = 'shed'
+        assert client.post('/predict/stream', json={'prompt': 'hi'}).status_code == 503
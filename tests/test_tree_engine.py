@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+from src.inference.tree_engine import CompiledForest, compile_model
+
+X, y = make_classification(n_samples=600, n_features=8, random_state=0)
+
+
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+def test_random_forest_matches_sklearn(dtype):
+    model = RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0).fit(X, y)
+    forest = compile_model(model, dtype=dtype)
+    np.testing.assert_allclose(forest.predict_proba(X), model.predict_proba(X), atol=1e-6)
+    np.testing.assert_array_equal(forest.predict(X), model.predict(X))
+    assert forest.leaves(X[:5]).shape == (5, 20)
+
+
+@pytest.mark.parametrize('n_classes', [2, 3])
+def test_xgboost_matches_predict_proba(n_classes):
+    xgb = pytest.importorskip('xgboost')
+    labels = y if n_classes == 2 else np.arange(len(y)) % 3
+    X_missing = X.copy()
+    X_missing[::5, 2] = np.nan
+    model = xgb.XGBClassifier(n_estimators=15, max_depth=4).fit(X_missing, labels)
+    forest = compile_model(model, dtype=np.float32)
+    np.testing.assert_allclose(forest.predict_proba(X_missing), model.predict_proba(X_missing), atol=1e-5)
+    np.testing.assert_array_equal(forest.predict(X_missing), model.predict(X_missing))
+
+
+def test_save_and_load_round_trip(tmp_path):
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+    forest = compile_model(model)
+    forest.save(str(tmp_path / 'forest.npz'))
+    loaded = CompiledForest.load(str(tmp_path / 'forest.npz'))
+    np.testing.assert_array_equal(loaded.predict_proba(X), forest.predict_proba(X))
+
+
+def test_rejects_wrong_feature_count():
+    forest = compile_model(RandomForestClassifier(n_estimators=2, random_state=0).fit(X, y))
+    with pytest.raises(ValueError, match='Expected 8 features'):
+        forest.predict(X[:, :3])
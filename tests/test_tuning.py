@@ -0,0 +1,137 @@
+import pickle
+import time
+
+import numpy as np
+import optuna
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import check_cv, cross_val_score
+
+from src.train.tuning import (_grow, build_model, cross_validate, resource_rungs, tune,
+                              tuning_options)
+from src.train.tuning_data import TuningData
+
+
+def classification_frame(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n, 4)), columns=[f"f{i}" for i in range(4)])
+    y = pd.Series((X["f0"] + 0.5 * X["f1"] + rng.normal(scale=0.5, size=n) > 0).astype(int))
+    return X, y
+
+
+def test_tuning_data_folds_are_views_of_cross_val_score_folds(tmp_path):
+    X, y = classification_frame()
+    data = TuningData.create(X, y.map({0: "no", 1: "yes"}), str(tmp_path / "data"), n_folds=5)
+    assert data.X.dtype == np.float32 and data.classes == ["no", "yes"]
+    values = X.to_numpy(dtype=np.float32)
+    rows = {row.tobytes(): i for i, row in enumerate(values)}
+    for (train, valid), (X_train, y_train, X_valid, y_valid) in zip(
+            check_cv(5, y, classifier=True).split(X, y), data.folds()):
+        assert np.shares_memory(X_train, data.X) and np.shares_memory(X_valid, data.X)
+        assert X_train.flags.c_contiguous and X_valid.flags.c_contiguous
+        assert sorted(rows[r.tobytes()] for r in X_train) == sorted(train)
+        assert [rows[r.tobytes()] for r in X_valid] == list(valid)
+        np.testing.assert_array_equal(y_valid, y.to_numpy()[valid])
+        np.testing.assert_array_equal(np.sort(y_train), np.sort(y.to_numpy()[train]))
+    # Workers receive the directory, not the arrays.
+    assert len(pickle.dumps(data)) < 500
+    assert pickle.loads(pickle.dumps(data)).offsets == data.offsets
+
+
+def test_cross_validate_matches_cross_val_score(tmp_path):
+    X, y = classification_frame()
+    data = TuningData.create(X, y, str(tmp_path / "data"))
+    model = LogisticRegression()
+    expected = cross_val_score(model, X.astype(np.float32), y, cv=5, scoring="accuracy").mean()
+    assert cross_validate(optuna.trial.FixedTrial({}), model, data) == pytest.approx(expected)
+
+
+def test_trial_reports_folds_and_stops_at_deadline(tmp_path):
+    X, y = classification_frame()
+    data = TuningData.create(X, y, str(tmp_path / "data"))
+    study = optuna.create_study(direction="maximize")
+    trial = study.ask()
+    model = build_model("randomforest", {"n_estimators": 5})
+    with pytest.raises(optuna.TrialPruned):
+        cross_validate(trial, model, data, deadline=time.time() - 1)
+    study.tell(trial, state=optuna.trial.TrialState.PRUNED)
+    assert list(study.trials[0].intermediate_values) == [0]
+
+
+def test_serial_study_respects_trial_budget(tmp_path):
+    X, y = classification_frame()
+    study = tune(X, y, "randomforest", n_trials=4, n_folds=3, seed=0, data_dir=str(tmp_path))
+    assert len(study.trials) == 4
+    assert all(len(t.intermediate_values) == 3 for t in study.trials
+               if t.state == optuna.trial.TrialState.COMPLETE)
+    assert 0.5 < study.best_value <= 1.0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_parallel_workers_share_sqlite_storage(tmp_path):
+    X, y = classification_frame()
+    storage = f"sqlite:///{tmp_path / 'optuna.db'}"
+    study = tune(X, y, "randomforest", n_trials=6, workers=2, storage=storage,
+                 study_name="shared", n_folds=3, seed=0)
+    # Workers check the shared budget after each trial, so at most workers - 1 extra.
+    assert 6 <= len(study.trials) <= 7
+    stored = optuna.load_study(study_name="shared", storage=storage)
+    assert len(stored.trials) == len(study.trials)
+    assert stored.best_value == study.best_value
+
+
+def test_timeout_bounds_search():
+    X, y = classification_frame()
+    start = time.time()
+    study = tune(X, y, "randomforest", n_trials=None, timeout=1.0, n_folds=3)
+    assert time.time() - start < 5
+    assert len(study.trials) >= 1
+
+
+def test_resource_rungs():
+    assert resource_rungs(25, 200, 3) == [25, 75, 200]
+    assert resource_rungs(10, 40, 2) == [10, 20, 40]
+    assert resource_rungs(50, 50, 3) == [50]
+    with pytest.raises(ValueError):
+        resource_rungs(25, 200, 1)
+
+
+@pytest.mark.parametrize("model_type", ["randomforest", "xgboost"])
+def test_grown_models_match_models_fitted_at_full_size(model_type):
+    X, y = classification_frame()
+    X, y = X.to_numpy(dtype=np.float32), y.to_numpy()
+    params = {"max_depth": 3}
+    model = None
+    for n_estimators in (5, 15, 30):
+        model = _grow(model_type, model, params, n_estimators, X, y, 1)
+    full = build_model(model_type, dict(params, n_estimators=30), 1).fit(X, y)
+    if model_type == "randomforest":
+        assert len(model.estimators_) == 30
+    else:
+        assert model.get_booster().num_boosted_rounds() == 30
+    np.testing.assert_allclose(model.predict_proba(X), full.predict_proba(X), atol=1e-6)
+
+
+@pytest.mark.parametrize("search", ["halving", "hyperband"])
+def test_multi_fidelity_search_promotes_few_trials_to_full_size(search):
+    X, y = classification_frame()
+    study = tune(X, y, "randomforest", n_trials=12, n_folds=3, seed=0, search=search,
+                 min_resource=4, max_resource=36, reduction_factor=3)
+    complete = [t for t in study.trials if t.state == optuna.trial.TrialState.COMPLETE]
+    pruned = [t for t in study.trials if t.state == optuna.trial.TrialState.PRUNED]
+    assert len(study.trials) == 12 and pruned and complete
+    assert all(t.params["n_estimators"] == 36 for t in complete)
+    assert all(list(t.intermediate_values) == [4, 12, 36] for t in complete)
+    assert all(max(t.intermediate_values) < 36 for t in pruned)
+    assert study.best_params["n_estimators"] == 36
+
+
+def test_tuning_options_and_budget_validation():
+    options = tuning_options({"tuning": {"n_trials": 10, "workers": None, "timeout_s": 60}})
+    assert options["n_trials"] == 10 and options["workers"] is None and options["timeout"] == 60
+    X, y = classification_frame(20)
+    with pytest.raises(ValueError):
+        tune(X, y, n_trials=None, timeout=None)
+    with pytest.raises(ValueError):
+        tune(X, y, n_trials=1, search="grid")